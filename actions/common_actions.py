@@ -1,8 +1,8 @@
 """Actions that can be executed at any moment in the REPL."""
 
 import argparse
+import asyncio
 from collections.abc import Callable
-from copy import deepcopy
 import logging
 import os
 from pathlib import Path
@@ -11,9 +11,16 @@ from typing import Any, TYPE_CHECKING
 
 from actions.action_exceptions import ActionError
 from parsing.repl_parser import AttemptToExitError, CommandParser
-from read_and_write import read_file, write_file
 from messages.messages import change_language
-from utils.data_utils import cast_if_true, change_data_in_file, get_template
+from read_and_write import TABLE_DELIMITERS, read_file
+from utils.chunked_list import CONTAINER_TYPES, LIST_TYPES
+from utils.data_utils import (
+    cast_if_true, change_data_in_file, diff_data, get_template,
+    iter_input_files
+)
+from utils.profiling import profiler
+from utils.record_utils import group_records
+from utils.render_utils import format_size, summarize
 from widgets.data_editor import DataEditor
 from widgets.file_navigator import FileNavigator
 
@@ -37,12 +44,16 @@ common_parser = CommandParser(
 # def change_lang(de: "DataEditor",  argparse.Namespace) -> None:
 #     change_language(idiom)
 
+@common_parser.add_args(
+    "-f", "--force", action="store_true",
+    help="overwrite the file even if it changed on disk."
+)
 @common_parser.add_args(
     "-t", "--tab", nargs="?", default=-1, help="tab of editor to save",
     type=int
 )
 @common_parser.add_cmd("save")
-def save_file(wm: "WidgetManager", tab: int) -> None:
+def save_file(wm: "WidgetManager", tab: int, force: bool) -> None:
     """Save DataEditor modified data into filename."""
     try:
         de: DataEditor = wm.data_editors[tab]
@@ -52,31 +63,65 @@ def save_file(wm: "WidgetManager", tab: int) -> None:
     if de.filename is None:
         filepath: Path = (wm.file_navigator.path / input("filename: ")).resolve() 
         de.filename: Path = filepath
-    write_file(de.filename, de.data)
-    logger.info(f"Saved at {de.filename}.")
+    wm.save(de, force)
 
+@common_parser.add_args(
+    "-p", "--path", default=None, type=Path,
+    help="only export the data at this path, the editor keeping its file. "
+    "Ex.: saveas users.csv -p users"
+)
 @common_parser.add_args(
     "-t", "--tab", nargs="?", default=-1, help="tab of editor to save",
     type=int
 )
 @common_parser.add_args("filename", type=str)
 @common_parser.add_cmd("saveas")
-def save_as(wm: "WidgetManager", filename: str, tab: int) -> None:
+def save_as(
+    wm: "WidgetManager",
+    filename: str,
+    tab: int,
+    path: Path | None
+) -> None:
     """Change DataEditor file to another and save."""
     try:
         de: DataEditor = wm.data_editors[tab]
     except IndexError:
         raise ActionError("ERROR: Not that many editors opened.")
 
+    if de.status is not None:
+        raise ActionError(f"Editor is {de.status}, try again later.")
+
     new_filename: str = filename
+    new_filepath: Path
     if de.filename:
-        de.filename = (de.filename.parent / new_filename).resolve()
+        new_filepath = (Path(de.filename).parent / new_filename).resolve()
     else:
-        de.filename = (wm.file_navigator.path / new_filename).resolve()
+        new_filepath = (wm.file_navigator.path / new_filename).resolve()
+
+    data: Any = de.data if path is None else de.get_data(path)
+    if new_filepath.suffix.lower() in TABLE_DELIMITERS and not (
+        isinstance(data, LIST_TYPES)
+    ):
+        raise ActionError(
+            f"{new_filepath.suffix} files hold lists of records, "
+            "give the path of one with -p."
+        )
 
-    write_file(de.filename, de.data)
-    logger.info(f"Saved at {de.filename}.")
+    if path is not None:
+        wm.export(de, data, new_filepath)
+        return
+
+    de.filename = new_filepath
+    wm.save(de)
 
+@common_parser.add_args(
+    "--atomic", action="store_true",
+    help="Change every file or, if any fails, none of them."
+)
+@common_parser.add_args(
+    "--dry_run", "--dry-run", action="store_true",
+    help="Print old -> new values per file, without writing them."
+)
 @common_parser.add_args(
     "-nl", "--literal_off", action="store_true",
     help="When activated, values will be set as str."
@@ -91,7 +136,8 @@ def save_as(wm: "WidgetManager", filename: str, tab: int) -> None:
 )
 @common_parser.add_args(
     "-i", "--input_files", required=True, nargs="+", type=str,
-    help="Path of files to be changed."
+    help="Path or glob pattern of files to be changed. "
+    "Ex.: 'configs/**/*.yaml'"
 )
 @common_parser.add_cmd("change")
 def change_value_in_file(
@@ -100,20 +146,20 @@ def change_value_in_file(
     path: Path,
     set: list[str],
     literal_off: bool,
+    dry_run: bool,
+    atomic: bool
 ) -> None:
     """
     Update the data of files (-i) in give data_path (-p)
-    with the new_values (-s).
+    with the new_values (-s). Files of glob patterns are changed
+    as they are found.
     """
-    filepaths: list[Path] = [
-        (wm.file_navigator.path / filepath).resolve()
-        for filepath in input_files
-    ]
-
     change_data_in_file(
-        filepaths=filepaths,
+        filepaths=iter_input_files(input_files, wm.file_navigator.path),
         data_path=path,
-        new_values=cast_if_true(set, not literal_off)
+        new_values=cast_if_true(set, not literal_off),
+        dry_run=dry_run,
+        atomic=atomic
     )
 
 @common_parser.add_args(
@@ -128,14 +174,40 @@ def edit_file(wm: "WidgetManager", filepaths: list[None | str]) -> None:
     if filepaths != [None]:
         for filepath in filepaths:
             abs_filepath: Path = (wm.file_navigator.path / filepath).resolve()
-            data: Any = read_file(abs_filepath)
-            new_data_editors.append(DataEditor(data, abs_filepath))
+            new_data_editors.append(DataEditor(None, abs_filepath))
     else:
         new_data_editors.append(DataEditor())
 
     wm.data_editors.extend(new_data_editors)
     wm.active_widget = wm.data_editors[-1]
 
+    # tabs are usable right away, their data is loaded in the background
+    for de in new_data_editors:
+        if de.filename is not None:
+            wm.load(de)
+
+@common_parser.add_args(
+    "-f", "--force", action="store_true",
+    help="discard unsaved changes of the editor."
+)
+@common_parser.add_args(
+    "tab", nargs="?", type=int, default=None,
+    help="index of tab to reload, the current one if not given."
+)
+@common_parser.add_cmd("reload")
+def reload_file(wm: "WidgetManager", tab: int | None, force: bool) -> None:
+    """Read the file of an editor again, after it changed on disk."""
+    if tab is None:
+        if wm.active_widget not in wm.data_editors:
+            raise ActionError("Give the index of the tab to reload.")
+        de: DataEditor = wm.active_widget
+    else:
+        try:
+            de = wm.data_editors[tab]
+        except IndexError:
+            raise ActionError("ERROR: Not that many editors opened.")
+    wm.reload(de, force)
+
 @common_parser.add_args(
     "tab", nargs="?", type=int, default=None,
     help="Index of editor tab with data to get template of."
@@ -149,20 +221,53 @@ def get_template_from_de(wm: "WidgetManager", tab: int) -> None:
         except ValueError:
             return
     else:
-        tab_index: int = editor_tab
+        tab_index: int = tab
     
     try:
-        data: Any = deepcopy(wm.data_editors[tab_index].data)
+        de: DataEditor = wm.data_editors[tab_index]
     except IndexError:
         logger.error("Not that many editors opened.")
         return
 
-    template_of_data: Any = get_template(data)
+    if de.status == "loading":
+        raise ActionError("Editor is loading, try again later.")
+
+    # get_template builds a new tree, de.data is left untouched
+    template_of_data: Any = get_template(de.data)
     editor_of_template: DataEditor = DataEditor(template_of_data)
+    editor_of_template.dirty = True  # never saved yet
 
     wm.data_editors.append(editor_of_template)
     wm.active_widget: DataEditor = editor_of_template
 
+@common_parser.add_args(
+    "-p", "--path", default=Path("."), type=Path,
+    help="path of the list to group."
+)
+@common_parser.add_args(
+    "key", help="key of the records to group by, nested like address/city."
+)
+@common_parser.add_cmd("group-by")
+def group_data(wm: "WidgetManager", key: str, path: Path) -> None:
+    """Open a new tab with the records of the list at path grouped by key."""
+    if wm.active_widget not in wm.data_editors:
+        raise ActionError("Open the tab of the list to group.")
+    de: DataEditor = wm.active_widget
+    if de.status == "loading":
+        raise ActionError("Editor is loading, try again later.")
+
+    records: Any = de.get_data(path)
+    if not isinstance(records, LIST_TYPES):
+        raise ActionError(f"{de.resolve_path(path).as_posix()} is not a list.")
+    # groups hold the records of de, shared until either tab changes them
+    groups: dict[Any, list] = group_records(records, key)
+    editor_of_groups: DataEditor = DataEditor(groups)
+    editor_of_groups.dirty = True  # never saved yet
+
+    wm.data_editors.append(editor_of_groups)
+    wm.active_widget = editor_of_groups
+    print(f"{len(records):,} records in {len(groups):,} groups.")
+
 @common_parser.add_args(
     "tab", nargs="?", type=int, default=None, help="index of tab to close."
 )
@@ -176,13 +281,14 @@ def close_data_editor(wm: "WidgetManager", tab: int) -> None:
         except ValueError:
             return
     else:
-        tab_index: int = editor_tab
+        tab_index: int = tab
 
     # close
     try:
         wm.data_editors.pop(tab_index)
     except IndexError:
         raise ActionError("ERROR: Not that many editors opened.")
+    wm.release_documents()
 
     # refocus
     if wm.active_widget not in wm.data_editors:
@@ -209,11 +315,194 @@ def focus_file_navigator(wm: "WidgetManager") -> None:
     """Focus WidgetManager in its FileNavigator instance."""
     wm.active_widget = wm.file_navigator
 
+@common_parser.add_cmd("save-all")
+def save_all_files(wm: "WidgetManager") -> None:
+    """Save every modified editor with a file, concurrently."""
+    wm.save_all()
+
 @common_parser.add_cmd("print-tabs", "tabs")
 def print_widgets(wm: "WidgetManager") -> None:
-    """Print current oppened editors"""
+    """
+    Print current oppened editors, * marks the modified ones,
+    ! the ones whose file changed on disk.
+    """
     for i, data_editor in enumerate(wm.data_editors):
-        print(f"file: {data_editor.filename} ({i})")
+        modified: str = " *" if data_editor.dirty else ""
+        if (
+            data_editor.filename is not None
+            and Path(data_editor.filename).resolve() in wm.changed_on_disk
+        ):
+            modified += " !"
+        status: str = f" [{data_editor.status}]" if data_editor.status else ""
+        print(f"file: {data_editor.filename} ({i}){modified}{status}")
+
+@common_parser.add_args(
+    "-l", "--limit", type=int, default=100,
+    help="maximum of differences shown."
+)
+@common_parser.add_args(
+    "other", nargs="?", type=int, default=None,
+    help="index of tab to compare with, the file on disk if not given."
+)
+@common_parser.add_args(
+    "tab", nargs="?", type=int, default=None,
+    help="index of tab to compare, the current one if not given."
+)
+@common_parser.add_cmd("diff")
+def diff_editors(
+    wm: "WidgetManager",
+    tab: int | None,
+    other: int | None,
+    limit: int
+) -> None:
+    """Show paths added, removed and changed between tabs, or tab and file."""
+    def _get_editor(index: int) -> DataEditor:
+        try:
+            de: DataEditor = wm.data_editors[index]
+        except IndexError:
+            raise ActionError("ERROR: Not that many editors opened.")
+        if de.status == "loading":
+            raise ActionError("Editor is loading, try again later.")
+        return de
+
+    def _short(value: Any) -> str:
+        if isinstance(value, CONTAINER_TYPES) and value:
+            return summarize(value)
+        text: str = repr(value)
+        return text if len(text) <= 60 else f"{text[:57]}..."
+
+    if tab is None:
+        if wm.active_widget not in wm.data_editors:
+            raise ActionError("Give the index of the tab to compare.")
+        de: DataEditor = wm.active_widget
+    else:
+        de = _get_editor(tab)
+
+    def _show(old_data: Any) -> None:
+        counts: dict[str, int] = {"added": 0, "removed": 0, "changed": 0}
+        for kind, path, old_value, new_value in diff_data(old_data, de.data):
+            if sum(counts.values()) < limit:
+                match kind:
+                    case "added":
+                        print(f"+ {path.as_posix()}: {_short(new_value)}")
+                    case "removed":
+                        print(f"- {path.as_posix()}: {_short(old_value)}")
+                    case "changed":
+                        print(
+                            f"~ {path.as_posix()}: "
+                            f"{_short(old_value)} -> {_short(new_value)}"
+                        )
+            counts[kind] += 1
+
+        total: int = sum(counts.values())
+        if total > limit:
+            print(f"... {total - limit:,} more differences")
+        print(
+            f"{counts['added']:,} added, {counts['removed']:,} removed, "
+            f"{counts['changed']:,} changed."
+        )
+
+    def _on_read(future: asyncio.Future) -> None:
+        try:
+            old_data: Any = future.result()
+        except (FileNotFoundError, PermissionError):
+            # already logged by read_file
+            return
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not read {de.filename}: {e}")
+            return
+        _show(old_data)
+
+    if other is not None:
+        _show(_get_editor(other).data)
+    elif de.filename is None:
+        raise ActionError("Editor has no file to compare with.")
+    elif wm.loop is None:
+        _show(read_file(de.filename, wm.compact))
+    else:
+        # the file is read in a worker thread, like when loading it
+        future: asyncio.Future = wm.loop.run_in_executor(
+            None, read_file, de.filename, wm.compact
+        )
+        future.add_done_callback(_on_read)
+
+@common_parser.add_args(
+    "tab", nargs="?", type=int, default=None,
+    help="index of tab to show, every tab if not given."
+)
+@common_parser.add_cmd("stats")
+def print_stats(wm: "WidgetManager", tab: int | None) -> None:
+    """Show timings, sizes, node counts and memory of editors."""
+    def _format_seconds(seconds: float | None) -> str:
+        return "-" if seconds is None else f"{seconds:.3f}s"
+
+    indexes: range | list[int] = range(len(wm.data_editors))
+    if tab is not None:
+        if not -len(wm.data_editors) <= tab < len(wm.data_editors):
+            raise ActionError("ERROR: Not that many editors opened.")
+        indexes = [tab % len(wm.data_editors)]
+
+    for i in indexes:
+        de: DataEditor = wm.data_editors[i]
+        print(f"file: {de.filename} ({i})")
+        if de.status == "loading":
+            print("  loading...")
+            continue
+
+        stats: dict[str, Any] = de.get_stats()
+        file_size: str = "-"
+        if stats["file_size"] is not None:
+            file_size = format_size(stats["file_size"])
+        print(
+            f"  load: {_format_seconds(stats['load_seconds'])}"
+            f"  save: {_format_seconds(stats['save_seconds'])}"
+            f"  file size: {file_size}"
+        )
+        print(
+            f"  nodes: {stats['nodes']:,}  leaves: {stats['leaves']:,}"
+            f"  max depth: {stats['max_depth']}"
+            f"  memory: ~{format_size(stats['memory'])}"
+            + (" (shared)" if de.shared else "")
+        )
+
+@common_parser.add_args(
+    "-c", "--cprofile", action="store_true",
+    help="with on, also keep cProfile output of the slowest runs."
+)
+@common_parser.add_args(
+    "filepath", nargs="?", default=None,
+    help="with dump, JSON file to export into instead of printing."
+)
+@common_parser.add_args("mode", choices=["on", "off", "dump", "reset"])
+@common_parser.add_cmd("profile")
+def profile_commands(
+    wm: "WidgetManager",
+    mode: str,
+    filepath: str | None,
+    cprofile: bool
+) -> None:
+    """Measure time and memory of every command executed."""
+    match mode:
+        case "on":
+            profiler.start(cprofile)
+        case "off":
+            profiler.stop()
+        case "reset":
+            profiler.reset()
+        case "dump":
+            if filepath is not None:
+                profiler.dump((wm.file_navigator.path / filepath).resolve())
+            else:
+                profiler.dump()
+
+@common_parser.add_args(
+    "interval", type=float,
+    help="seconds between saves of modified editors, 0 turns it off."
+)
+@common_parser.add_cmd("autosave")
+def set_autosave(wm: "WidgetManager", interval: float) -> None:
+    """Periodically save modified editors in the background."""
+    wm.set_autosave(interval)
 
 @common_parser.add_cmd("-h", "--help", add_help=False)
 def print_help(wm: "WidgetManager", **_) -> None:
@@ -2,15 +2,30 @@
 
 import argparse
 from collections.abc import Callable
+import copy
 import logging
 from pathlib import Path
-from pprint import pprint
 from typing import Any, TYPE_CHECKING
 
 from actions.action_exceptions import ActionError
+from parsing.query_parser import (
+    Plan, QueryError, compile_query, format_result
+)
 from parsing.repl_parser import AttemptToExitError, CommandParser
 from read_and_write import read_file
-from utils.data_utils import smart_cast, iter_data
+from utils.chunked_list import (
+    CONTAINER_TYPES, LIST_TYPES, ChunkedList, chunk_lists, unchunk_lists
+)
+from utils.compact_records import (
+    DICT_TYPES, CompactRecord, RecordBuilder, compact_data, count_records,
+    expand_data
+)
+from utils.data_utils import iter_data, read_answers, smart_cast
+from utils.hash_utils import find_duplicates
+from utils.record_utils import (
+    AGGREGATES, Aggregate, aggregate_records, sort_records
+)
+from utils.render_utils import default_page_size, print_paged, render_lines
 from widgets.quick_fill import QuickFill
 
 
@@ -45,6 +60,8 @@ def append_data(
     """
     for value in new_values:
         try:
+            # containers appended to are mutated in place
+            de.own(de.resolve_path(path))
             sel_data: Any = de.get_data(path)
         except IndexError as e:
             raise ActionError(e)
@@ -52,11 +69,13 @@ def append_data(
         new_data: Any = smart_cast(value)
 
         match (new_data, sel_data):
-            case (dict(), dict()):
+            case (dict(), dict() | CompactRecord()):
                 sel_data.update(new_data)
+                de.mark_changed(de.resolve_path(path))
 
-            case (list(), list()):
+            case (list(), list() | ChunkedList()):
                 sel_data.extend(new_data)
+                de.mark_changed(de.resolve_path(path))
 
             case _:
                 appended: Any
@@ -69,6 +88,32 @@ def append_data(
 
                 de.change_data(appended, path)
 
+@de_parser.add_args(
+    "-p", "--path", default=Path("."), type=Path,
+    help="path of the list to insert into."
+)
+@de_parser.add_args("new_values", nargs="+")
+@de_parser.add_args("index", type=int, help="index to insert before.")
+@de_parser.add_cmd("insert")
+def insert_data(
+    de: "DataEditor",
+    index: int,
+    new_values: list[str],
+    path: Path
+) -> None:
+    """Insert items in a list before given index."""
+    resolved_path: Path = de.resolve_path(path)
+    # the list is inserted into in place
+    de.own(resolved_path)
+    items: Any = de.get_data(path)
+    if not isinstance(items, LIST_TYPES):
+        raise ActionError(f"{resolved_path.as_posix()} is not a list.")
+
+    for offset, value in enumerate(new_values):
+        position: int = index + offset if index >= 0 else index
+        items.insert(position, smart_cast(value))
+    de.mark_changed(resolved_path)
+
 @de_parser.add_args(
     "path", nargs="?", default=".", type=Path,
     help="path of data to cast."
@@ -106,13 +151,13 @@ def del_key(
 ) -> None:
     """Delete value, key or item based on given key."""    
     def _iter_del(data, keys_to_delete, recursively):
-        if isinstance(data, list):
-            return [
+        if isinstance(data, LIST_TYPES):
+            return type(data)([
                 _iter_del(v, keys_to_delete, recursively) if recursively
                 else v for i, v in enumerate(data) if i not in keys_to_delete
-            ]
+            ])
 
-        elif isinstance(data, dict):
+        elif isinstance(data, DICT_TYPES):
             return {
                 k: _iter_del(v, keys_to_delete, recursively) if recursively
                 else v for k, v in data.items() if k not in keys_to_delete
@@ -127,6 +172,24 @@ def del_key(
         for value in keys_to_delete
     )
 
+    if not recursively and isinstance(data, CONTAINER_TYPES):
+        # deleted in place, big lists aren't rebuilt
+        resolved_path: Path = de.resolve_path(path)
+        de.own(resolved_path)
+        data = de.get_data(path)
+        if isinstance(data, DICT_TYPES):
+            for key in keys_to_delete:
+                data.pop(key, None)
+        else:
+            indexes: set[int] = {
+                key for key in keys_to_delete
+                if type(key) is int and 0 <= key < len(data)
+            }
+            for index in sorted(indexes, reverse=True):
+                del data[index]
+        de.mark_changed(resolved_path)
+        return
+
     new_value: Any = _iter_del(data, keys_to_delete, recursively)
     de.change_data(new_value, path, force_type=True)
 
@@ -146,23 +209,25 @@ def del_val(
     recursively: bool
 ) -> None:
     """Delete value, key or item based on given value."""    
-    def _iter_del(data, values_to_delete, recursively):
-        if data in values_to_delete:
-            return None
-
-        if isinstance(data, list):
-            return [
-                _iter_del(i, values_to_delete, recursively) if recursively
-                else i for i in data if i not in values_to_delete
-            ]
-
-        elif isinstance(data, dict):
-            return {
-                k: _iter_del(v, values_to_delete, recursively) if recursively
-                else v for k, v in data.items() if v not in values_to_delete
-            }
-
-        return data
+    def _del_values(data, values_to_delete):
+        if isinstance(data, DICT_TYPES):
+            for key in [k for k, v in data.items() if v in values_to_delete]:
+                del data[key]
+        else:
+            data[:] = [i for i in data if i not in values_to_delete]
+
+    def _iter_del(data, values_to_delete):
+        if not isinstance(data, CONTAINER_TYPES):
+            return data
+        # copied, not rebuilt, to keep ChunkedList and CompactRecord
+        new_data: Any = copy.copy(data)
+        _del_values(new_data, values_to_delete)
+        if isinstance(new_data, DICT_TYPES):
+            for key, value in new_data.items():
+                new_data[key] = _iter_del(value, values_to_delete)
+        else:
+            new_data[:] = [_iter_del(i, values_to_delete) for i in new_data]
+        return new_data
 
     data: Any = de.get_data(path)
 
@@ -171,14 +236,259 @@ def del_val(
         for value in values_to_delete
     )
 
-    new_value: Any = _iter_del(data, values_to_delete, recursively)
+    if data in values_to_delete:
+        de.change_data(None, path, force_type=True)
+        return
+
+    if not recursively and isinstance(data, CONTAINER_TYPES):
+        # deleted in place, like del-key
+        resolved_path: Path = de.resolve_path(path)
+        de.own(resolved_path)
+        _del_values(de.get_data(path), values_to_delete)
+        de.mark_changed(resolved_path)
+        return
+
+    new_value: Any = _iter_del(data, values_to_delete)
     de.change_data(new_value, path, force_type=True)
 
+@de_parser.add_args(
+    "--page", type=int, default=None,
+    help="lines per page, 0 to not page. Default: terminal height."
+)
+@de_parser.add_args(
+    "-l", "--limit", type=int, default=100,
+    help="maximum of items shown per container."
+)
+@de_parser.add_args(
+    "-d", "--depth", type=int, default=None,
+    help="levels of nested data shown, deeper ones are summarized."
+)
 @de_parser.add_args("path", nargs="?", default=Path("."), type=Path)
 @de_parser.add_cmd("ls", "list")  
-def list_data(de: "DataEditor", path: Path) -> None:
+def list_data(
+    de: "DataEditor",
+    path: Path,
+    depth: int | None,
+    limit: int,
+    page: int | None
+) -> None:
     """Print data in given data path."""
-    pprint(de.get_data(path))
+    for name, value in (("depth", depth), ("limit", limit), ("page", page)):
+        if value is not None and value < 0:
+            raise ActionError(f"--{name} can't be negative, got {value}.")
+    if page is None:
+        page = default_page_size()
+    print_paged(render_lines(de.get_data(path), depth, limit), page)
+
+@de_parser.add_args(
+    "--page", type=int, default=None,
+    help="lines per page, 0 to not page. Default: terminal height."
+)
+@de_parser.add_args(
+    "-c", "--compact", action="store_true", help="a line per result."
+)
+@de_parser.add_args(
+    "-p", "--path", default=Path("."), type=Path,
+    help="data path the query runs over."
+)
+@de_parser.add_args(
+    "query", nargs="+",
+    help="jq-like query. Ex.: '.users[] | select(.age > 30) | .email'"
+)
+@de_parser.add_cmd("query", "jq")
+def query_data(
+    de: "DataEditor",
+    query: list[str],
+    path: Path,
+    compact: bool,
+    page: int | None
+) -> None:
+    """Print the results of a jq-like query, as they are found."""
+    try:
+        plan: Plan = compile_query(" ".join(query))
+    except QueryError as e:
+        raise ActionError(f"Bad query: {e}")
+
+    def _lines():
+        for result in plan.run(de.get_data(path)):
+            yield from format_result(result, compact).splitlines()
+
+    if page is None:
+        page = default_page_size()
+    try:
+        print_paged(_lines(), page)
+    except QueryError as e:
+        raise ActionError(e)
+
+def _records_at(de: "DataEditor", path: Path) -> list:
+    records: Any = de.get_data(path)
+    if not isinstance(records, LIST_TYPES):
+        raise ActionError(f"{de.resolve_path(path).as_posix()} is not a list.")
+    return records
+
+@de_parser.add_args(
+    "-r", "--reverse", action="store_true", help="descending order."
+)
+@de_parser.add_args(
+    "-p", "--path", default=Path("."), type=Path,
+    help="path of the list to sort."
+)
+@de_parser.add_args(
+    "keys", nargs="*",
+    help="keys of the records to sort by, nested like address/city. "
+    "Without keys, items are sorted by themselves."
+)
+@de_parser.add_cmd("sort")
+def sort_data(
+    de: "DataEditor",
+    keys: list[str],
+    path: Path,
+    reverse: bool
+) -> None:
+    """Sort the list at path in place, keeping the order of equal items."""
+    resolved_path: Path = de.resolve_path(path)
+    # the list is sorted in place
+    de.own(resolved_path)
+    sort_records(_records_at(de, path), keys, reverse)
+    de.mark_changed(resolved_path)
+
+@de_parser.add_args(
+    "-f", "--functions", nargs="+", choices=AGGREGATES, default=None,
+    help="aggregates shown. Default: all."
+)
+@de_parser.add_args(
+    "-b", "--by", default=None,
+    help="key of the records to group by, nested like address/city."
+)
+@de_parser.add_args(
+    "-p", "--path", default=Path("."), type=Path,
+    help="path of the list of records."
+)
+@de_parser.add_args(
+    "field", nargs="?", default=None,
+    help="key of the values aggregated, the items themselves without it."
+)
+@de_parser.add_cmd("agg")
+def aggregate_data(
+    de: "DataEditor",
+    field: str | None,
+    path: Path,
+    by: str | None,
+    functions: list[str] | None
+) -> None:
+    """Print count, sum, min, max and mean of the records in the list at path."""
+    def _format(value: Any) -> str:
+        if value is None:
+            return "-"
+        if isinstance(value, float):
+            return f"{value:,.3f}"
+        return f"{value:,}"
+
+    if functions is None:
+        functions = list(AGGREGATES)
+    aggregates: dict[Any, Aggregate] = aggregate_records(
+        _records_at(de, path), field, by
+    )
+
+    header: str = "".join(f"{name:>14}" for name in functions)
+    print(f"{by:<20}{header}" if by else header)
+    for group, aggregate in aggregates.items():
+        row: str = "".join(
+            f"{_format(getattr(aggregate, name)):>14}" for name in functions
+        )
+        print(f"{str(group):<20}{row}" if by else row)
+
+@de_parser.add_args(
+    "--min-size", type=int, default=100_000,
+    help="lists with fewer items are left as they are."
+)
+@de_parser.add_args("-p", "--path", default=Path("."), type=Path)
+@de_parser.add_args("mode", choices=["on", "off"])
+@de_parser.add_cmd("chunk")
+def set_chunked(de: "DataEditor", mode: str, path: Path, min_size: int) -> None:
+    """
+    Store big lists in given path in chunks, so inserting and deleting
+    items in the middle of them takes O(log n), or back as lists.
+    """
+    converted: int
+    if mode == "on":
+        new_data, converted = chunk_lists(de.get_data(path), min_size)
+    else:
+        new_data, converted = unchunk_lists(de.get_data(path))
+
+    if converted:
+        # same content, only stored differently: not a change to save
+        dirty: bool = de.dirty
+        de.change_data(new_data, path, force_type=True)
+        de.dirty = dirty
+    print(f"{converted:,} lists {'chunked' if mode == 'on' else 'unchunked'}.")
+
+@de_parser.add_args(
+    "--values", action="store_true",
+    help="also share repeated short strings between records."
+)
+@de_parser.add_args("-p", "--path", default=Path("."), type=Path)
+@de_parser.add_args("mode", choices=["on", "off"])
+@de_parser.add_cmd("compact")
+def set_compact(de: "DataEditor", mode: str, path: Path, values: bool) -> None:
+    """
+    Store dicts in given path as compact records, sharing their keys
+    with the records of the same shape, or back as dicts.
+    """
+    data: Any = de.get_data(path)
+    if not isinstance(data, CONTAINER_TYPES):
+        raise ActionError(f"Nothing to compact at {de.resolve_path(path)}.")
+
+    before: int = count_records(data)
+    if mode == "on":
+        new_data: Any = compact_data(data, RecordBuilder(intern_values=values))
+    else:
+        new_data = expand_data(data)
+
+    # same content, only stored differently: not a change to save
+    dirty: bool = de.dirty
+    de.change_data(new_data, path, force_type=True)
+    de.dirty = dirty
+    print(f"{count_records(new_data):,} compact records (before: {before:,}).")
+
+@de_parser.add_args("mode", choices=["on", "off"])
+@de_parser.add_cmd("hashes")
+def set_hashes(de: "DataEditor", mode: str) -> None:
+    """Cache hashes of every subtree, speeding up dupes and changed."""
+    if mode == "on":
+        de.enable_hashes().digest(de.data)
+    else:
+        de.disable_hashes()
+
+@de_parser.add_args("path", nargs="?", default=Path("."), type=Path)
+@de_parser.add_cmd("changed")
+def print_changed(de: "DataEditor", path: Path) -> None:
+    """Tell if data in given path changed since it was loaded or saved."""
+    resolved_path: Path = de.resolve_path(path)
+    changed: bool = de.changed_since_load(resolved_path)
+    print(f"{resolved_path.as_posix()}: {'changed' if changed else 'unchanged'}")
+
+@de_parser.add_args(
+    "-l", "--limit", type=int, default=20,
+    help="maximum of duplicated subtrees shown."
+)
+@de_parser.add_args(
+    "--min-size", type=int, default=2,
+    help="minimum of nodes of the subtrees shown."
+)
+@de_parser.add_cmd("dupes")
+def print_duplicates(de: "DataEditor", min_size: int, limit: int) -> None:
+    """List subtrees found more than once, biggest first."""
+    duplicates = find_duplicates(de.enable_hashes(), de.data, min_size)
+    for size, paths in duplicates[:limit]:
+        shown: str = ", ".join(path.as_posix() for path in paths[:5])
+        if len(paths) > 5:
+            shown += f", ... {len(paths) - 5:,} more"
+        print(f"{size:,} nodes x{len(paths)}: {shown}")
+    if len(duplicates) > limit:
+        print(f"... {len(duplicates) - limit:,} more duplicated subtrees")
+    if not duplicates:
+        print("No duplicated subtrees.")
 
 @de_parser.add_args("path", nargs="?", default=Path("."), type=Path)
 @de_parser.add_cmd("cd")
@@ -186,9 +496,24 @@ def change_editor_path(de: "DataEditor", path: Path)-> None:
     """Move path."""
     de.path = de.resolve_path(path)
 
+@de_parser.add_args(
+    "-f", "--from", dest="answers_filepath", type=Path, default=None,
+    help="CSV or JSON Lines file of answers to fill in a single pass, "
+    "path,value pairs or a record per row."
+)
 @de_parser.add_cmd("qf", "quick-fill")
-def quick_fill(de: "DataEditor") -> None:
+def quick_fill(de: "DataEditor", answers_filepath: Path | None) -> None:
     """Editing mode for quick filling dict values and list items."""
+    if answers_filepath is not None:
+        try:
+            filled, skipped = de.fill(read_answers(answers_filepath, de.literal))
+        except FileNotFoundError:
+            raise ActionError(f"{answers_filepath} not found.")
+        except ValueError as e:
+            raise ActionError(f"Invalid answers file: {e}")
+        print(f"Filled {filled:,} leaves, {skipped:,} answers matched no leaf.")
+        return
+
     def _data_answer(data):
         print(f"data: {data}")
         return smart_cast(input("new value: "))
@@ -203,6 +528,7 @@ def quick_fill(de: "DataEditor") -> None:
 
     de.data: Any
     de.data = iter_data(de.data, _dict_answer, _list_answer, _data_answer)
+    de.mark_changed()
 
 @de_parser.add_args("variables", nargs="*")
 @de_parser.add_cmd("print")
@@ -227,6 +553,8 @@ def restart(de: "DataEditor") -> None:
     """Restart DataEditor data to the original state."""
     if de.filename is not None:
         de.data: Any = read_file(de.filename)
+        de.invalidate_caches()
+        de.dirty = False
     else:
         print("ERROR: No file is opened.")
 
@@ -2,18 +2,26 @@
 # make directory, filepath, abs_filepath use consistent
 # make resolve use consistent
 import argparse
-from collections.abc import Callable
+from collections.abc import Callable, Iterator
+import heapq
 import logging
+import os
 from pathlib import Path
+import random
+import time
 from typing import Any, TYPE_CHECKING
 
 from messages.messages import get_error_message 
 from utils.shell_utils import (
-    copy_anything, delete_anything, move_anything, create_file,
-    create_directory
+    copy_into_destinations, delete_anything, move_anything, create_file,
+    create_directory, scan_directory
 )
-from utils.data_utils import get_template
-from read_and_write import read_file, write_file
+from utils.data_utils import get_template, smart_cast
+from utils.pool_utils import map_files
+from utils.schema_utils import file_shape, merge_shape
+from utils.search_utils import DataQuery, grep_file
+from utils.render_utils import default_page_size, format_size, print_paged
+from read_and_write import SUPPORTED_FORMATS, read_file, write_file
 from parsing.repl_parser import CommandParser
 
 
@@ -42,13 +50,15 @@ def copy_files(
     source: str,
     destinations: list[str]
 ) -> None: # add filters
-    """Copy file from source into given destinations."""
+    """
+    Copy file from source into given destinations,
+    in a single pass over the source.
+    """
     destinations: tuple[Path, ...]
     destinations = resolve_paths(fn.path, destinations)
     source: Path = resolve_paths(fn.path, [source])[0]
 
-    for destination in destinations:
-        copy_anything(source, destination)
+    copy_into_destinations(source, list(destinations))
 
 @fn_parser.add_args("directories", nargs="+")
 @fn_parser.add_cmd("mkdir")
@@ -66,6 +76,26 @@ def delete_files(fn: "FileNavigator", filepaths: list[str]) -> None:
     for filepath in filepaths:
         delete_anything(filepath)
 
+@fn_parser.add_args(
+    "--seed", type=int, default=0, help="seed of the sampling of files."
+)
+@fn_parser.add_args(
+    "--files", type=int, default=None,
+    help="with a directory, only read this many files, randomly sampled."
+)
+@fn_parser.add_args(
+    "--items", type=int, default=None,
+    help="with a directory, only inspect this many items of each list, "
+    "evenly spread, or the first records of JSON Lines and CSV files."
+)
+@fn_parser.add_args(
+    "-j", "--jobs", type=int, default=None,
+    help="worker processes. Default: number of CPUs."
+)
+@fn_parser.add_args(
+    "-g", "--glob", default=None,
+    help="with a directory, only read files matching this pattern."
+)
 @fn_parser.add_args("template_path", type=str)
 @fn_parser.add_args("filepath", type=str)
 @fn_parser.add_cmd("xt", "extract-template")
@@ -73,37 +103,263 @@ def extract_template_from_file(
     fn: "FileNavigator",
     filepath: str,
     template_path: str,
+    glob: str | None,
+    jobs: int | None,
+    items: int | None,
+    files: int | None,
+    seed: int
 ) -> None:
-    """Extract template of data from given file into a new template_file"""
+    """
+    Extract template of data from given file into a new template_file.
+    Given a directory, extract instead a schema merged from every data
+    file under it: how many files have each data path ("*" for list
+    items), how many times and with which types.
+    """
     abs_filepath: Path = (fn.path / filepath).resolve()
     template_filepath: Path = Path(fn.path / template_path).resolve()
 
+    if abs_filepath.is_dir():
+        filepaths: list[Path] = [
+            Path(entry.path) for _, entry in scan_directory(
+                abs_filepath, True, glob, SUPPORTED_FORMATS
+            )
+            if Path(entry.path) != template_filepath
+        ]
+        if files is not None and len(filepaths) > files:
+            filepaths = random.Random(seed).sample(filepaths, files)
+
+        started: float = time.perf_counter()
+        schema: dict[str, dict[str, Any]] = {}
+        errors: list[tuple[Path, str]] = []
+        for shape_filepath, shape, error in map_files(
+            file_shape, filepaths, items, jobs=jobs
+        ):
+            if error is not None:
+                errors.append((shape_filepath, error))
+            else:
+                merge_shape(schema, shape)
+        seconds: float = time.perf_counter() - started
+
+        for error_filepath, error in errors[:5]:
+            logger.error(f"Could not read {error_filepath}: {error}")
+        write_file(template_filepath, {
+            "files": len(filepaths) - len(errors),
+            "paths": dict(sorted(schema.items()))
+        })
+        print(
+            f"Schema of {len(schema):,} paths from {len(filepaths):,} files, "
+            f"{len(errors):,} unreadable "
+            f"({len(filepaths) / max(seconds, 1e-9):,.0f} files/s)."
+        )
+        return
+
     data: Any = read_file(abs_filepath)
     template: Any = get_template(data)
 
     write_file(template_filepath, template)
 
+@fn_parser.add_args(
+    "--page", type=int, default=None,
+    help="lines per page, 0 to not page. Default: terminal height."
+)
+@fn_parser.add_args(
+    "-d", "--data", action="store_true",
+    help="only list files of supported data formats."
+)
+@fn_parser.add_args(
+    "-l", "--limit", type=int, default=None,
+    help="maximum of entries listed per directory given."
+)
+@fn_parser.add_args(
+    "-s", "--sort", choices=["name", "size", "mtime"], default=None,
+    help="sort by name, or biggest (directories last) or newest first. "
+    "Default: disk order."
+)
+@fn_parser.add_args(
+    "-g", "--glob", default=None,
+    help="only list files matching this pattern. Ex.: '*.json', 'conf/*'"
+)
+@fn_parser.add_args(
+    "-r", "--recursive", action="store_true", help="also list subdirectories."
+)
 @fn_parser.add_args("filepaths", nargs="*", default=["."])
 @fn_parser.add_cmd("list", "ls")
-def list_files(fn: "FileNavigator",  filepaths: list[str]) -> None:
-    """List directory files. Can list multiple directories at once."""
-    targets: list[str] = filepaths
+def list_files(
+    fn: "FileNavigator",
+    filepaths: list[str],
+    recursive: bool,
+    glob: str | None,
+    sort: str | None,
+    limit: int | None,
+    data: bool,
+    page: int | None
+) -> None:
+    """
+    List directory files, with their sizes and modification times.
+    Can list multiple directories at once. Entries are printed as they
+    are scanned, unless sorted.
+    """
+    def _stat(entry: os.DirEntry) -> os.stat_result:
+        # cached by the entry after the first call
+        return entry.stat(follow_symlinks=False)
 
-    filepaths: list[str]
-    filepaths = [target if target != "." else fn.path for target in targets]
+    def _line(relative: str, entry: os.DirEntry) -> str:
+        stat: os.stat_result = _stat(entry)
+        modified: str = time.strftime(
+            "%Y-%m-%d %H:%M", time.localtime(stat.st_mtime)
+        )
+        if entry.is_dir(follow_symlinks=False):
+            return f"{'-':>10}  {modified}  {relative}/"
+        return f"{format_size(stat.st_size):>10}  {modified}  {relative}"
 
-    abs_filepaths: tuple[Path, ...] = resolve_paths(fn.path, filepaths)
-    for filepath in abs_filepaths:
-        if filepath.is_dir():
-            for item in filepath.iterdir():
-                print(item)
-        elif filepath.is_file():
-            print(filepath.name)  # to-do: make it prettier
-        else:
-            logger.error(
-                get_error_message("DirectoryOrFileNotFound", filename=filepath)
+    def _lines() -> Iterator[str]:
+        for filepath in resolve_paths(fn.path, filepaths):
+            if filepath.is_file():
+                yield filepath.name  # to-do: make it prettier
+                continue
+            if not filepath.is_dir():
+                logger.error(
+                    get_error_message("DirectoryOrFileNotFound", filename=filepath)
+                )
+                continue
+
+            if len(filepaths) > 1:
+                yield f"{filepath}:"
+            entries: Iterator[tuple[str, os.DirEntry]] = scan_directory(
+                filepath, recursive, glob, SUPPORTED_FORMATS if data else None
             )
 
+            shown: int = 0
+            if sort is None:
+                for relative, entry in entries:
+                    if limit is not None and shown >= limit:
+                        yield f"... limit of {limit:,} entries reached"
+                        break
+                    yield _line(relative, entry)
+                    shown += 1
+                continue
+
+            key: Callable[[tuple[str, os.DirEntry]], Any]
+            match sort:
+                case "size":
+                    # the size of a directory is of its entry, not of its
+                    # files: directories go last, as shown, without one
+                    key = lambda item: (
+                        0 if item[1].is_dir(follow_symlinks=False)
+                        else _stat(item[1]).st_size
+                    )
+                case "mtime":
+                    key = lambda item: _stat(item[1]).st_mtime
+                case _:
+                    key = lambda item: item[0]
+            ordered: list[tuple[str, os.DirEntry]]
+            if limit is None:
+                ordered = sorted(entries, key=key, reverse=sort != "name")
+            elif sort == "name":
+                ordered = heapq.nsmallest(limit, entries, key=key)
+            else:
+                ordered = heapq.nlargest(limit, entries, key=key)
+            for relative, entry in ordered:
+                yield _line(relative, entry)
+
+    if page is None:
+        page = default_page_size()
+    print_paged(_lines(), page)
+
+@fn_parser.add_args(
+    "-j", "--jobs", type=int, default=None,
+    help="worker processes. Default: number of CPUs."
+)
+@fn_parser.add_args(
+    "-l", "--limit", type=int, default=None,
+    help="maximum of matches printed, all are still counted."
+)
+@fn_parser.add_args(
+    "-g", "--glob", default=None,
+    help="only search files matching this pattern. Ex.: '*.yaml'"
+)
+@fn_parser.add_args(
+    "-nl", "--literal_off", action="store_true",
+    help="When activated, value will be searched as str."
+)
+@fn_parser.add_args("-v", "--value", default=None, help="value of leaves.")
+@fn_parser.add_args(
+    "-k", "--key", default=None,
+    help="key of nodes, at any depth, can be a pattern."
+)
+@fn_parser.add_args(
+    "-p", "--path", default=None,
+    help="data path of nodes, its parts can be patterns. "
+    "Ex.: services/*/image"
+)
+@fn_parser.add_args("directory", nargs="?", default=".")
+@fn_parser.add_cmd("grep-data")
+def grep_data(
+    fn: "FileNavigator",
+    directory: str,
+    path: str | None,
+    key: str | None,
+    value: str | None,
+    literal_off: bool,
+    glob: str | None,
+    limit: int | None,
+    jobs: int | None
+) -> None:
+    """
+    Search every data file under directory for nodes in a data path,
+    with a key or with a value, parsing files in parallel processes.
+    """
+    if path is None and key is None and value is None:
+        logger.error("Give a data path (-p), a key (-k) or a value (-v).")
+        return
+
+    dirpath: Path = resolve_paths(fn.path, [directory])[0]
+    if not dirpath.is_dir():
+        logger.error(get_error_message("DirectoryNotFound", dirname=dirpath))
+        return
+
+    query: DataQuery = DataQuery(
+        path=tuple(part for part in path.split("/") if part) if path else None,
+        key=key,
+        has_value=value is not None,
+        value=value if literal_off or value is None else smart_cast(value)
+    )
+    filepaths: list[Path] = [
+        Path(entry.path)
+        for _, entry in scan_directory(dirpath, True, glob, SUPPORTED_FORMATS)
+    ]
+
+    started: float = time.perf_counter()
+    shown: int = 0
+    total_matches: int = 0
+    matched_files: int = 0
+    errors: list[tuple[Path, str]] = []
+    for filepath, matches, error in map_files(
+        grep_file, filepaths, query, jobs=jobs
+    ):
+        if error is not None:
+            errors.append((filepath, error))
+            continue
+        if matches:
+            matched_files += 1
+            total_matches += len(matches)
+        relative: Path = filepath.relative_to(dirpath)
+        for data_path, text in matches:
+            if limit is None or shown < limit:
+                print(f"{relative}: {data_path} = {text}", flush=True)
+                shown += 1
+
+    seconds: float = time.perf_counter() - started
+    for filepath, error in errors[:5]:
+        logger.error(f"Could not search {filepath}: {error}")
+    if limit is not None and total_matches > limit:
+        print(f"... {total_matches - limit:,} more matches")
+    print(
+        f"{total_matches:,} matches in {matched_files:,} of "
+        f"{len(filepaths):,} files, {len(errors):,} unreadable "
+        f"({len(filepaths) / max(seconds, 1e-9):,.0f} files/s)."
+    )
+
 @fn_parser.add_args("filepaths", nargs="+")
 @fn_parser.add_cmd("mk", "make")
 def make_files(fn: "FileNavigator",  filepaths: list[str]) -> None:
@@ -131,8 +387,7 @@ def move_file(
     new_source_path: Path = move_anything(source, destinations[0])
 
     if len(destinations) > 1:
-        for destination in destinations[1:]:
-            copy_anything(new_source_path, destination)
+        copy_into_destinations(new_source_path, list(destinations[1:]))
 
 @fn_parser.add_args("directory", nargs="?", type=str, default=".")
 @fn_parser.add_cmd("cd")
@@ -0,0 +1,259 @@
+"""
+Benchmark suite over the hot paths of the project.
+
+Deterministic nested documents are generated for every size asked, and
+each hot path is timed over them, reporting time, throughput and peak
+memory. Results can be saved as a baseline, and later runs compared
+against it, failing when something got slower than the threshold.
+
+### Example usage:
+
+$ python3 ./benchmarks/hot_paths.py --sizes 1000 10000 --save-baseline
+
+$ python3 ./benchmarks/hot_paths.py --sizes 1000 10000 --threshold 0.2
+"""
+
+import argparse
+from collections.abc import Callable
+import json
+from pathlib import Path
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any
+
+
+PROJECT_DIRPATH: Path = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_DIRPATH))
+
+from parsing.lexer import lexer, pre_parser
+from read_and_write import read_file, write_file
+from utils.data_utils import (
+    change_data_by_path, get_data_by_path, get_template, smart_cast
+)
+from widgets.data_editor import DataEditor
+
+
+DEFAULT_BASELINE_FILEPATH: Path = PROJECT_DIRPATH / "benchmarks/baseline.json"
+
+# lookups made per timed run, single ones are too fast to time
+LOOKUPS: int = 1000
+
+
+def make_document(
+    size: int,
+    depth: int = 3,
+    width: int = 4,
+    seed: int = 0
+) -> dict[str, Any]:
+    """
+    Generate a document with about size leaves: a list of records, each
+    a tree of dicts with given depth and width. Same arguments always
+    generate the same document.
+    """
+    rng = random.Random(seed)
+
+    def _leaf() -> Any:
+        match rng.randrange(4):
+            case 0:
+                return rng.randrange(-10**6, 10**6)
+            case 1:
+                return round(rng.uniform(-1000, 1000), 3)
+            case 2:
+                return rng.random() < 0.5
+            case _:
+                return "".join(rng.choices("abcdefghij klmnop", k=12))
+
+    def _node(level: int) -> dict[str, Any]:
+        if level == depth:
+            return {f"k{i}": _leaf() for i in range(width)}
+        node: dict[str, Any] = {
+            f"k{i}": _node(level + 1) for i in range(width)
+        }
+        node["tags"] = [f"tag{rng.randrange(100)}" for _ in range(width)]
+        return node
+
+    leaves_per_record: int = width ** depth + sum(
+        width ** level for level in range(1, depth)
+    )
+    records: int = max(1, size // leaves_per_record)
+    return {"records": [_node(1) for _ in range(records)]}
+
+def leaves_of(data: Any) -> list[Any]:
+    """Return every leaf of data."""
+    if isinstance(data, dict):
+        return [leaf for value in data.values() for leaf in leaves_of(value)]
+    if isinstance(data, list):
+        return [leaf for item in data for leaf in leaves_of(item)]
+    return [data]
+
+def deepest_path(document: dict[str, Any]) -> Path:
+    """Path to the deepest leaf of the last record."""
+    path: Path = Path("records") / str(len(document["records"]) - 1)
+    node: Any = get_data_by_path(document, path)
+    while isinstance(node, dict):
+        path /= "k0"
+        node = node["k0"]
+    return path
+
+def run_data_action(data: Any, command: list[str]) -> Any:
+    """Execute a DataEditor command over data, return the resulting data."""
+    de = DataEditor(data)
+    parsed: argparse.Namespace = de.parser.parse_args(command)
+    kwargs: dict[str, Any] = vars(parsed)
+    kwargs.pop("func")(de, **kwargs)
+    return de.data
+
+def make_benchmarks(
+    document: dict[str, Any],
+    tmp_dirpath: Path
+) -> dict[str, tuple[Callable[[], Any], int]]:
+    """
+    Return benchmarks over document, by name, as the function to be timed
+    and the number of items (leaves, lookups, ...) it processes.
+    """
+    leaves: list[Any] = leaves_of(document)
+    leaf_strings: list[str] = [repr(leaf) for leaf in leaves]
+    path: Path = deepest_path(document)
+    line: str = (
+        f"set -p {path.as_posix()} "
+        + "[" + ", ".join(leaf_strings[:len(leaf_strings) // 10 + 1]) + "]"
+    )
+
+    def _lookups() -> None:
+        for _ in range(LOOKUPS):
+            get_data_by_path(document, path)
+
+    def _changes() -> None:
+        for i in range(LOOKUPS):
+            change_data_by_path(document, path, i)
+
+    benchmarks: dict[str, tuple[Callable[[], Any], int]] = {}
+    for ext in (".json", ".toml", ".yaml"):
+        filepath: Path = tmp_dirpath / f"document{ext}"
+        write_file(filepath, document)
+        benchmarks[f"read{ext}"] = (lambda fp=filepath: read_file(fp), len(leaves))
+        benchmarks[f"write{ext}"] = (
+            lambda fp=filepath: write_file(fp, document), len(leaves)
+        )
+
+    benchmarks |= {
+        "get_data_by_path": (_lookups, LOOKUPS),
+        "change_data_by_path": (_changes, LOOKUPS),
+        "lexer": (lambda: lexer(line), len(line)),
+        "pre_parser": (lambda: pre_parser(line), len(line)),
+        "smart_cast": (lambda: [smart_cast(s) for s in leaf_strings], len(leaves)),
+        "get_template": (lambda: get_template(document), len(leaves)),
+        "del-key -r": (
+            lambda: run_data_action(document, ["del-key", "-r", "k1"]),
+            len(leaves)
+        ),
+        "del-val -r": (
+            lambda: run_data_action(document, ["del-val", "-r", "True"]),
+            len(leaves)
+        ),
+    }
+    return benchmarks
+
+def measure(function: Callable[[], Any], repeat: int) -> dict[str, float]:
+    """Median seconds of repeat runs of function, and its peak memory."""
+    # a first run warms up caches, like the lazily built command parsers,
+    # so their one-time allocations aren't counted in the peak memory.
+    function()
+    # memory is traced apart, tracemalloc slows down the timed runs.
+    tracemalloc.start()
+    function()
+    peak: int = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    times: list[float] = []
+    for _ in range(repeat):
+        started: float = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+
+    return {"seconds": statistics.median(times), "peak_bytes": peak}
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="Hot paths benchmark")
+    parser.add_argument(
+        "--sizes", nargs="+", type=int, default=[1000, 10000, 100000],
+        help="Approximate number of leaves of the generated documents."
+    )
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--width", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--only", nargs="+", default=None, help="Run only these benchmarks."
+    )
+    parser.add_argument(
+        "--baseline", type=Path, default=DEFAULT_BASELINE_FILEPATH,
+        help="Baseline JSON file to compare with or save into."
+    )
+    parser.add_argument(
+        "--save-baseline", action="store_true",
+        help="Save results as the new baseline instead of comparing."
+    )
+    parser.add_argument(
+        "--threshold", type=float, default=0.2,
+        help="Fail if a benchmark is this much slower than the baseline."
+    )
+    args = parser.parse_args()
+
+    baseline: dict[str, dict[str, float]] = {}
+    if not args.save_baseline and args.baseline.exists():
+        with open(args.baseline, "r", encoding="utf8") as file:
+            baseline = json.load(file)["results"]
+
+    results: dict[str, dict[str, float]] = {}
+    regressions: list[str] = []
+
+    print(f"{'benchmark':<22}{'size':>9}{'median ms':>12}{'items/s':>14}"
+          f"{'peak KB':>12}{'vs base':>9}")
+    for size in args.sizes:
+        document: dict[str, Any] = make_document(
+            size, args.depth, args.width, args.seed
+        )
+        with tempfile.TemporaryDirectory() as tmp_dirpath:
+            benchmarks = make_benchmarks(document, Path(tmp_dirpath))
+            for name, (function, items) in benchmarks.items():
+                if args.only and name not in args.only:
+                    continue
+
+                result: dict[str, float] = measure(function, args.repeat)
+                key: str = f"{name}@{size}"
+                results[key] = result
+
+                comparison: str = ""
+                if key in baseline:
+                    ratio: float = result["seconds"] / baseline[key]["seconds"]
+                    comparison = f"{ratio - 1:+.0%}"
+                    if ratio - 1 > args.threshold:
+                        regressions.append(key)
+
+                print(
+                    f"{name:<22}{size:>9}{result['seconds'] * 1000:>12.3f}"
+                    f"{items / result['seconds']:>14,.0f}"
+                    f"{result['peak_bytes'] / 1024:>12.1f}{comparison:>9}"
+                )
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf8") as file:
+            json.dump({"args": vars(args) | {"baseline": str(args.baseline)},
+                       "results": results}, file, indent=2)
+        print(f"Baseline saved at {args.baseline}.")
+        return 0
+
+    if regressions:
+        print(f"FAIL: slower than baseline by over {args.threshold:.0%}: "
+              + ", ".join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""
+Startup-time benchmark guarding the one-shot CLI path.
+
+Runs `main.py -i file.json -p key -s value` under `python -X importtime`
+and fails when the imports of the run exceed the time budget, or when a
+module that the CLI path must not need (codecs of other formats, REPL
+parsers and widgets) gets imported.
+
+### Example usage:
+
+$ python3 ./benchmarks/startup.py --budget-ms 100 --runs 5
+"""
+
+import argparse
+import json
+from pathlib import Path
+import statistics
+import subprocess
+import sys
+import tempfile
+
+
+PROJECT_DIRPATH: Path = Path(__file__).resolve().parent.parent
+
+# modules that a JSON one-shot edit has no reason to import
+FORBIDDEN_MODULES: tuple[str, ...] = (
+    "yaml", "toml", "actions", "widgets", "parsing", "pprint"
+)
+
+
+def parse_importtime(stderr: str) -> dict[str, int]:
+    """Return cumulative import time, in us, of every top-level import."""
+    top_level: dict[str, int] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        # nested imports are indented under the module importing them
+        if name.startswith("  "):
+            continue
+        top_level[name.strip()] = int(cumulative)
+    return top_level
+
+def imported_modules(stderr: str) -> set[str]:
+    """Return the name of every module imported, nested or not."""
+    return {
+        line.rsplit("|", 1)[1].strip()
+        for line in stderr.splitlines()
+        if line.startswith("import time:") and "[us]" not in line
+    }
+
+def time_cli_run(json_filepath: Path) -> tuple[int, set[str]]:
+    """Run one CLI edit, return its total import time (us) and modules."""
+    completed = subprocess.run(
+        [
+            sys.executable, "-X", "importtime", "main.py",
+            "-i", str(json_filepath), "-p", "key", "-s", "1"
+        ],
+        cwd=PROJECT_DIRPATH,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    total: int = sum(parse_importtime(completed.stderr).values())
+    return total, imported_modules(completed.stderr)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="Startup benchmark")
+    parser.add_argument(
+        "--budget-ms", type=float, default=100.0,
+        help="Maximum median import time of the CLI path, in ms."
+    )
+    parser.add_argument(
+        "--runs", type=int, default=5, help="Number of measured runs."
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dirpath:
+        json_filepath: Path = Path(tmp_dirpath) / "data.json"
+        json_filepath.write_text(json.dumps({"key": 0}), encoding="utf8")
+
+        totals: list[int] = []
+        modules: set[str] = set()
+        for _ in range(args.runs):
+            total, modules = time_cli_run(json_filepath)
+            totals.append(total)
+
+    median_ms: float = statistics.median(totals) / 1000
+    print(f"CLI import time: {median_ms:.1f}ms (budget {args.budget_ms}ms)")
+
+    failed: bool = False
+    leaked: list[str] = sorted(
+        module for module in modules
+        if module.split(".")[0] in FORBIDDEN_MODULES
+    )
+    if leaked:
+        print(f"FAIL: CLI path imported {', '.join(leaked)}")
+        failed = True
+    if median_ms > args.budget_ms:
+        print("FAIL: CLI import time is over budget")
+        failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
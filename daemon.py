@@ -0,0 +1,281 @@
+"""
+Local daemon that keeps parsed files resident in memory and serves
+CLI edits over a Unix domain socket.
+
+Every file is parsed once, on its first request, and kept in a DataEditor.
+Edits only change the data in memory, which is written back to disk every
+`flush_interval` seconds or when a `save` request arrives.
+
+### Example usage:
+
+$ python3 ./main.py --serve --flush_interval 5
+
+$ python3 ./main.py --socket -i path/to/file.json -p path/to/data -s value
+
+$ python3 ./main.py --socket --save
+
+Requests and responses are JSON objects, one per line. A `ping` request
+only tells the daemon is alive.
+"""
+
+import json
+import logging
+import os
+from pathlib import Path
+import signal
+import socket
+import socketserver
+import tempfile
+import threading
+from typing import Any
+
+from messages.messages import get_error_message
+from read_and_write import SUPPORTED_FORMATS, read_file, write_file
+from utils.chunked_list import LIST_TYPES
+from utils.compact_records import DICT_TYPES
+from utils.data_utils import (
+    cast_if_true, change_data_by_path, get_data_by_path
+)
+from utils.profiling import profiler
+from widgets.data_editor import DataEditor
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET_PATH: Path = (
+    Path(tempfile.gettempdir()) / f"terminal-data-editor-{os.getuid()}.sock"
+)
+
+
+class DaemonError(Exception):
+    """Error of a request, sent back to the client instead of raised."""
+    pass
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    """Answer every request line of a client connection."""
+    def handle(self) -> None:
+        for line in self.rfile:
+            response: dict[str, Any]
+            try:
+                request: dict[str, Any] = json.loads(line)
+                response = self.server.dispatch(request)
+            except (DaemonError, ValueError, IndexError, OSError) as e:
+                response = {"ok": False, "error": str(e)}
+            except Exception as e:
+                # any request failing gets an answer, the handler goes on
+                logger.exception(f"Request failed: {line!r}")
+                response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            self.wfile.write(json.dumps(response).encode("utf8") + b"\n")
+
+class DataServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Server holding a DataEditor per file it was asked to edit."""
+    daemon_threads = True
+
+    def __init__(
+        self,
+        socket_path: Path,
+        flush_interval: float = 5,
+        compact: str | None = None
+    ) -> None:
+        """
+        Args:
+            socket_path: Where the Unix domain socket is bound.
+            flush_interval: Seconds between write-backs of the edited
+                files. Zero or less means only writing on `save` requests.
+            compact: Mode of COMPACT_MODES the files are read in, their
+                dicts kept as compact records. None reads them as is.
+        """
+        self.socket_path = socket_path
+        self.flush_interval = flush_interval
+        self.compact = compact
+        self.data_editors: dict[Path, DataEditor] = {}
+        self.dirty: set[Path] = set()
+        self.lock = threading.Lock()
+        # profiled requests run one at a time, their measures would mix
+        self.profile_lock = threading.Lock()
+        self.stop_flushing = threading.Event()
+
+        super().__init__(str(socket_path), RequestHandler)
+
+    def get_editor(self, filepath: Path) -> DataEditor:
+        """Return the resident DataEditor of filepath, parsing it if needed."""
+        de: DataEditor | None = self.data_editors.get(filepath)
+        if de is None:
+            if filepath.suffix.lower() not in SUPPORTED_FORMATS:
+                raise DaemonError(get_error_message(
+                    "UnsupportedFormat",
+                    format=filepath.suffix,
+                    supported=str(SUPPORTED_FORMATS)
+                ))
+            try:
+                data: Any = read_file(filepath, self.compact)
+            except FileNotFoundError:
+                raise DaemonError(
+                    get_error_message("FileNotFound", filename=filepath)
+                )
+            de = DataEditor(data, filepath)
+            self.data_editors[filepath] = de
+        return de
+
+    def dispatch(self, request: dict[str, Any]) -> dict[str, Any]:
+        """Execute request and return its response, measured if profiling."""
+        if not profiler.enabled:
+            return self._dispatch(request)
+        with self.profile_lock, profiler.profile(str(request.get("command"))):
+            return self._dispatch(request)
+
+    def _dispatch(self, request: dict[str, Any]) -> dict[str, Any]:
+        match request.get("command"):
+            case "change":
+                self.change(
+                    [Path(fp) for fp in request["input_files"]],
+                    Path(request["path"]),
+                    request["set"],
+                    request.get("literal_off", False)
+                )
+                return {"ok": True}
+            case "save":
+                input_files: list[str] | None = request.get("input_files")
+                filepaths: list[Path] | None = None
+                if input_files:
+                    filepaths = [Path(fp) for fp in input_files]
+                return {"ok": True, "saved": self.flush(filepaths)}
+            case "ping":
+                # tells the daemon is alive, changing nothing
+                return {"ok": True}
+            case command:
+                raise DaemonError(f"Unknown command: {command}")
+
+    def change(
+        self,
+        filepaths: list[Path],
+        data_path: Path,
+        new_values: list[str],
+        literal_off: bool
+    ) -> None:
+        """change value of given data_path in the resident files."""
+        values: list[Any] = cast_if_true(new_values, not literal_off)
+        if len(filepaths) != len(values):
+            if len(values) != 1:
+                raise DaemonError(
+                    "Give a new_value per file or a single value for every file."
+                )
+            values = values * len(filepaths)
+
+        with self.lock:
+            # every file is checked before any is changed
+            editors: list[DataEditor] = [
+                self.get_editor(filepath) for filepath in filepaths
+            ]
+            for filepath, de in zip(filepaths, editors):
+                check_settable(de.data, data_path, filepath)
+
+            for filepath, de, new_value in zip(filepaths, editors, values):
+                de.data = change_data_by_path(de.data, data_path, new_value)
+                self.dirty.add(filepath)
+
+    def flush(self, filepaths: list[Path] | None = None) -> list[str]:
+        """Write dirty files back to disk, return the written ones."""
+        saved: list[str] = []
+        with self.lock:
+            targets: set[Path] = self.dirty
+            if filepaths is not None:
+                targets = self.dirty.intersection(filepaths)
+
+            for filepath in list(targets):
+                write_file(filepath, self.data_editors[filepath].data)
+                self.dirty.discard(filepath)
+                saved.append(str(filepath))
+        return saved
+
+    def flush_periodically(self) -> None:
+        """Flush dirty files every flush_interval until stopped."""
+        while not self.stop_flushing.wait(self.flush_interval):
+            for filepath in self.flush():
+                logger.info(f"Saved at {filepath}.")
+
+    def server_close(self) -> None:
+        """Stop flushing, write what is left and remove the socket file."""
+        self.stop_flushing.set()
+        self.flush()
+        super().server_close()
+        self.socket_path.unlink(missing_ok=True)
+
+def serve(
+    socket_path: Path = DEFAULT_SOCKET_PATH,
+    flush_interval: float = 5,
+    compact: str | None = None
+) -> None:
+    """Run the daemon until interrupted."""
+    if socket_path.exists():
+        # a socket file nobody answers is a leftover of a killed daemon
+        try:
+            send_request({"command": "ping"}, socket_path)
+        except DaemonError:
+            socket_path.unlink()
+        else:
+            logger.error(f"A daemon is already serving at {socket_path}.")
+            return
+
+    def _terminate(*_) -> None:
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, _terminate)
+
+    with DataServer(socket_path, flush_interval, compact) as server:
+        if flush_interval > 0:
+            threading.Thread(
+                target=server.flush_periodically, daemon=True
+            ).start()
+
+        logger.info(f"Serving at {socket_path}.")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+def check_settable(data: Any, data_path: Path, filepath: Path) -> None:
+    """Raise DaemonError if data_path of data can't be set."""
+    if data_path.as_posix() == ".":
+        return
+    try:
+        parent: Any = get_data_by_path(data, data_path.parent)
+    except IndexError as e:
+        raise DaemonError(f"{filepath}: {e}") from e
+
+    name: str = data_path.name
+    if isinstance(parent, DICT_TYPES):
+        return
+    if isinstance(parent, LIST_TYPES):
+        if name.isdigit() and int(name) < len(parent):
+            return
+        raise DaemonError(
+            f"{filepath}: {name} is not an index of the list at "
+            f"{data_path.parent.as_posix()}."
+        )
+    raise DaemonError(
+        f"{filepath}: cannot set {name} in the {type(parent).__name__} "
+        f"at {data_path.parent.as_posix()}."
+    )
+
+def send_request(
+    request: dict[str, Any],
+    socket_path: Path = DEFAULT_SOCKET_PATH
+) -> dict[str, Any]:
+    """Send request to the daemon and return its response."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(str(socket_path))
+        except (FileNotFoundError, ConnectionRefusedError):
+            raise DaemonError(f"No daemon is serving at {socket_path}.")
+        client.sendall(json.dumps(request).encode("utf8") + b"\n")
+        with client.makefile("rb") as stream:
+            line: bytes = stream.readline()
+        if not line:
+            raise DaemonError(
+                "The daemon closed the connection without answering."
+            )
+        try:
+            return json.loads(line)
+        except ValueError as e:
+            raise DaemonError(f"Invalid answer from the daemon: {e}") from e
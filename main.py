@@ -30,27 +30,54 @@ $ python3 ./main.py -i path/to/file.json
 - `exit`  
   Exits the program.
 
+### Example usage as a daemon:
+
+$ python3 ./main.py --serve
+
+Keeps the edited files parsed in memory, so CLI edits sent with `--socket`
+don't parse and dump the whole file each time:
+
+$ python3 ./main.py --socket -i path/to/file.json -p path/to/data -s value
+
+### Example usage of queries:
+
+$ python3 ./main.py -i users.json -q '.users[] | select(.age > 30) | .email'
+
+### Example usage with big tabular files:
+
+$ python3 ./main.py -i events.jsonl --compact_records values
+
+Reads the records with the keys of each shape stored once, and their
+repeated short strings shared, using several times less memory.
+
 """
 
 import argparse
+from collections.abc import Iterator
+import contextlib
+import logging
 from pathlib import Path
 from typing import Any
 
-from read_and_write import read_file
-from utils.data_utils import cast_if_true, change_data_in_file
-from widgets.data_editor import DataEditor
-from widgets.file_navigator import FileNavigator
-from widgets.widget_manager import WidgetManager
+from utils.data_utils import (
+    cast_if_true, change_data_in_file, iter_input_files
+)
 
 
+logger = logging.getLogger(__name__)
+
 def main():
     """CLI Logic along with the REPL ambient composition."""
+    # GLOBAL LOGGING CONFIGURATION
+    logging.basicConfig(level=logging.DEBUG)
+    logging.getLogger("asyncio").setLevel(logging.WARNING)
+
     parser = argparse.ArgumentParser(prog="Command Line Data Editor")
 
     parser.add_argument(
         "-i", "--input_files",
         nargs="+",
-        help="JSON file directory's.",
+        help="Data files, or quoted glob patterns: 'configs/**/*.yaml'.",
         type=str,
         default=None
     )
@@ -76,38 +103,247 @@ def main():
         action="store_true"
     )
 
+    parser.add_argument(
+        "--dry_run", "--dry-run",
+        help="Print old -> new values per file, without writing them.",
+        action="store_true"
+    )
+
+    parser.add_argument(
+        "--atomic",
+        help="Change every input file or, if any fails, none of them.",
+        action="store_true"
+    )
+
+    parser.add_argument(
+        "--recover",
+        nargs="?",
+        help="Roll interrupted --atomic changes forward (default) or back.",
+        choices=["forward", "back"],
+        const="forward",
+        default=None
+    )
+
+    parser.add_argument(
+        "-q", "--query",
+        help="Print the results of a jq-like query over the input files. "
+        "Ex.: '.users[] | select(.age > 30) | .email'",
+        type=str,
+        default=None
+    )
+
+    parser.add_argument(
+        "--compact",
+        help="With --query, print a line per result.",
+        action="store_true"
+    )
+
+    parser.add_argument(
+        "--compact_records", "--compact-records",
+        nargs="?",
+        help="Read files with their records sharing their keys, to save "
+        "memory; 'values' also shares their repeated short strings.",
+        choices=["keys", "values"],
+        const="keys",
+        default=None
+    )
+
     parser.add_argument(
         "-mk", "--make", 
         help="Make file if does not exist.",
         action="store_true"
     )
 
+    parser.add_argument(
+        "--autosave",
+        help="Seconds between background saves of modified editors.",
+        default=0.0,
+        type=float
+    )
+
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        help="Measure commands, exporting as JSON into this file at exit.",
+        const="",
+        default=None,
+        type=str
+    )
+
+    parser.add_argument(
+        "--cprofile",
+        help="With --profile, keep cProfile output of the slowest commands.",
+        action="store_true"
+    )
+
+    parser.add_argument(
+        "--serve",
+        help="Run as a daemon keeping files in memory to serve CLI edits.",
+        action="store_true"
+    )
+
+    parser.add_argument(
+        "--socket",
+        nargs="?",
+        help="Send the CLI edit to the daemon listening at this socket.",
+        const="",
+        default=None,
+        type=str
+    )
+
+    parser.add_argument(
+        "--flush_interval",
+        help="Seconds between daemon write-backs, 0 to only write on save.",
+        default=5.0,
+        type=float
+    )
+
+    parser.add_argument(
+        "--save",
+        help="Ask the daemon to write the input files (or all) to disk.",
+        action="store_true"
+    )
+
     args = parser.parse_args()
 
+    if args.recover is not None:
+        from utils.journal_utils import recover
+
+        recovered: int = recover(forward=args.recover == "forward")
+        logger.info(f"Recovered {recovered} interrupted transactions.")
+        return
+
+    if args.profile is None:
+        run_mode(args)
+        return
+
+    from utils.profiling import profiler
+
+    profiler.start(args.cprofile)
+    try:
+        run_mode(args)
+    finally:
+        profiler.dump(Path(args.profile) if args.profile else None)
+
+def run_mode(args: argparse.Namespace) -> None:
+    """Run the query, daemon, REPL or CLI edit mode of given arguments."""
+    if args.query is not None:
+        run_query_mode(args)
+    elif args.serve or args.socket is not None:
+        run_daemon_mode(args)
+    else:
+        run(args)
+
+def profiled(args: argparse.Namespace, name: str) -> Any:
+    """Context measuring its block as a run of name, with --profile."""
+    if args.profile is None:
+        return contextlib.nullcontext()
+    from utils.profiling import profiler
+    return profiler.profile(name)
+
+def run(args: argparse.Namespace) -> None:
+    """Run the REPL or the CLI edit of given arguments."""
     path: Path = Path(args.path)
     literal: bool = not args.literal_off
 
     if args.set is None:
+        # REPL widgets are only imported when the REPL is going to run,
+        # so one-shot CLI edits don't pay for them.
+        from widgets.data_editor import DataEditor
+        from widgets.file_navigator import FileNavigator
+        from widgets.widget_manager import WidgetManager
+
         data_editors: list[DataEditor] = []
         if args.input_files:
             # for each file given, an editor of it will be opened.
+            # its data is loaded in the background once the REPL starts.
             for filename in args.input_files: 
-                data: Any = read_file(filename)
-                de = DataEditor(data, filename, Path(), literal)
+                de = DataEditor(None, filename, Path(), literal)
+                de.status = "loading"
                 data_editors.append(de)
         # the REPL ambient is composed by a file explorer (>>> explorer)
         # and tabs of data editors (>>> editor)
         fn: FileNavigator = FileNavigator()
-        wm: WidgetManager = WidgetManager(data_editors, fn)
+        wm: WidgetManager = WidgetManager(
+            data_editors, fn, args.autosave, args.compact_records
+        )
         wm.run()
 
     else:
-        filepaths: list[Path]
-        filepaths = [(Path.cwd() / fp).resolve() for fp in args.input_files]
+        # glob patterns are expanded while files are being changed
+        filepaths: Iterator[Path] = iter_input_files(
+            args.input_files, Path.cwd()
+        )
 
         new_values: Any = cast_if_true(args.set, not args.literal_off)
 
-        change_data_in_file(filepaths, path, new_values)
+        with profiled(args, "change"):
+            change_data_in_file(
+                filepaths, path, new_values, args.dry_run, args.atomic
+            )
+
+
+def run_query_mode(args: argparse.Namespace) -> None:
+    """Print the results of the query over each input file."""
+    from parsing.query_parser import (
+        Plan, QueryError, compile_query, format_result
+    )
+    from read_and_write import read_file
+    from utils.data_utils import get_data_by_path
+
+    try:
+        plan: Plan = compile_query(args.query)
+    except QueryError as e:
+        logger.error(f"Bad query: {e}")
+        return
+
+    for filepath in iter_input_files(args.input_files or [], Path.cwd()):
+        try:
+            with profiled(args, "query"):
+                data: Any = get_data_by_path(
+                    read_file(filepath), Path(args.path)
+                )
+                for result in plan.run(data):
+                    print(format_result(result, args.compact))
+        except (OSError, IndexError, ValueError, QueryError) as e:
+            logger.error(f"{filepath}: {e}")
+
+def run_daemon_mode(args: argparse.Namespace) -> None:
+    """Serve as the daemon or send the CLI edit to it."""
+    from daemon import DEFAULT_SOCKET_PATH, DaemonError, send_request, serve
+
+    socket_path: Path = Path(args.socket) if args.socket else DEFAULT_SOCKET_PATH
+
+    if args.serve:
+        serve(socket_path, args.flush_interval, args.compact_records)
+        return
+
+    filepaths: list[str] = [
+        str((Path.cwd() / fp).resolve()) for fp in args.input_files or []
+    ]
+
+    requests: list[dict[str, Any]] = []
+    if args.set is not None:
+        requests.append({
+            "command": "change",
+            "input_files": filepaths,
+            "path": args.path,
+            "set": args.set,
+            "literal_off": args.literal_off
+        })
+    if args.save:
+        requests.append({"command": "save", "input_files": filepaths})
+
+    for request in requests:
+        try:
+            with profiled(args, f"socket {request['command']}"):
+                response: dict[str, Any] = send_request(request, socket_path)
+        except DaemonError as e:
+            logger.error(e)
+            return
+        if not response["ok"]:
+            logger.error(response["error"])
+            return
 
 
 if __name__ == "__main__":
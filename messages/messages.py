@@ -6,22 +6,30 @@ from pathlib import Path
 import logging
 
 
-# GLOBAL LOGGING CONFIGURATION
-logging.basicConfig(level=logging.DEBUG)
 # add handler for debugging messages
 logger = logging.getLogger(__name__)
 
 
-error_messages_filepath: Path = (Path.cwd() / "messages/en_US.json").resolve()
+# catalogs are stored next to this module, not relative to the cwd
+messages_dirpath: Path = Path(__file__).resolve().parent
+
 # TO-DO: change name to error_messages
-with open(error_messages_filepath, "r", encoding="utf8") as file:
-    error_msg = json.load(file)
+# loaded on first use, so importing this module does not touch the disk
+error_msg: dict[str, str] = {}
+
+def load_messages(language: str = "en_US") -> dict[str, str]:
+    """Load the error messages catalog if it was not loaded yet."""
+    if not error_msg:
+        error_messages_filepath: Path = messages_dirpath / f"{language}.json"
+        with open(error_messages_filepath, "r", encoding="utf8") as file:
+            error_msg.update(json.load(file))
+    return error_msg
 
 def change_language(language: str) -> None:
-    global error_msg
+    load_messages()
 
     error_messages_filepath: Path = (
-        Path.cwd() / f"messages/errors_{language}.json"
+        messages_dirpath / f"errors_{language}.json"
     ).resolve()
     with open(error_messages_filepath, "r", encoding="utf8") as file:
         new_errors = json.load(file)
@@ -29,9 +37,9 @@ def change_language(language: str) -> None:
 
 def get_error_message(error_name: str, **kwargs) -> str:
     """Get error message based on its name and kwargs"""
-    message = error_msg.get(error_name, f"{error_name} - Unknown error.")
+    message = load_messages().get(error_name, f"{error_name} - Unknown error.")
     try:
         formatted_message = message.format(**kwargs)
     except KeyError as e:
         formatted_message = f"{message} (Missing key: {e})"
-    return formatted_message
\ No newline at end of file
+    return formatted_message
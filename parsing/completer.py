@@ -0,0 +1,170 @@
+"""
+Readline tab completion for the REPL commands and DataEditor data paths.
+
+Keys of a data node are only listed when a completion first reaches it.
+They are kept sorted, so every following completion in that node is a
+binary search, even for dicts with hundreds of thousands of keys.
+"""
+
+from bisect import bisect_left
+import logging
+from pathlib import Path
+from typing import Any, TYPE_CHECKING
+
+from utils.chunked_list import CONTAINER_TYPES, LIST_TYPES
+from utils.compact_records import DICT_TYPES
+from utils.data_utils import get_data_by_path
+
+try:
+    import readline
+except ImportError:  # not available on every platform (e.g. Windows)
+    readline = None
+
+
+logger = logging.getLogger(__name__)
+
+if TYPE_CHECKING:
+    from widgets.widget_manager import WidgetManager
+
+
+class KeyCache:
+    """Sorted keys of data nodes, listed on first use and kept until changed."""
+    def __init__(self) -> None:
+        self.nodes: dict[tuple[str, ...], list[str]] = {}
+        # keys that hold a dict or a list, so they complete with a "/"
+        self.containers: dict[tuple[str, ...], set[str]] = {}
+
+    def keys(self, data: Any, parts: tuple[str, ...]) -> list[str]:
+        """Return sorted keys of the node of data in given path parts."""
+        keys: list[str] | None = self.nodes.get(parts)
+        if keys is not None:
+            return keys
+
+        node: Any = get_data_by_path(data, Path(*parts))
+        items: Any
+        if isinstance(node, DICT_TYPES):
+            items = node.items()
+        elif isinstance(node, LIST_TYPES):
+            items = enumerate(node)
+        else:
+            items = ()
+
+        keys = []
+        containers: set[str] = set()
+        for key, value in items:
+            key = str(key)
+            keys.append(key)
+            if isinstance(value, CONTAINER_TYPES):
+                containers.add(key)
+        keys.sort()
+
+        self.nodes[parts] = keys
+        self.containers[parts] = containers
+        return keys
+
+    def complete(
+        self,
+        data: Any,
+        parts: tuple[str, ...],
+        prefix: str
+    ) -> list[str]:
+        """Return the keys of node in parts that start with prefix."""
+        keys: list[str] = self.keys(data, parts)
+        containers: set[str] = self.containers[parts]
+
+        matches: list[str] = []
+        i: int = bisect_left(keys, prefix)
+        while i < len(keys) and keys[i].startswith(prefix):
+            key: str = keys[i]
+            matches.append(f"{key}/" if key in containers else key)
+            i += 1
+        return matches
+
+    def invalidate(self, parts: tuple[str, ...] = ()) -> None:
+        """
+        Forget nodes that changing the data in given path parts may have
+        changed: its parent (it may have a new key) and everything under it.
+        """
+        if not parts:
+            self.nodes.clear()
+            self.containers.clear()
+            return
+
+        parent: tuple[str, ...] = parts[:-1]
+        for node_parts in list(self.nodes):
+            if node_parts == parent or node_parts[:len(parts)] == parts:
+                del self.nodes[node_parts]
+                del self.containers[node_parts]
+
+class REPLCompleter:
+    """Readline completer of the WidgetManager REPL."""
+    def __init__(self, wm: "WidgetManager") -> None:
+        self.wm = wm
+        self.matches: list[str] = []
+
+    def __call__(self, text: str, state: int) -> str | None:
+        """Readline completer protocol: return the state-th match of text."""
+        if state == 0:
+            try:
+                self.matches = self.get_matches(text)
+            except Exception as e:  # never let completion break the prompt
+                logger.debug(e)
+                self.matches = []
+        if state < len(self.matches):
+            return self.matches[state]
+        return None
+
+    def get_matches(self, text: str) -> list[str]:
+        """Return command names or data paths that complete text."""
+        line: str = readline.get_line_buffer()
+        is_command: bool = not line[:readline.get_begidx()].strip()
+
+        if is_command:
+            names: list[str] = (
+                self.wm.parser.command_names()
+                + self.wm.active_widget.parser.command_names()
+            )
+            return sorted(name for name in set(names) if name.startswith(text))
+
+        from widgets.data_editor import DataEditor
+
+        de: Any = self.wm.active_widget
+        if not isinstance(de, DataEditor) or de.status == "loading":
+            return []
+        return complete_data_path(de, text)
+
+def complete_data_path(de: Any, text: str) -> list[str]:
+    """Return the data paths of de that complete text."""
+    head, _, prefix = text.rpartition("/")
+
+    parts: list[str] = [] if text.startswith("/") else list(de.path.parts)
+    for part in Path(head).parts if head else ():
+        if part == "/" or part == ".":
+            continue
+        if part == "..":
+            if parts:
+                parts.pop()
+        else:
+            parts.append(part)
+
+    try:
+        keys: list[str] = de.key_cache.complete(de.data, tuple(parts), prefix)
+    except IndexError:
+        return []
+
+    # completions replace the whole text, so they keep what was typed
+    typed: str = text[:len(text) - len(prefix)]
+    return [f"{typed}{key}" for key in keys]
+
+def install_completer(wm: "WidgetManager") -> None:
+    """Set readline to complete the REPL input of wm, if available."""
+    if readline is None:
+        return
+
+    readline.set_completer(REPLCompleter(wm))
+    # data paths are completed as a whole, "/" included
+    readline.set_completer_delims(" \t\n")
+    if "libedit" in (readline.__doc__ or ""):
+        readline.parse_and_bind("bind ^I rl_complete")
+    else:
+        readline.parse_and_bind("tab: complete")
@@ -0,0 +1,923 @@
+"""
+Module for jq-like queries over data.
+
+A query is compiled once into a plan: a tree of closures that walk only
+the branches of the data the query names, with consecutive key lookups
+(.spec.containers[0].image) fused into a single step and expressions that
+always give a single value (.age > 30) computed without generators.
+Results are streamed, so the first ones are shown before the whole data
+is visited.
+
+Supported: . .key ."key" .[0] .[-1] .[1:3] .[] .. ? | , literals,
+[...] and {key, key: value, (expr): value} constructions, == != < <= > >=
++ - * / % and or // if-then-elif-else-end, and the functions in FUNCTIONS.
+
+### Example usage:
+
+plan = compile_query(".users[] | select(.age > 30) | .email")
+for email in plan.run(data):
+    print(email)
+"""
+
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import chain, islice, product
+import json
+import operator
+import re
+from typing import Any
+
+from utils.chunked_list import LIST_TYPES, ChunkedList
+from utils.compact_records import DICT_TYPES, CompactRecord
+
+
+class QueryError(Exception):
+    """A query has bad syntax, or can't be run over some data."""
+    pass
+
+@dataclass(frozen=True)
+class Plan:
+    """
+    Compiled query. run(data) gives its results, value(data) is set when
+    there is always exactly one result, and gives it directly.
+    """
+    run: Callable[[Any], Iterable[Any]]
+    value: Callable[[Any], Any] | None = None
+
+def _single(function: Callable[[Any], Any]) -> Plan:
+    return Plan(lambda data: (function(data),), function)
+
+IDENTITY: Plan = _single(lambda data: data)
+
+
+# TOKENIZER
+
+TOKEN_RE: re.Pattern = re.compile(r"""
+    (?P<number>\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+  | (?P<string>"(?:[^"\\]|\\.)*")
+  | (?P<field>\.[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<op>\.\.|==|!=|<=|>=|//|[.\[\]{}(),:;|<>+\-*/%?])
+""", re.VERBOSE)
+
+KEYWORDS: tuple[str, ...] = (
+    "and", "or", "if", "then", "elif", "else", "end"
+)
+
+
+def tokenize(text: str) -> list[tuple[str, str, int]]:
+    """Return (kind, text, position) of the tokens of a query."""
+    tokens: list[tuple[str, str, int]] = []
+    position: int = 0
+    while position < len(text):
+        if text[position].isspace():
+            position += 1
+            continue
+        match: re.Match | None = TOKEN_RE.match(text, position)
+        if match is None:
+            raise QueryError(f"Unexpected {text[position]!r} at {position}.")
+        kind: str = match.lastgroup
+        if kind == "name" and match.group() in KEYWORDS:
+            kind = "op"
+        tokens.append((kind, match.group(), position))
+        position = match.end()
+    tokens.append(("end", "", len(text)))
+    return tokens
+
+
+# PARSER: query text -> tree of tuples, ("kind", *operands)
+
+class _Parser:
+    """Recursive descent parser, from the lowest precedence up."""
+    def __init__(self, text: str) -> None:
+        self.tokens: list[tuple[str, str, int]] = tokenize(text)
+        self.i: int = 0
+
+    def peek(self, offset: int = 0) -> tuple[str, str, int]:
+        return self.tokens[min(self.i + offset, len(self.tokens) - 1)]
+
+    def accept(self, text: str) -> bool:
+        kind, token, _ = self.peek()
+        if kind == "op" and token == text:
+            self.i += 1
+            return True
+        return False
+
+    def expect(self, text: str) -> None:
+        if not self.accept(text):
+            kind, token, position = self.peek()
+            found: str = repr(token) if kind != "end" else "end of query"
+            raise QueryError(f"Expected {text!r}, found {found} at {position}.")
+
+    def parse(self) -> tuple:
+        node: tuple = self.pipe()
+        if self.peek()[0] != "end":
+            _, token, position = self.peek()
+            raise QueryError(f"Unexpected {token!r} at {position}.")
+        return node
+
+    def pipe(self) -> tuple:
+        node: tuple = self.comma()
+        while self.accept("|"):
+            node = ("pipe", node, self.comma())
+        return node
+
+    def comma(self) -> tuple:
+        node: tuple = self.alternative()
+        while self.accept(","):
+            node = ("comma", node, self.alternative())
+        return node
+
+    def alternative(self) -> tuple:
+        node: tuple = self.disjunction()
+        if self.accept("//"):
+            node = ("alternative", node, self.alternative())
+        return node
+
+    def disjunction(self) -> tuple:
+        node: tuple = self.conjunction()
+        while self.accept("or"):
+            node = ("or", node, self.conjunction())
+        return node
+
+    def conjunction(self) -> tuple:
+        node: tuple = self.comparison()
+        while self.accept("and"):
+            node = ("and", node, self.comparison())
+        return node
+
+    def comparison(self) -> tuple:
+        node: tuple = self.additive()
+        for op in ("==", "!=", "<=", ">=", "<", ">"):
+            if self.accept(op):
+                return ("binary", op, node, self.additive())
+        return node
+
+    def additive(self) -> tuple:
+        node: tuple = self.multiplicative()
+        while True:
+            for op in ("+", "-"):
+                if self.accept(op):
+                    node = ("binary", op, node, self.multiplicative())
+                    break
+            else:
+                return node
+
+    def multiplicative(self) -> tuple:
+        node: tuple = self.unary()
+        while True:
+            for op in ("*", "/", "%"):
+                if self.accept(op):
+                    node = ("binary", op, node, self.unary())
+                    break
+            else:
+                return node
+
+    def unary(self) -> tuple:
+        if self.accept("-"):
+            return ("negative", self.unary())
+        return self.postfix()
+
+    def postfix(self) -> tuple:
+        """A term followed by lookups: .key ."key" [0] [1:2] [] and ?"""
+        node: tuple
+        steps: list[tuple]
+        kind, token, position = self.peek()
+        if kind == "field":
+            self.i += 1
+            node, steps = ("identity",), [("field", token[1:])]
+        elif kind == "op" and token == "." and self._adjacent("string"):
+            self.i += 1
+            node, steps = ("identity",), [("field", self._string())]
+        else:
+            node, steps = self.term(), []
+
+        while True:
+            kind, token, position = self.peek()
+            if kind == "field":
+                self.i += 1
+                steps.append(("field", token[1:]))
+            elif kind == "op" and token == "." and self._adjacent("string"):
+                self.i += 1
+                steps.append(("field", self._string()))
+            elif kind == "op" and token == "[":
+                self.i += 1
+                steps.append(self.brackets())
+            elif kind == "op" and token == "." and self.peek(1)[1] == "[":
+                self.i += 2
+                steps.append(self.brackets())
+            elif self.accept("?"):
+                node, steps = ("try", _with_steps(node, steps)), []
+            else:
+                return _with_steps(node, steps)
+
+    def brackets(self) -> tuple:
+        """What follows a [ in a lookup, up to its ]."""
+        if self.accept("]"):
+            return ("iterate",)
+        start: Any = None if self.peek()[1] == ":" else self.literal_index()
+        if self.accept(":"):
+            end: Any = None if self.peek()[1] == "]" else self.literal_index()
+            if isinstance(start, str) or isinstance(end, str):
+                raise QueryError(
+                    f"Slice bounds must be numbers at {self.peek()[2]}."
+                )
+            self.expect("]")
+            return ("slice", start, end)
+        self.expect("]")
+        return ("index", start)
+
+    def literal_index(self) -> Any:
+        negative: bool = self.accept("-")
+        kind, token, position = self.peek()
+        if kind == "string" and not negative:
+            return self._string()
+        if kind == "number" and token.isdigit():
+            self.i += 1
+            return -int(token) if negative else int(token)
+        raise QueryError(
+            f"Expected a literal key or index at {position}."
+        )
+
+    def term(self) -> tuple:
+        kind, token, position = self.peek()
+        self.i += 1
+        if kind == "number":
+            number: float = float(token)
+            return ("literal", int(number) if number.is_integer() else number)
+        if kind == "string":
+            self.i -= 1
+            return ("literal", self._string())
+        if kind == "name":
+            return self.call(token)
+
+        match token:
+            case ".":
+                return ("identity",)
+            case "..":
+                return ("recurse",)
+            case "(":
+                node: tuple = self.pipe()
+                self.expect(")")
+                return node
+            case "[":
+                if self.accept("]"):
+                    return ("array", None)
+                node = self.pipe()
+                self.expect("]")
+                return ("array", node)
+            case "{":
+                return self.object()
+            case "if":
+                return self.condition()
+        found: str = repr(token) if kind != "end" else "end of query"
+        raise QueryError(f"Unexpected {found} at {position}.")
+
+    def call(self, name: str) -> tuple:
+        if name in ("true", "false", "null"):
+            return ("literal", {"true": True, "false": False}.get(name))
+        args: list[tuple] = []
+        if self.accept("("):
+            args.append(self.pipe())
+            while self.accept(";"):
+                args.append(self.pipe())
+            self.expect(")")
+        if (name, len(args)) not in FUNCTIONS:
+            raise QueryError(f"Unknown function {name}/{len(args)}.")
+        return ("call", name, tuple(args))
+
+    def object(self) -> tuple:
+        entries: list[tuple[tuple, tuple]] = []
+        while not self.accept("}"):
+            if entries:
+                self.expect(",")
+            kind, token, position = self.peek()
+            key: tuple
+            if kind in ("name", "string"):
+                name: str = self._string() if kind == "string" else token
+                if kind == "name":
+                    self.i += 1
+                key = ("literal", name)
+                if not self.accept(":"):
+                    # {name} is {name: .name}
+                    entries.append((key, ("path", (("field", name),))))
+                    continue
+            elif self.accept("("):
+                key = self.pipe()
+                self.expect(")")
+                self.expect(":")
+            else:
+                raise QueryError(f"Bad object key {token!r} at {position}.")
+            entries.append((key, self.alternative()))
+        return ("object", tuple(entries))
+
+    def condition(self) -> tuple:
+        test: tuple = self.pipe()
+        self.expect("then")
+        then: tuple = self.pipe()
+        otherwise: tuple
+        if self.accept("elif"):
+            otherwise = self.condition()
+            return ("if", test, then, otherwise)
+        otherwise = self.pipe() if self.accept("else") else ("identity",)
+        self.expect("end")
+        return ("if", test, then, otherwise)
+
+    def _adjacent(self, kind: str) -> bool:
+        """If the next token is a . right before a token of kind."""
+        _, _, position = self.peek()
+        next_kind, _, next_position = self.peek(1)
+        return next_kind == kind and next_position == position + 1
+
+    def _string(self) -> str:
+        _, token, position = self.peek()
+        self.i += 1
+        try:
+            return json.loads(token)
+        except json.JSONDecodeError:
+            raise QueryError(f"Bad string {token} at {position}.")
+
+def _with_steps(node: tuple, steps: list[tuple]) -> tuple:
+    if not steps:
+        return node
+    if node == ("identity",):
+        return ("path", tuple(steps))
+    return ("pipe", node, ("path", tuple(steps)))
+
+
+# RUNTIME
+
+TYPE_NAMES: dict[type, str] = {
+    type(None): "null", bool: "boolean", int: "number", float: "number",
+    str: "string", list: "array", ChunkedList: "array",
+    dict: "object"
+}
+
+NUMBER_TYPES: tuple[type, ...] = (int, float)
+
+
+def type_name(value: Any) -> str:
+    """jq name of the type of value."""
+    name: str | None = TYPE_NAMES.get(type(value))
+    if name is None and isinstance(value, CompactRecord):
+        # compact records have a class per shape
+        return "object"
+    return name or type(value).__name__
+
+def truthy(value: Any) -> bool:
+    """Only false and null are false."""
+    return value is not None and value is not False
+
+def sort_key(value: Any) -> tuple:
+    """
+    Key ordering any values like jq does:
+    null < false < true < numbers < strings < arrays < objects.
+    """
+    if value is None:
+        return (0,)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, str):
+        return (3, value)
+    if isinstance(value, LIST_TYPES):
+        return (4, tuple(map(sort_key, value)))
+    if isinstance(value, DICT_TYPES):
+        keys: list = sorted(value, key=str)
+        return (5, tuple(map(str, keys)), tuple(sort_key(value[k]) for k in keys))
+    return (6, str(value))
+
+def _field(node: Any, key: str) -> Any:
+    if isinstance(node, DICT_TYPES):
+        return node.get(key)
+    if node is None:
+        return None
+    raise QueryError(f"Cannot index {type_name(node)} with {key!r}.")
+
+def _index(node: Any, index: Any) -> Any:
+    if isinstance(index, str):
+        return _field(node, index)
+    if isinstance(node, LIST_TYPES):
+        return node[index] if -len(node) <= index < len(node) else None
+    if isinstance(node, DICT_TYPES):
+        # keys of YAML and TOML can be numbers
+        return node[index] if index in node else node.get(str(index))
+    if node is None:
+        return None
+    raise QueryError(f"Cannot index {type_name(node)} with {index}.")
+
+def _slice(node: Any, start: int | None, end: int | None) -> Any:
+    if isinstance(node, (*LIST_TYPES, str)):
+        return node[start:end]
+    if node is None:
+        return None
+    raise QueryError(f"Cannot slice {type_name(node)}.")
+
+def _iterate(node: Any) -> Iterable[Any]:
+    if isinstance(node, LIST_TYPES):
+        return node
+    if isinstance(node, DICT_TYPES):
+        return node.values()
+    raise QueryError(f"Cannot iterate over {type_name(node)}.")
+
+def _recurse(node: Any) -> Iterator[Any]:
+    """Every node, parents first."""
+    stack: list[Any] = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        if isinstance(node, LIST_TYPES):
+            stack.extend(reversed(node))
+        elif isinstance(node, DICT_TYPES):
+            stack.extend(reversed(list(node.values())))
+
+def _ordering(compare: Callable[[Any, Any], bool]) -> Callable:
+    def _compare(a: Any, b: Any) -> bool:
+        # numbers with numbers and strings with strings need no sort keys
+        if (type(a) in NUMBER_TYPES and type(b) in NUMBER_TYPES) or (
+            type(a) is str and type(b) is str
+        ):
+            return compare(a, b)
+        return compare(sort_key(a), sort_key(b))
+    return _compare
+
+def _equal(a: Any, b: Any) -> bool:
+    return a == b and isinstance(a, bool) == isinstance(b, bool)
+
+def _add(a: Any, b: Any) -> Any:
+    if a is None:
+        return b
+    if b is None:
+        return a
+    if isinstance(a, DICT_TYPES) and isinstance(b, DICT_TYPES):
+        return {**a, **b}
+    if isinstance(a, bool) or isinstance(b, bool) or type_name(a) != type_name(b):
+        raise QueryError(f"Cannot add {type_name(a)} and {type_name(b)}.")
+    return a + b
+
+def _arithmetic(op: Callable[[Any, Any], Any], symbol: str) -> Callable:
+    def _operate(a: Any, b: Any) -> Any:
+        if symbol == "-" and isinstance(a, LIST_TYPES) and isinstance(b, LIST_TYPES):
+            return [item for item in a if all(not _equal(item, x) for x in b)]
+        if not all(
+            isinstance(x, (int, float)) and not isinstance(x, bool) for x in (a, b)
+        ):
+            raise QueryError(
+                f"Cannot {symbol} {type_name(a)} and {type_name(b)}."
+            )
+        try:
+            return op(a, b)
+        except ZeroDivisionError:
+            raise QueryError(f"Cannot divide {a} by zero.")
+    return _operate
+
+OPERATORS: dict[str, Callable[[Any, Any], Any]] = {
+    "==": _equal,
+    "!=": lambda a, b: not _equal(a, b),
+    "<": _ordering(operator.lt),
+    "<=": _ordering(operator.le),
+    ">": _ordering(operator.gt),
+    ">=": _ordering(operator.ge),
+    "+": _add,
+    "-": _arithmetic(lambda a, b: a - b, "-"),
+    "*": _arithmetic(lambda a, b: a * b, "*"),
+    "/": _arithmetic(lambda a, b: a / b, "/"),
+    "%": _arithmetic(lambda a, b: a % b, "%"),
+}
+
+
+# COMPILER: tree of tuples -> Plan
+
+def _then(first: Plan, second: Plan) -> Plan:
+    """Plan giving second's results over each result of first."""
+    if first is IDENTITY:
+        return second
+    if first.value and second.value:
+        first_value, second_value = first.value, second.value
+        return _single(lambda data: second_value(first_value(data)))
+    first_run, second_run = first.run, second.run
+    if second.value:
+        second_value: Callable = second.value
+        return Plan(lambda data: map(second_value, first_run(data)))
+    return Plan(
+        lambda data: (
+            result for value in first_run(data) for result in second_run(value)
+        )
+    )
+
+def _lookup(steps: list[tuple]) -> Callable[[Any], Any]:
+    """Single step for consecutive lookups, going straight to the node."""
+    if len(steps) == 1 and steps[0][0] == "field":
+        key: str = steps[0][1]
+        return lambda data: _field(data, key)
+
+    def _walk(data: Any) -> Any:
+        for step in steps:
+            if step[0] == "field":
+                data = _field(data, step[1])
+            elif step[0] == "index":
+                data = _index(data, step[1])
+            else:
+                data = _slice(data, step[1], step[2])
+        return data
+    return _walk
+
+def _compile_path(steps: tuple[tuple, ...]) -> Plan:
+    plan: Plan = IDENTITY
+    lookups: list[tuple] = []
+    for step in steps:
+        if step[0] != "iterate":
+            lookups.append(step)
+            continue
+        if lookups:
+            plan = _then(plan, _single(_lookup(lookups)))
+            lookups = []
+        plan = _then(plan, Plan(_iterate))
+    if lookups:
+        plan = _then(plan, _single(_lookup(lookups)))
+    return plan
+
+def _compile_binary(op: str, left: Plan, right: Plan) -> Plan:
+    operate: Callable[[Any, Any], Any] = OPERATORS[op]
+    if left.value and right.value:
+        left_value, right_value = left.value, right.value
+        return _single(lambda data: operate(left_value(data), right_value(data)))
+    left_run, right_run = left.run, right.run
+    return Plan(lambda data: (
+        operate(a, b) for b in right_run(data) for a in left_run(data)
+    ))
+
+def _compile_logic(is_and: bool, left: Plan, right: Plan) -> Plan:
+    if left.value and right.value:
+        left_value, right_value = left.value, right.value
+        if is_and:
+            return _single(
+                lambda data: truthy(left_value(data)) and truthy(right_value(data))
+            )
+        return _single(
+            lambda data: truthy(left_value(data)) or truthy(right_value(data))
+        )
+
+    def _run(data: Any) -> Iterator[bool]:
+        for a in left.run(data):
+            if truthy(a) != is_and:
+                # false and ..., true or ...: right side isn't needed
+                yield not is_and
+                continue
+            for b in right.run(data):
+                yield truthy(b)
+    return Plan(_run)
+
+def _compile_alternative(left: Plan, right: Plan) -> Plan:
+    def _run(data: Any) -> Iterator[Any]:
+        found: bool = False
+        try:
+            for value in left.run(data):
+                if truthy(value):
+                    found = True
+                    yield value
+        except QueryError:
+            pass
+        if not found:
+            yield from right.run(data)
+    return Plan(_run)
+
+def _compile_try(plan: Plan) -> Plan:
+    def _run(data: Any) -> Iterator[Any]:
+        try:
+            yield from plan.run(data)
+        except QueryError:
+            return
+    return Plan(_run)
+
+def _compile_object(entries: list[tuple[Plan, Plan]]) -> Plan:
+    def _key(key: Any) -> str:
+        if not isinstance(key, str):
+            raise QueryError(f"Object keys must be strings, not {type_name(key)}.")
+        return key
+
+    if all(key.value and value.value for key, value in entries):
+        pairs: list[tuple[Callable, Callable]] = [
+            (key.value, value.value) for key, value in entries
+        ]
+        return _single(lambda data: {
+            _key(key(data)): value(data) for key, value in pairs
+        })
+
+    def _run(data: Any) -> Iterator[dict]:
+        options: list[list[tuple[str, Any]]] = [
+            [
+                (_key(k), v)
+                for k in key.run(data) for v in value.run(data)
+            ]
+            for key, value in entries
+        ]
+        for chosen in product(*options):
+            yield dict(chosen)
+    return Plan(_run)
+
+def _compile_if(test: Plan, then: Plan, otherwise: Plan) -> Plan:
+    if test.value and then.value and otherwise.value:
+        test_value, then_value = test.value, then.value
+        otherwise_value = otherwise.value
+        return _single(lambda data: (
+            then_value(data) if truthy(test_value(data)) else otherwise_value(data)
+        ))
+    return Plan(lambda data: (
+        result
+        for condition in test.run(data)
+        for result in (then if truthy(condition) else otherwise).run(data)
+    ))
+
+def compile_node(node: tuple) -> Plan:
+    """Compile a node of a parsed query into its plan."""
+    match node:
+        case ("identity",):
+            return IDENTITY
+        case ("recurse",):
+            return Plan(_recurse)
+        case ("literal", value):
+            return _single(lambda data: value)
+        case ("path", steps):
+            return _compile_path(steps)
+        case ("pipe", first, second):
+            return _then(compile_node(first), compile_node(second))
+        case ("comma", first, second):
+            first_run: Callable = compile_node(first).run
+            second_run: Callable = compile_node(second).run
+            return Plan(lambda data: chain(first_run(data), second_run(data)))
+        case ("alternative", left, right):
+            return _compile_alternative(compile_node(left), compile_node(right))
+        case ("or" | "and" as kind, left, right):
+            return _compile_logic(
+                kind == "and", compile_node(left), compile_node(right)
+            )
+        case ("binary", op, left, right):
+            return _compile_binary(op, compile_node(left), compile_node(right))
+        case ("negative", operand):
+            return _compile_binary(
+                "-", _single(lambda data: 0), compile_node(operand)
+            )
+        case ("try", operand):
+            return _compile_try(compile_node(operand))
+        case ("array", None):
+            return _single(lambda data: [])
+        case ("array", items):
+            items_plan: Plan = compile_node(items)
+            if items_plan.value:
+                items_value: Callable = items_plan.value
+                return _single(lambda data: [items_value(data)])
+            items_run: Callable = items_plan.run
+            return _single(lambda data: list(items_run(data)))
+        case ("object", entries):
+            return _compile_object([
+                (compile_node(key), compile_node(value)) for key, value in entries
+            ])
+        case ("if", test, then, otherwise):
+            return _compile_if(
+                compile_node(test), compile_node(then), compile_node(otherwise)
+            )
+        case ("call", name, args):
+            return FUNCTIONS[name, len(args)](*map(compile_node, args))
+    raise QueryError(f"Cannot compile {node[0]}.")
+
+@lru_cache(maxsize=256)
+def compile_query(text: str) -> Plan:
+    """Parse and compile a query, once for each text."""
+    return compile_node(_Parser(text).parse())
+
+def run_query(text: str, data: Any) -> Iterator[Any]:
+    """Yield the results of a query over data."""
+    yield from compile_query(text).run(data)
+
+def _json_default(value: Any) -> Any:
+    """Chunked lists and compact records as JSON, other values as strings."""
+    if isinstance(value, ChunkedList):
+        return list(value)
+    if isinstance(value, CompactRecord):
+        return value.to_dict()
+    return str(value)
+
+def format_result(value: Any, compact: bool = False) -> str:
+    """Result as JSON, indented unless compact."""
+    return json.dumps(
+        value, indent=None if compact else 2, ensure_ascii=False,
+        default=_json_default
+    )
+
+
+# FUNCTIONS: (name, number of arguments) -> compiler of their plans
+
+def _length(value: Any) -> int | float:
+    if value is None:
+        return 0
+    if isinstance(value, (str, *DICT_TYPES, *LIST_TYPES)):
+        return len(value)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return abs(value)
+    raise QueryError(f"{type_name(value)} has no length.")
+
+def _keys(value: Any) -> list:
+    if isinstance(value, DICT_TYPES):
+        return sorted(value, key=sort_key)
+    if isinstance(value, LIST_TYPES):
+        return list(range(len(value)))
+    raise QueryError(f"{type_name(value)} has no keys.")
+
+def _items(value: Any) -> list:
+    if not isinstance(value, LIST_TYPES):
+        raise QueryError(f"Expected an array, not {type_name(value)}.")
+    return value
+
+def _unique(items: Iterable[Any], key: Callable[[Any], Any]) -> list:
+    seen: dict[tuple, Any] = {}
+    for item in items:
+        seen.setdefault(key(item), item)
+    return [seen[k] for k in sorted(seen)]
+
+def _to_entries(value: Any) -> list[dict]:
+    if not isinstance(value, DICT_TYPES):
+        raise QueryError(f"Expected an object, not {type_name(value)}.")
+    return [{"key": key, "value": item} for key, item in value.items()]
+
+def _from_entries(value: Any) -> dict:
+    result: dict = {}
+    for entry in _items(value):
+        if not isinstance(entry, DICT_TYPES):
+            raise QueryError(
+                f"from_entries needs objects, not {type_name(entry)}."
+            )
+        key: Any = next(
+            (entry[k] for k in ("key", "k", "name") if k in entry), None
+        )
+        if key is None:
+            raise QueryError("Cannot use null as object key in from_entries.")
+        result[key if isinstance(key, str) else json.dumps(key)] = next(
+            (entry[k] for k in ("value", "v") if k in entry), None
+        )
+    return result
+
+def _to_number(value: Any) -> int | float:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    try:
+        number: float = float(value)
+    except (TypeError, ValueError):
+        raise QueryError(f"Cannot parse {value!r} as a number.")
+    return int(number) if number.is_integer() else number
+
+def _string_function(function: Callable[[str], Any], name: str) -> Callable:
+    def _apply(value: Any) -> Any:
+        if not isinstance(value, str):
+            raise QueryError(f"{name} needs a string, not {type_name(value)}.")
+        return function(value)
+    return _apply
+
+def _strings(function: Callable[[str, str], Any], name: str) -> Callable:
+    def _apply(value: Any, argument: Any) -> Any:
+        if not isinstance(value, str) or not isinstance(argument, str):
+            raise QueryError(f"{name} needs strings.")
+        return function(value, argument)
+    return _apply
+
+def _reduce_add(items: Iterable[Any]) -> Any:
+    result: Any = None
+    for item in items:
+        result = _add(result, item)
+    return result
+
+def _contains(a: Any, b: Any) -> bool:
+    if isinstance(a, DICT_TYPES) and isinstance(b, DICT_TYPES):
+        return all(k in a and _contains(a[k], v) for k, v in b.items())
+    if isinstance(a, LIST_TYPES) and isinstance(b, LIST_TYPES):
+        return all(any(_contains(x, y) for x in a) for y in b)
+    if isinstance(a, str) and isinstance(b, str):
+        return b in a
+    if type_name(a) == type_name(b):
+        return _equal(a, b)
+    raise QueryError(f"{type_name(a)} and {type_name(b)} cannot be compared.")
+
+def _with_argument(function: Callable[[Any, Any], Any]) -> Callable[[Plan], Plan]:
+    """Compiler of a function of the input and the value of an argument."""
+    def _compile(argument: Plan) -> Plan:
+        if argument.value:
+            argument_value: Callable = argument.value
+            return _single(lambda data: function(data, argument_value(data)))
+        return Plan(lambda data: (
+            function(data, value) for value in argument.run(data)
+        ))
+    return _compile
+
+def _test(value: Any, pattern: Any) -> bool:
+    try:
+        return re.search(pattern, value) is not None
+    except (TypeError, re.error) as e:
+        raise QueryError(f"test({pattern!r}) failed: {e}")
+
+def _select(condition: Plan) -> Plan:
+    if condition.value:
+        condition_value: Callable = condition.value
+        return Plan(
+            lambda data: (data,) if truthy(condition_value(data)) else ()
+        )
+    return Plan(lambda data: (
+        data for value in condition.run(data) if truthy(value)
+    ))
+
+def _map(function: Plan) -> Plan:
+    if function.value:
+        function_value: Callable = function.value
+        return _single(
+            lambda data: [function_value(item) for item in _iterate(data)]
+        )
+    return _single(lambda data: [
+        result for item in _iterate(data) for result in function.run(item)
+    ])
+
+def _sort_by(function: Plan) -> Plan:
+    return _single(lambda data: sorted(
+        _items(data), key=lambda item: sort_key(list(function.run(item)))
+    ))
+
+def _unique_by(function: Plan) -> Plan:
+    return _single(lambda data: _unique(
+        _items(data), lambda item: sort_key(list(function.run(item)))
+    ))
+
+def _first(function: Plan) -> Plan:
+    return Plan(lambda data: islice(function.run(data), 1))
+
+def _count(value: Any, name: str) -> int:
+    """Number of results given to a function like limit."""
+    if type(value) not in NUMBER_TYPES:
+        raise QueryError(f"{name} needs a number, not {type_name(value)}.")
+    return max(0, int(value))
+
+def _limit(count: Plan, function: Plan) -> Plan:
+    return Plan(lambda data: (
+        result
+        for n in count.run(data)
+        for result in islice(function.run(data), _count(n, "limit"))
+    ))
+
+def _has(value: Any, key: Any) -> bool:
+    if isinstance(value, DICT_TYPES):
+        # keys of YAML and TOML can be numbers
+        if not isinstance(key, (str, *NUMBER_TYPES)) or isinstance(key, bool):
+            raise QueryError(
+                f"Cannot check whether object has a key of type "
+                f"{type_name(key)}."
+            )
+        return key in value
+    if type(key) not in NUMBER_TYPES:
+        raise QueryError(
+            f"Cannot check whether {type_name(value)} has a key of type "
+            f"{type_name(key)}."
+        )
+    return 0 <= key < len(_items(value))
+
+def _unary(function: Callable[[Any], Any]) -> Callable[[], Plan]:
+    return lambda: _single(function)
+
+FUNCTIONS: dict[tuple[str, int], Callable[..., Plan]] = {
+    ("empty", 0): lambda: Plan(lambda data: ()),
+    ("length", 0): _unary(_length),
+    ("keys", 0): _unary(_keys),
+    ("type", 0): _unary(type_name),
+    ("not", 0): _unary(lambda data: not truthy(data)),
+    ("add", 0): _unary(lambda data: _reduce_add(_iterate(data))),
+    ("any", 0): _unary(lambda data: any(map(truthy, _iterate(data)))),
+    ("all", 0): _unary(lambda data: all(map(truthy, _iterate(data)))),
+    ("sort", 0): _unary(lambda data: sorted(_items(data), key=sort_key)),
+    ("unique", 0): _unary(lambda data: _unique(_items(data), sort_key)),
+    ("min", 0): _unary(lambda data: min(_items(data), key=sort_key, default=None)),
+    ("max", 0): _unary(lambda data: max(_items(data), key=sort_key, default=None)),
+    ("reverse", 0): _unary(lambda data: (
+        data[::-1] if isinstance(data, (*LIST_TYPES, str)) else _items(data)
+    )),
+    ("first", 0): _unary(lambda data: _index(data, 0)),
+    ("last", 0): _unary(lambda data: _index(data, -1)),
+    ("to_entries", 0): _unary(_to_entries),
+    ("from_entries", 0): _unary(_from_entries),
+    ("tostring", 0): _unary(lambda data: (
+        data if isinstance(data, str) else format_result(data, compact=True)
+    )),
+    ("tonumber", 0): _unary(_to_number),
+    ("ascii_downcase", 0): _unary(
+        _string_function(str.lower, "ascii_downcase")
+    ),
+    ("ascii_upcase", 0): _unary(_string_function(str.upper, "ascii_upcase")),
+    ("select", 1): _select,
+    ("map", 1): _map,
+    ("sort_by", 1): _sort_by,
+    ("unique_by", 1): _unique_by,
+    ("first", 1): _first,
+    ("limit", 2): _limit,
+    ("has", 1): _with_argument(_has),
+    ("contains", 1): _with_argument(_contains),
+    ("startswith", 1): _with_argument(_strings(str.startswith, "startswith")),
+    ("endswith", 1): _with_argument(_strings(str.endswith, "endswith")),
+    ("test", 1): _with_argument(_test),
+}
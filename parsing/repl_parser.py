@@ -125,6 +125,12 @@ class CommandParser(argparse.ArgumentParser):
         command_parser.set_defaults(func=action)
         return command_parser
 
+    def command_names(self) -> list[str]:
+        """Return the names and aliases of every command of the parser."""
+        if not hasattr(self, "commands"):
+            return []
+        return list(self.commands.choices)
+
     def parse_args(
         self,
         args: list[str] = None,
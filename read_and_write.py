@@ -2,25 +2,65 @@
 Module containing functions for reading and writing different file formats.
 
 Add support for more file formats here.
+Codecs libraries are imported inside their functions, so a run only pays
+for the formats it actually touches.
+
+JSON Lines and multi-document YAML files are made of independent records,
+that can also be read record by record, so reading them again only
+parses the records that changed.
+
+CSV and TSV files are lists of records, a dict per row. Rows are read in
+chunks and cast column by column, with the type of each column inferred
+once from a sample of the first rows.
+
+Files can be read compacted, their dicts as the compact records of
+utils/compact_records, which share their keys: JSON objects are built
+compacted as they are parsed, data of other formats once parsed.
 """
 
-from collections.abc import Callable
+from collections.abc import (
+    Callable, Iterable, Iterator, Mapping, MutableSequence
+)
+from functools import lru_cache
+from hashlib import blake2b
 import io
+from itertools import islice
 import json
 import logging
 import os
 from pathlib import Path
-from typing import Any
-
-import toml
-import yaml
+import re
+from typing import Any, TYPE_CHECKING
 
 from messages.messages import get_error_message
 
+if TYPE_CHECKING:
+    from utils.compact_records import RecordBuilder
+
 
 logger = logging.getLogger(__name__)
 
-SUPPORTED_FORMATS: tuple[str, ...] = (".json", ".toml",".yaml")
+SUPPORTED_FORMATS: tuple[str, ...] = (
+    ".csv", ".json", ".jsonl", ".toml", ".tsv", ".yaml"
+)
+
+# formats whose files are lists of records, by their delimiter
+TABLE_DELIMITERS: dict[str, str] = {".csv": ",", ".tsv": "\t"}
+
+# rows of a table read at a time, and rows inferring its column types
+TABLE_CHUNK_ROWS: int = 10_000
+TABLE_SAMPLE_ROWS: int = 1_000
+
+# formats whose files can be made of several records
+RECORD_FORMATS: tuple[str, ...] = (".jsonl", ".yaml")
+
+# formats read a record after another, whose reading can stop early
+STREAMED_FORMATS: tuple[str, ...] = (".jsonl", *TABLE_DELIMITERS)
+
+# lines starting a new document in a multi-document YAML file
+YAML_DOCUMENT_START: re.Pattern = re.compile(
+    r"^---[ \t]*(?:#.*)?$\n?", re.MULTILINE
+)
 
 
 read_functions: dict[str, Callable] = {}
@@ -41,8 +81,11 @@ add_func_to_read: Callable = add_func_to_dict(read_functions)
 # decorator to add new write_file functions
 add_func_to_write: Callable = add_func_to_dict(write_functions)
 
-def read_file(filepath: str | Path) -> Any:
-    """Read file content if formart is supported."""
+def read_file(filepath: str | Path, compact: str | None = None) -> Any:
+    """
+    Read file content if formart is supported. With compact, a mode of
+    COMPACT_MODES, its dicts are read as compact records.
+    """
     ext: str = os.path.splitext(filepath)[1].lower()
 
     if not ext:
@@ -57,9 +100,11 @@ def read_file(filepath: str | Path) -> Any:
         return None
 
     try:
+        if compact is not None:
+            return read_compact(filepath, compact)
         return read_functions[ext](filepath)
     except FileNotFoundError:
-        logger.error(get_error_message("FileNotFound", filepath=filepath))
+        logger.error(get_error_message("FileNotFound", filename=filepath))
         raise
     except PermissionError:
         logger.error(get_error_message("PermissionError"))
@@ -84,6 +129,30 @@ def write_file(filepath: str | Path, content: Any) -> None:
         logger.error(get_error_message("PermissionError"))
         raise
 
+def json_default(value: Any) -> Any:
+    """
+    Sequences that aren't lists, like ChunkedList, as JSON arrays, and
+    mappings that aren't dicts, like CompactRecord, as JSON objects.
+    """
+    if isinstance(value, MutableSequence):
+        return list(value)
+    if isinstance(value, Mapping):
+        return dict(value.items())
+    raise TypeError(
+        f"Object of type {type(value).__name__} is not JSON serializable"
+    )
+
+def builtin_lists(data: Any) -> Any:
+    """
+    Data with its sequences that aren't lists as lists, and its mappings
+    that aren't dicts as dicts, at any depth.
+    """
+    if isinstance(data, Mapping):
+        return {key: builtin_lists(value) for key, value in data.items()}
+    if isinstance(data, MutableSequence):
+        return [builtin_lists(value) for value in data]
+    return data
+
 @add_func_to_read(".json")
 def read_json(json_filepath: str | Path) -> Any:
     """Read JSON file, return its content."""
@@ -95,11 +164,29 @@ def read_json(json_filepath: str | Path) -> Any:
 def write_json(json_filepath: str | Path, content: Any) -> None:
     """Save WHOLE content in a JSON file."""
     with open(json_filepath, "w", encoding="utf8") as file:
-        json.dump(content, file, indent=2)
+        json.dump(content, file, indent=2, default=json_default)
+
+@add_func_to_read(".jsonl")
+def read_jsonl(jsonl_filepath: str | Path) -> list[Any]:
+    """Read JSON Lines file, return the list of its records."""
+    with open(jsonl_filepath, "r", encoding="utf8") as file:
+        jsonl_content = [json.loads(line) for line in file if line.strip()]
+    return jsonl_content
+
+@add_func_to_write(".jsonl")
+def write_jsonl(jsonl_filepath: str | Path, content: Any) -> None:
+    """Save WHOLE content in a JSON Lines file, a record per line."""
+    records: MutableSequence = (
+        content if isinstance(content, MutableSequence) else [content]
+    )
+    with open(jsonl_filepath, "w", encoding="utf8") as file:
+        for record in records:
+            file.write(json.dumps(record, default=json_default) + "\n")
 
 @add_func_to_read(".toml")
 def read_toml(toml_filepath: str | Path) -> Any:
     """Read TOML file, return its content"""
+    import toml
     with open(toml_filepath, "r", encoding="utf8") as file:
         toml_content = toml.load(file)
     return toml_content
@@ -107,18 +194,362 @@ def read_toml(toml_filepath: str | Path) -> Any:
 @add_func_to_write(".toml")
 def write_toml(toml_filepath: str | Path, content: Any) -> None:
     """Save WHOLE content in a TOML file."""
+    import toml
     with io.open(toml_filepath, "w", encoding="utf8") as file:
-        toml.dump(content, file)
+        toml.dump(builtin_lists(content), file)
+
+class YAMLDocuments(list):
+    """Documents of a multi-document YAML file, written back as such."""
+
+def load_yaml(stream: Any) -> Any:
+    """
+    Load YAML stream content, the list of its documents as YAMLDocuments
+    when there's more than one.
+    """
+    import yaml
+    documents: list[Any] = list(yaml.safe_load_all(stream))
+    if not documents:
+        return None
+    if len(documents) == 1:
+        return documents[0]
+    return YAMLDocuments(documents)
 
 @add_func_to_read(".yaml")
 def read_yaml(yaml_filepath: str | Path) -> Any:
     """Read YAML file, return its content."""
     with open(yaml_filepath, "r", encoding="utf8") as file:
-        yaml_content = yaml.safe_load(file)
+        yaml_content = load_yaml(file)
     return yaml_content
 
+@lru_cache(maxsize=None)
+def yaml_dumper() -> Any:
+    """
+    Dumper of write_yaml, writing other sequences, like ChunkedList, as
+    YAML sequences, and other mappings, like CompactRecord, as YAML
+    mappings. Its representers are its own, yaml's global ones are kept.
+    """
+    import yaml
+
+    class Dumper(yaml.Dumper):
+        pass
+
+    Dumper.add_multi_representer(
+        MutableSequence, yaml.representer.SafeRepresenter.represent_list
+    )
+    Dumper.add_multi_representer(
+        Mapping, yaml.representer.SafeRepresenter.represent_dict
+    )
+    return Dumper
+
 @add_func_to_write(".yaml")
 def write_yaml(yaml_filepath: str | Path, content: Any) -> None:
     """Save WHOLE content in a YAML file."""
+    import yaml
     with io.open(yaml_filepath, "w", encoding="utf8") as file:
-        yaml.dump(content, file, indent=4)
+        if isinstance(content, YAMLDocuments):
+            yaml.dump_all(
+                list(content), file, Dumper=yaml_dumper(), indent=4
+            )
+        else:
+            yaml.dump(content, file, Dumper=yaml_dumper(), indent=4)
+
+BOOLEANS: dict[str, bool] = {
+    "true": True, "True": True, "TRUE": True,
+    "false": False, "False": False, "FALSE": False
+}
+
+# types written as they are in a cell, others are written as JSON
+CELL_TYPES: set[type] = {str, int, float, bool, type(None)}
+
+INT_CELL: re.Pattern = re.compile(r"[-+]?(?:0|[1-9][0-9]*)")
+FLOAT_CELL: re.Pattern = re.compile(
+    r"[-+]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][-+]?[0-9]+)?"
+)
+
+
+def infer_column_type(cells: Iterable[str]) -> Callable[[str], Any]:
+    """
+    Caster of the cells of a column, inferred from a sample of them:
+    int, float, a bool of BOOLEANS or, if any cell is something else, str.
+    Numbers with leading zeros (zip codes) are kept as str.
+    """
+    filled: list[str] = [cell for cell in cells if cell]
+    if not filled:
+        return str
+    if all(INT_CELL.fullmatch(cell) for cell in filled):
+        return int
+    if all(FLOAT_CELL.fullmatch(cell) for cell in filled) and not any(
+        cell.lstrip("+-").startswith("0") and cell.lstrip("+-")[1:2].isdigit()
+        for cell in filled
+    ):
+        return float
+    if all(cell in BOOLEANS for cell in filled):
+        return BOOLEANS.__getitem__
+    return str
+
+def _cast_cells(
+    cells: tuple[str, ...],
+    caster: Callable[[str], Any]
+) -> list[Any]:
+    """
+    Cells of a column cast by caster, C-level unless some cell fails.
+    Empty cells are None in every column, str ones included.
+    """
+    if caster is str:
+        return [cell or None for cell in cells] if "" in cells else list(cells)
+    try:
+        return list(map(caster, cells))
+    except (KeyError, ValueError):
+        pass
+    # cells not fitting the column stay str
+    values: list[Any] = []
+    for cell in cells:
+        if not cell:
+            values.append(None)
+            continue
+        try:
+            values.append(caster(cell))
+        except (KeyError, ValueError):
+            values.append(cell)
+    return values
+
+def iter_table(
+    table_filepath: str | Path,
+    chunk_rows: int = TABLE_CHUNK_ROWS
+) -> Iterator[list[dict[str, Any]]]:
+    """
+    Yield the records of a CSV or TSV file, a dict per row keyed by the
+    header, in chunks of chunk_rows, the file being read as they go.
+    """
+    import csv
+
+    ext: str = os.path.splitext(table_filepath)[1].lower()
+    with open(table_filepath, "r", encoding="utf-8-sig", newline="") as file:
+        rows: Iterator[list[str]] = csv.reader(
+            file, delimiter=TABLE_DELIMITERS[ext]
+        )
+        header: list[str] | None = next(rows, None)
+        if header is None:
+            return
+        header = [name or f"column{i}" for i, name in enumerate(header)]
+        width: int = len(header)
+
+        casters: list[Callable[[str], Any]] | None = None
+        while chunk := list(islice(rows, max(chunk_rows, TABLE_SAMPLE_ROWS))):
+            # ragged rows are padded, or cut, to the header
+            for i, row in enumerate(chunk):
+                if len(row) != width:
+                    chunk[i] = (row + [""] * width)[:width]
+
+            columns: list[tuple[str, ...]] = list(zip(*chunk))
+            if casters is None:
+                casters = [
+                    infer_column_type(column[:TABLE_SAMPLE_ROWS])
+                    for column in columns
+                ]
+            cast_columns: list[list[Any]] = [
+                _cast_cells(column, caster)
+                for column, caster in zip(columns, casters)
+            ]
+            yield [dict(zip(header, values)) for values in zip(*cast_columns)]
+
+@add_func_to_read(".csv", ".tsv")
+def read_table(table_filepath: str | Path) -> list[dict[str, Any]]:
+    """Read CSV or TSV file, return the list of its records."""
+    return [
+        record
+        for chunk in iter_table(table_filepath)
+        for record in chunk
+    ]
+
+def read_first_records(filepath: str | Path, count: int) -> list[Any]:
+    """
+    Read the first count records of a file of STREAMED_FORMATS, the rest
+    of the file being left unread.
+    """
+    ext: str = os.path.splitext(filepath)[1].lower()
+    if ext in TABLE_DELIMITERS:
+        return list(islice(
+            (
+                record
+                for chunk in iter_table(filepath, count)
+                for record in chunk
+            ),
+            count
+        ))
+    with open(filepath, "r", encoding="utf8") as file:
+        return [
+            json.loads(line)
+            for line in islice((line for line in file if line.strip()), count)
+        ]
+
+def read_compact(filepath: str | Path, mode: str) -> Any:
+    """
+    Read file content with its dicts as compact records, sharing their
+    keys and, in "values" mode, their short strings.
+    """
+    from utils.compact_records import RecordBuilder, compact_data
+
+    ext: str = os.path.splitext(filepath)[1].lower()
+    builder: RecordBuilder = RecordBuilder(intern_values=mode == "values")
+    if ext in (".json", ".jsonl"):
+        with open(filepath, "r", encoding="utf8") as file:
+            if ext == ".json":
+                return json.load(file, object_pairs_hook=builder)
+            return [
+                json.loads(line, object_pairs_hook=builder)
+                for line in file if line.strip()
+            ]
+    if ext in TABLE_DELIMITERS:
+        # compacted chunk by chunk, the whole table never being dicts
+        return [
+            compact_data(record, builder)
+            for chunk in iter_table(filepath)
+            for record in chunk
+        ]
+    return compact_data(read_functions[ext](filepath), builder)
+
+@add_func_to_write(".csv", ".tsv")
+def write_table(table_filepath: str | Path, content: Any) -> None:
+    """
+    Save a list of records, mappings or lists, as CSV or TSV file. Columns
+    of dicts are their keys, in the order they are first found; nested
+    values are written as JSON.
+    """
+    import csv
+
+    if not isinstance(content, MutableSequence):
+        raise TypeError(
+            "Only lists of records can be saved as table, "
+            f"not {type(content).__name__}."
+        )
+    if all(isinstance(record, MutableSequence) for record in content):
+        header: list[str] | None = None
+    elif all(isinstance(record, Mapping) for record in content):
+        columns: dict[Any, None] = {}
+        for record in content:
+            columns.update(dict.fromkeys(record))
+        header = list(columns)
+    else:
+        raise TypeError("Table records must be all dicts or all lists.")
+
+    def _rows() -> Iterator[list[Any]]:
+        for record in content:
+            row: list[Any] = (
+                record if header is None else list(map(record.get, header))
+            )
+            if not set(map(type, row)) <= CELL_TYPES:
+                row = [
+                    json.dumps(value, default=json_default)
+                    if isinstance(value, (Mapping, MutableSequence))
+                    else value
+                    for value in row
+                ]
+            yield row
+
+    ext: str = os.path.splitext(table_filepath)[1].lower()
+    with open(table_filepath, "w", encoding="utf8", newline="") as file:
+        writer = csv.writer(file, delimiter=TABLE_DELIMITERS[ext])
+        if header is not None:
+            writer.writerow(header)
+        writer.writerows(_rows())
+
+def split_records(text: str, ext: str) -> list[str] | None:
+    """
+    Split the text of a JSON Lines or YAML file into its records,
+    None if the YAML file can't be safely split.
+    """
+    if ext == ".jsonl":
+        return [line for line in text.splitlines() if line.strip()]
+
+    # directives and content in the document start line are left
+    # to the YAML parser
+    if re.search(r"^(?:%|--- *[^\s#])", text, re.MULTILINE):
+        return None
+    return [
+        document for document in YAML_DOCUMENT_START.split(text)
+        if any(
+            line.strip() and not line.lstrip().startswith("#")
+            for line in document.splitlines()
+        )
+    ]
+
+def parse_record(
+    record: str,
+    ext: str,
+    builder: "RecordBuilder | None" = None
+) -> Any:
+    """
+    Parse a record of a JSON Lines or multi-document YAML file, its dicts
+    as compact records when given their builder.
+    """
+    if ext == ".jsonl":
+        return json.loads(record, object_pairs_hook=builder)
+
+    import yaml
+    try:
+        value: Any = yaml.safe_load(record)
+    except yaml.YAMLError as e:
+        raise ValueError(f"Invalid YAML document: {e}") from e
+    if builder is None:
+        return value
+    from utils.compact_records import compact_data
+    return compact_data(value, builder)
+
+def read_records(
+    filepath: str | Path,
+    known: dict[bytes, list[Any]] | None = None,
+    compact: str | None = None
+) -> tuple[Any, list[bytes] | None]:
+    """
+    Read a JSON Lines or YAML file record by record, return its content
+    and the digests of its records. With compact, a mode of COMPACT_MODES,
+    dicts of the records parsed are compact records.
+
+    Records whose digest is in known take one of its values instead of
+    being parsed again, known values being popped as they are taken.
+    YAML files that are not made of several documents are read whole,
+    with None digests.
+    """
+    ext: str = os.path.splitext(filepath)[1].lower()
+    try:
+        with open(filepath, "r", encoding="utf8") as file:
+            text: str = file.read()
+    except FileNotFoundError:
+        logger.error(get_error_message("FileNotFound", filename=filepath))
+        raise
+    except PermissionError:
+        logger.error(get_error_message("PermissionDenied"))
+        raise
+
+    builder: "RecordBuilder | None" = None
+    if compact is not None:
+        from utils.compact_records import RecordBuilder
+        builder = RecordBuilder(intern_values=compact == "values")
+
+    records: list[str] | None = split_records(text, ext)
+    if ext == ".yaml" and (records is None or len(records) < 2):
+        import yaml
+        try:
+            content: Any = load_yaml(text)
+        except yaml.YAMLError as e:
+            raise ValueError(f"Invalid YAML file: {e}") from e
+        if builder is not None:
+            from utils.compact_records import compact_data
+            content = compact_data(content, builder)
+        return content, None
+
+    known = known or {}
+    digests: list[bytes] = []
+    values: list[Any] = []
+    for record in records:
+        digest: bytes = blake2b(record.encode("utf8"), digest_size=16).digest()
+        digests.append(digest)
+        if known.get(digest):
+            values.append(known[digest].pop())
+        else:
+            values.append(parse_record(record, ext, builder))
+
+    if ext == ".yaml":
+        return YAMLDocuments(values), digests
+    return values, digests
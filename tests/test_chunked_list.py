@@ -0,0 +1,101 @@
+"""Tests of utils/chunked_list."""
+
+import copy
+import random
+
+import pytest
+
+from utils.chunked_list import ChunkedList, chunk_lists, unchunk_lists
+
+
+def _check(chunked: ChunkedList, expected: list) -> None:
+    assert len(chunked) == len(expected)
+    assert list(chunked) == expected
+    assert list(reversed(chunked)) == expected[::-1]
+    assert chunked == expected
+    for index in range(-len(expected), len(expected)):
+        assert chunked[index] == expected[index]
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_edits_match_list(seed: int) -> None:
+    rng: random.Random = random.Random(seed)
+    expected: list[int] = list(range(rng.randrange(50)))
+    # a small load so chunks are split and merged often
+    chunked: ChunkedList = ChunkedList(expected, load=4)
+    _check(chunked, expected)
+
+    for value in range(1000, 1300):
+        size: int = len(expected)
+        index: int = rng.randint(-size - 2, size + 2)
+        start: int = rng.randint(-size - 2, size + 2)
+        stop: int = rng.randint(-size - 2, size + 2)
+        step: int = rng.choice((None, 1, 2, -1, -3))
+        match rng.choice(("insert", "append", "del", "set", "slice")):
+            case "insert":
+                chunked.insert(index, value)
+                expected.insert(index, value)
+            case "append":
+                chunked.append(value)
+                expected.append(value)
+            case "del" if size:
+                index %= size
+                del chunked[index]
+                del expected[index]
+            case "set" if size:
+                index %= size
+                chunked[index] = value
+                expected[index] = value
+            case "slice":
+                assert chunked[start:stop:step] == expected[start:stop:step]
+                if step in (None, 1):
+                    values: list[int] = [value] * rng.randrange(4)
+                    chunked[start:stop] = values
+                    expected[start:stop] = values
+                else:
+                    del chunked[start:stop:step]
+                    del expected[start:stop:step]
+        _check(chunked, expected)
+
+def test_index_errors() -> None:
+    chunked: ChunkedList = ChunkedList([1, 2], load=1)
+    for index in (2, -3):
+        with pytest.raises(IndexError):
+            chunked[index]
+        with pytest.raises(IndexError):
+            chunked[index] = 0
+        with pytest.raises(IndexError):
+            del chunked[index]
+
+def test_delete_every_item() -> None:
+    chunked: ChunkedList = ChunkedList(range(10), load=2)
+    while chunked:
+        del chunked[len(chunked) // 2]
+    _check(chunked, [])
+    chunked.append(1)
+    _check(chunked, [1])
+
+def test_sort_reverse_and_copy() -> None:
+    items: list[int] = [5, 3, 9, 1, 7, 2]
+    chunked: ChunkedList = ChunkedList(items, load=2)
+    copied: ChunkedList = copy.copy(chunked)
+
+    chunked.sort()
+    _check(chunked, sorted(items))
+    chunked.reverse()
+    _check(chunked, sorted(items, reverse=True))
+    _check(copied, items)
+    assert copied.load == 2
+
+def test_chunk_and_unchunk_lists() -> None:
+    data: dict = {"big": list(range(10)), "small": [1], "nested": [[0] * 5]}
+    chunked, converted = chunk_lists(data, 5)
+    assert converted == 2
+    assert isinstance(chunked["big"], ChunkedList)
+    assert type(chunked["small"]) is list
+    assert type(chunked["nested"]) is list
+    assert isinstance(chunked["nested"][0], ChunkedList)
+    assert chunked == data
+
+    unchunked, converted = unchunk_lists(chunked)
+    assert converted == 2
+    assert type(unchunked["nested"][0]) is list
@@ -0,0 +1,114 @@
+"""Tests of utils/compact_records."""
+
+import copy
+import json
+import logging
+import pickle
+from typing import Any
+
+import pytest
+
+from utils import compact_records
+from utils.compact_records import (
+    _MISSING, CompactRecord, RecordBuilder, compact_data, count_records,
+    expand_data, record_class
+)
+
+
+def _record(text: str, builder: RecordBuilder | None = None) -> Any:
+    return json.loads(text, object_pairs_hook=builder or RecordBuilder())
+
+def test_record_is_read_and_edited_like_a_dict() -> None:
+    record: Any = _record('{"a": 1, "b": 2}')
+    assert isinstance(record, CompactRecord)
+    assert record == {"a": 1, "b": 2}
+    assert (record["a"], record.get("c"), "b" in record, len(record)) == (
+        1, None, True, 2
+    )
+
+    record["a"] = 10
+    record["c"] = 3
+    assert list(record.items()) == [("a", 10), ("b", 2), ("c", 3)]
+    assert isinstance(record, CompactRecord)
+
+def test_deleted_keys_added_back_go_last() -> None:
+    record: Any = _record('{"a": 1, "b": 2, "c": 3}')
+    del record["a"]
+    assert list(record) == ["b", "c"]
+    assert "a" not in record and len(record) == 2
+    with pytest.raises(KeyError):
+        record["a"]
+    with pytest.raises(KeyError):
+        del record["a"]
+
+    record["a"] = 4
+    assert list(record.items()) == [("b", 2), ("c", 3), ("a", 4)]
+    assert record.to_dict() == {"b": 2, "c": 3, "a": 4}
+    assert _MISSING not in record.values()
+
+def test_copy_and_pickle_keep_records() -> None:
+    record: Any = _record('{"a": 1, "b": [1]}')
+    del record["a"]
+    record["z"] = 0
+
+    for other in (
+        copy.copy(record), copy.deepcopy(record),
+        pickle.loads(pickle.dumps(record))
+    ):
+        assert isinstance(other, CompactRecord)
+        assert list(other.items()) == [("b", [1]), ("z", 0)]
+        other["z"] = 1
+        assert record["z"] == 0
+
+    assert copy.copy(record)["b"] is record["b"]
+    assert copy.deepcopy(record)["b"] is not record["b"]
+
+def test_missing_is_a_single_object() -> None:
+    assert copy.deepcopy(_MISSING) is _MISSING
+    assert pickle.loads(pickle.dumps(_MISSING)) is _MISSING
+
+def test_shared_keys_and_interned_values() -> None:
+    builder: RecordBuilder = RecordBuilder(intern_values=True)
+    records: list = _record(
+        '[{"name": "x", "tag": "common"}, {"name": "y", "tag": "common"}]',
+        builder
+    )
+    assert type(records[0]) is type(records[1])
+    assert records[0]["tag"] is records[1]["tag"]
+
+def test_compact_and_expand_data() -> None:
+    data: dict = {"items": [{"a": 1}, {"a": 2, "b": {"c": 3}}]}
+    compact: Any = compact_data(data, RecordBuilder())
+    assert count_records(compact) == 4
+    assert compact == data
+
+    expanded: Any = expand_data(compact)
+    assert count_records(expanded) == 0
+    assert type(expanded) is dict and type(expanded["items"][1]["b"]) is dict
+
+def test_keys_that_cant_be_a_shape_stay_dicts() -> None:
+    assert type(_record('{"a": 1, "a": 2}')) is dict
+    assert type(_record("{}")) is dict
+    too_many: str = json.dumps({str(i): i for i in range(65)})
+    assert type(_record(too_many)) is dict
+
+def test_rejected_keys_dont_use_up_shapes(
+    monkeypatch: pytest.MonkeyPatch,
+    caplog: pytest.LogCaptureFixture
+) -> None:
+    monkeypatch.setattr(compact_records, "_classes", {})
+    monkeypatch.setattr(compact_records, "_rejected", set())
+    monkeypatch.setattr(compact_records, "_shapes_full", False)
+    monkeypatch.setattr(compact_records, "MAX_SHAPES", 3)
+
+    for i in range(10):
+        assert record_class((f"k{i}", f"k{i}")) is None
+    assert record_class(("a",)) is not None
+    assert record_class(("b",)) is not None
+    assert record_class(("c",)) is not None
+
+    with caplog.at_level(logging.WARNING):
+        assert record_class(("d",)) is None
+        assert record_class(("e",)) is None
+    assert len(caplog.records) == 1
+    assert record_class(("a",)) is not None
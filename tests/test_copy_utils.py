@@ -0,0 +1,52 @@
+"""Tests of utils/copy_utils."""
+
+import os
+from pathlib import Path
+import shutil
+
+from utils.copy_utils import copy_tree
+
+
+def test_copy_into_own_directory_keeps_the_file(tmp_path: Path) -> None:
+    source: Path = tmp_path / "a.json"
+    source.write_text('{"a": 1}', encoding="utf8")
+
+    progress = copy_tree(source, [tmp_path], show_progress=False)
+
+    assert source.read_text(encoding="utf8") == '{"a": 1}'
+    assert len(progress.errors) == 1
+    assert isinstance(progress.errors[0][1], shutil.SameFileError)
+
+def test_copy_skips_only_the_same_file(tmp_path: Path) -> None:
+    source: Path = tmp_path / "a.json"
+    source.write_text('{"a": 1}', encoding="utf8")
+    other: Path = tmp_path / "other"
+    other.mkdir()
+
+    progress = copy_tree(source, [tmp_path, other], show_progress=False)
+
+    assert source.read_text(encoding="utf8") == '{"a": 1}'
+    assert (other / "a.json").read_text(encoding="utf8") == '{"a": 1}'
+    assert len(progress.errors) == 1
+
+def test_copy_tree_keeps_symlinks(tmp_path: Path) -> None:
+    source: Path = tmp_path / "source"
+    (source / "sub").mkdir(parents=True)
+    (source / "a.json").write_text('{"a": 1}', encoding="utf8")
+    (source / "link.json").symlink_to("a.json")
+    (source / "sub" / "parent").symlink_to("..", target_is_directory=True)
+    (source / "broken").symlink_to("missing")
+    destination: Path = tmp_path / "destination"
+    destination.mkdir()
+    (destination / "link.json").write_text("old", encoding="utf8")
+
+    progress = copy_tree(source, [destination], show_progress=False)
+
+    assert progress.errors == []
+    assert progress.files_done == progress.files_found == 4
+    for name, target in (
+        ("link.json", "a.json"), ("sub/parent", ".."), ("broken", "missing")
+    ):
+        assert (destination / name).is_symlink()
+        assert os.readlink(destination / name) == target
+    assert (destination / "sub" / "parent").resolve() == destination
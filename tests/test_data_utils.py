@@ -0,0 +1,54 @@
+"""Tests of utils/data_utils."""
+
+from pathlib import Path
+from typing import Any
+
+from utils.chunked_list import ChunkedList
+from utils.compact_records import RecordBuilder, compact_data
+from utils.data_utils import diff_data
+
+
+def _diff(old: Any, new: Any) -> list[tuple[str, str, Any, Any]]:
+    return [
+        (kind, path.as_posix(), old_value, new_value)
+        for kind, path, old_value, new_value in diff_data(old, new)
+    ]
+
+def test_diff_of_dicts_and_lists() -> None:
+    old: dict = {"a": 1, "b": [1, 2, 3], "c": {"x": "y"}, "d": "gone"}
+    new: dict = {"a": 2, "b": [1, 2], "c": {"x": "y", "z": 0}, "e": "new"}
+    assert _diff(old, new) == [
+        ("changed", "a", 1, 2),
+        ("removed", "b/2", 3, None),
+        ("added", "c/z", None, 0),
+        ("removed", "d", "gone", None),
+        ("added", "e", None, "new"),
+    ]
+
+def test_diff_compares_types() -> None:
+    assert _diff([1, 1, 0, {}], [1.0, True, False, []]) == [
+        ("changed", "0", 1, 1.0),
+        ("changed", "1", 1, True),
+        ("changed", "2", 0, False),
+        ("changed", "3", {}, []),
+    ]
+    assert _diff("1", 1) == [("changed", ".", "1", 1)]
+
+def test_diff_of_equal_data_stored_differently() -> None:
+    data: list = [{"a": 1, "b": [1, 2]}, {"a": 2, "b": []}]
+    compact: Any = ChunkedList(compact_data(data, RecordBuilder()), load=1)
+    assert _diff(data, compact) == []
+
+def test_diff_skips_shared_subtrees() -> None:
+    class Unwalkable(dict):
+        def items(self) -> Any:
+            raise AssertionError("shared subtree was walked")
+
+    shared: Unwalkable = Unwalkable(a=1)
+    assert _diff({"s": shared, "n": 1}, {"s": shared, "n": 2}) == [
+        ("changed", "n", 1, 2)
+    ]
+
+def test_diff_paths() -> None:
+    changes: list = list(diff_data({"a": [0, {"b": 1}]}, {"a": [0, {"b": 2}]}))
+    assert changes[0][1] == Path("a/1/b")
@@ -0,0 +1,137 @@
+"""Tests of utils/journal_utils."""
+
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+import read_and_write
+from utils import journal_utils
+from utils.journal_utils import (
+    CommitError, FileTransaction, pending_journals, recover
+)
+
+
+@pytest.fixture
+def files(tmp_path: Path) -> list[Path]:
+    filepaths: list[Path] = [tmp_path / "a.json", tmp_path / "b.json"]
+    for i, filepath in enumerate(filepaths):
+        filepath.write_text(json.dumps({"old": i}), encoding="utf8")
+    return filepaths
+
+def _read(filepath: Path) -> Any:
+    return json.loads(filepath.read_text(encoding="utf8"))
+
+def _leftovers(directory: Path) -> list[str]:
+    """Hidden files: temps and backups left by transactions."""
+    return sorted(
+        path.name for path in directory.iterdir() if path.name[0] == "."
+    )
+
+def test_commit_replaces_every_file(files: list[Path], tmp_path: Path) -> None:
+    journals: Path = tmp_path / "journal"
+    with FileTransaction(journals) as transaction:
+        for i, filepath in enumerate(files):
+            transaction.stage(filepath, {"new": i})
+        transaction.stage(tmp_path / "c.json", {"created": True})
+
+    assert transaction.committed
+    assert [_read(filepath) for filepath in files] == [{"new": 0}, {"new": 1}]
+    assert _read(tmp_path / "c.json") == {"created": True}
+    assert _leftovers(tmp_path) == []
+    assert pending_journals(journals) == []
+
+def test_error_before_commit_changes_nothing(
+    files: list[Path],
+    tmp_path: Path
+) -> None:
+    with pytest.raises(RuntimeError):
+        with FileTransaction(tmp_path / "journal") as transaction:
+            transaction.stage(files[0], {"new": 0})
+            raise RuntimeError("stop")
+
+    assert _read(files[0]) == {"old": 0}
+    assert _leftovers(tmp_path) == []
+
+def test_failing_stage_leaves_no_temp(
+    files: list[Path],
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch
+) -> None:
+    def _write_half(filepath: Path, content: Any) -> None:
+        Path(filepath).write_text("{", encoding="utf8")
+        raise OSError("disk full")
+
+    transaction: FileTransaction = FileTransaction(tmp_path / "journal")
+    transaction.stage(files[0], {"new": 0})
+    monkeypatch.setitem(read_and_write.write_functions, ".json", _write_half)
+    with pytest.raises(OSError):
+        transaction.stage(files[1], {"new": 1})
+
+    assert list(transaction.entries) == [files[0]]
+    transaction.rollback()
+    assert _leftovers(tmp_path) == []
+    assert [_read(filepath) for filepath in files] == [{"old": 0}, {"old": 1}]
+
+def test_failing_commit_restores_every_file(
+    files: list[Path],
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch
+) -> None:
+    replace = os.replace
+    replaced: list[str] = []
+
+    def _replace_once(source: Any, destination: Any) -> None:
+        # the second file fails to be replaced, restoring works
+        staged: bool = str(source).endswith(".tmp")
+        if staged and str(destination) in map(str, files):
+            if replaced:
+                raise OSError("disk full")
+            replaced.append(str(destination))
+        replace(source, destination)
+
+    transaction: FileTransaction = FileTransaction(tmp_path / "journal")
+    for i, filepath in enumerate(files):
+        transaction.stage(filepath, {"new": i})
+    monkeypatch.setattr(journal_utils.os, "replace", _replace_once)
+
+    with pytest.raises(CommitError, match="every file was restored"):
+        transaction.commit()
+
+    assert replaced == [str(files[0])]
+    assert [_read(filepath) for filepath in files] == [{"old": 0}, {"old": 1}]
+    assert _leftovers(tmp_path) == []
+    assert pending_journals(tmp_path / "journal") == []
+
+def _interrupted(files: list[Path], journals: Path) -> None:
+    """Transaction stopped after replacing the first of files."""
+    transaction: FileTransaction = FileTransaction(journals)
+    for i, filepath in enumerate(files):
+        transaction.stage(filepath, {"new": i})
+    entries: list[dict[str, Any]] = list(transaction.entries.values())
+    transaction._write_journal(entries)
+    for entry in entries:
+        journal_utils._link_or_copy(
+            Path(entry["target"]), Path(entry["backup"])
+        )
+    os.replace(entries[0]["temp"], entries[0]["target"])
+
+def test_recover_forward(files: list[Path], tmp_path: Path) -> None:
+    journals: Path = tmp_path / "journal"
+    _interrupted(files, journals)
+
+    assert recover(journals, forward=True) == 1
+    assert [_read(filepath) for filepath in files] == [{"new": 0}, {"new": 1}]
+    assert _leftovers(tmp_path) == []
+    assert pending_journals(journals) == []
+
+def test_recover_back(files: list[Path], tmp_path: Path) -> None:
+    journals: Path = tmp_path / "journal"
+    _interrupted(files, journals)
+
+    assert recover(journals, forward=False) == 1
+    assert [_read(filepath) for filepath in files] == [{"old": 0}, {"old": 1}]
+    assert _leftovers(tmp_path) == []
+    assert pending_journals(journals) == []
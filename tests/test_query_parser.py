@@ -0,0 +1,120 @@
+"""Tests of parsing/query_parser."""
+
+from collections.abc import Iterator
+from itertools import count, islice
+from typing import Any
+
+import pytest
+
+from parsing.query_parser import (
+    QueryError, _Parser, compile_query, run_query, tokenize
+)
+from utils.chunked_list import ChunkedList
+from utils.compact_records import RecordBuilder, compact_data
+
+
+USERS: dict[str, Any] = {
+    "users": [
+        {"name": "ann", "age": 31, "email": "ann@example.com"},
+        {"name": "bob", "age": 25, "email": "bob@example.com"},
+        {"name": "cid", "age": 42, "email": None},
+    ]
+}
+
+
+def test_tokenize_keeps_positions() -> None:
+    assert tokenize(".a | .b") == [
+        ("field", ".a", 0), ("op", "|", 3), ("field", ".b", 5), ("end", "", 7)
+    ]
+
+def test_parse_fuses_lookups_into_a_path() -> None:
+    assert _Parser(".spec.containers[0].image").parse() == (
+        "path", (
+            ("field", "spec"), ("field", "containers"),
+            ("index", 0), ("field", "image")
+        )
+    )
+
+@pytest.mark.parametrize("query, results", [
+    (".users[] | select(.age > 30) | .name", ["ann", "cid"]),
+    (".users | map(.age) | add", [98]),
+    (".users[0] | keys", [["age", "email", "name"]]),
+    (".users[].email // \"none\"", ["ann@example.com", "bob@example.com"]),
+    (".users[2].email // \"none\"", ["none"]),
+    (".users | sort_by(.age) | .[0].name", ["bob"]),
+    ("[.users[] | {(.name): .age}] | length", [3]),
+    (".users[0] | to_entries | map({key: .key, value: 1}) | from_entries",
+     [{"name": 1, "age": 1, "email": 1}]),
+    ("limit(2; .users[] | .name)", ["ann", "bob"]),
+    ("first(.users[] | .name)", ["ann"]),
+    (".users[-1].name", ["cid"]),
+    (".users[1:].[] | .name", ["bob", "cid"]),
+    (".users | has(2), has(3)", [True, False]),
+    ("if .users[0].age > 40 then \"old\" else \"young\" end", ["young"]),
+])
+def test_results(query: str, results: list[Any]) -> None:
+    assert list(run_query(query, USERS)) == results
+
+def test_results_of_chunked_lists_and_compact_records() -> None:
+    data: Any = {
+        "users": ChunkedList(compact_data(USERS["users"], RecordBuilder()))
+    }
+    assert list(run_query(".users[] | select(.age > 30) | .name", data)) == [
+        "ann", "cid"
+    ]
+
+class EndlessList(list):
+    """Array of every natural number."""
+    def __iter__(self) -> Iterator[int]:
+        return count()
+
+def test_results_are_streamed() -> None:
+    plan = compile_query(".[] | select(. % 2 == 0)")
+    # an endless input, only read as far as the results taken
+    assert list(islice(plan.run(EndlessList()), 3)) == [0, 2, 4]
+
+def test_results_before_an_error_are_given() -> None:
+    results = run_query(".[] | .name", [{"name": "ann"}, 5])
+    assert next(results) == "ann"
+    with pytest.raises(QueryError):
+        next(results)
+
+def test_compiled_once_per_text() -> None:
+    assert compile_query(".a.b") is compile_query(".a.b")
+
+@pytest.mark.parametrize("query", [
+    ".a |",
+    ".a[",
+    "(.a",
+    ".a ] ",
+    "@",
+    "unknown_function",
+    "map(.a; .b)",
+    ".a[1:\"x\"]",
+    "{1: 2}",
+])
+def test_syntax_errors(query: str) -> None:
+    with pytest.raises(QueryError):
+        compile_query(query)
+
+@pytest.mark.parametrize("query, data", [
+    ("limit(\"a\"; .[])", [1, 2]),
+    ("limit(null; .[])", [1, 2]),
+    ("[\"a\"] | from_entries", None),
+    ("[1] | from_entries", None),
+    ("[{\"value\": 1}] | from_entries", None),
+    ("has([1])", {"a": 1}),
+    ("has(\"a\")", [1]),
+    (".a", [1]),
+    (".[]", 1),
+    (". + 1", "a"),
+    (". / 0", 1),
+    ("tonumber", "a"),
+    ("test(1)", "a"),
+    ("ascii_downcase", 1),
+    ("keys", 1),
+    ("sort", {"a": 1}),
+])
+def test_run_errors(query: str, data: Any) -> None:
+    with pytest.raises(QueryError):
+        list(run_query(query, data))
@@ -0,0 +1,35 @@
+"""Tests of read_and_write."""
+
+from pathlib import Path
+
+from read_and_write import iter_table, read_file, write_file
+
+
+def test_empty_cells_are_none_in_every_column(tmp_path: Path) -> None:
+    filepath: Path = tmp_path / "table.csv"
+    filepath.write_text(
+        "name,age,score,active\n"
+        "ann,30,1.5,true\n"
+        ",,,\n"
+        "bob,41,2.0,false\n",
+        encoding="utf8"
+    )
+
+    records: list = [
+        record for chunk in iter_table(filepath) for record in chunk
+    ]
+
+    assert records[1] == {
+        "name": None, "age": None, "score": None, "active": None
+    }
+    assert records[0] == {"name": "ann", "age": 30, "score": 1.5, "active": True}
+
+def test_empty_cells_round_trip(tmp_path: Path) -> None:
+    filepath: Path = tmp_path / "table.csv"
+    filepath.write_text("name,age\nann,\n,30\n", encoding="utf8")
+
+    write_file(filepath, read_file(filepath))
+
+    assert filepath.read_text(encoding="utf8").splitlines() == [
+        "name,age", "ann,", ",30"
+    ]
@@ -0,0 +1,70 @@
+"""Tests of utils/record_utils."""
+
+from typing import Any
+
+from utils.chunked_list import ChunkedList
+from utils.record_utils import (
+    aggregate_records, group_records, key_values, sort_records
+)
+
+
+RECORDS: list[dict[str, Any]] = [
+    {"name": "ann", "age": 31, "address": {"city": "Lisbon"}},
+    {"name": "bob", "age": 25, "address": {"city": "Porto"}},
+    {"name": "cid", "age": 31, "address": {"city": "Braga"}},
+    {"name": "dan", "age": 25},
+]
+
+
+def _names(records: Any) -> list[str]:
+    return [record["name"] for record in records]
+
+def test_sort_by_keys_is_stable_and_in_place() -> None:
+    records: list = list(RECORDS)
+    sort_records(records, ["age"])
+    assert _names(records) == ["bob", "dan", "ann", "cid"]
+
+    sort_records(records, ["age", "name"], reverse=True)
+    assert _names(records) == ["cid", "ann", "dan", "bob"]
+
+def test_sort_by_missing_nested_keys() -> None:
+    records: list = list(RECORDS)
+    sort_records(records, ["address/city"])
+    # a missing key is None, ordered first like in queries
+    assert _names(records) == ["dan", "cid", "ann", "bob"]
+
+def test_sort_mixed_types_by_type_first() -> None:
+    items: list = ["b", 2, None, True, "a", 1.5, [1]]
+    sort_records(items, [])
+    assert items == [None, True, 1.5, 2, "a", "b", [1]]
+
+def test_sort_keeps_chunked_lists() -> None:
+    records: ChunkedList = ChunkedList(RECORDS, load=2)
+    sort_records(records, ["name"], reverse=True)
+    assert isinstance(records, ChunkedList)
+    assert _names(records) == ["dan", "cid", "bob", "ann"]
+
+def test_key_values() -> None:
+    assert key_values(RECORDS, "address/city") == [
+        "Lisbon", "Porto", "Braga", None
+    ]
+    assert key_values([[1, 2], [3]], "1") == [2, None]
+
+def test_group_records_keeps_record_order() -> None:
+    groups: dict = group_records(RECORDS, "age")
+    assert {age: _names(group) for age, group in groups.items()} == {
+        31: ["ann", "cid"], 25: ["bob", "dan"]
+    }
+
+def test_group_records_by_unhashable_values() -> None:
+    groups: dict = group_records([{"a": [1]}, {"a": [1]}, {"a": [2]}], "a")
+    assert list(map(len, groups.values())) == [2, 1]
+
+def test_aggregate_records() -> None:
+    aggregates: dict = aggregate_records(RECORDS, "age", "address/city")
+    assert aggregates["Lisbon"].count == 1
+    assert aggregates[None].sum == 25
+
+    total = aggregate_records(RECORDS + [{"age": "old"}], "age")[None]
+    assert (total.count, total.numbers, total.min, total.max) == (5, 4, 25, 31)
+    assert total.mean == 28
@@ -0,0 +1,280 @@
+"""
+Module for a list of chunks, for huge arrays edited in the middle.
+
+A ChunkedList keeps its items in chunks of up to a few thousand items,
+with a Fenwick tree of the chunk lengths to find the chunk of an index
+in O(log n). Inserting or deleting an item only moves the items of its
+chunk, instead of every item after it like a list does. Chunks are split
+when they grow too big and merged when they get too small, the tree being
+rebuilt lazily after that.
+
+ChunkedList is a MutableSequence, indexed like a list, so data paths and
+writers go through it as through a list. LIST_TYPES holds the types that
+are lists of data, CONTAINER_TYPES the ones holding data, with the dicts
+of utils/compact_records.
+
+### Example usage:
+
+items = ChunkedList(range(5_000_000))
+items.insert(1, "new")  # moves at most a chunk of items
+del items[0]
+"""
+
+from collections.abc import Callable, Iterable, Iterator, MutableSequence
+import copy
+from itertools import chain, islice
+import sys
+from typing import Any
+
+from utils.compact_records import DICT_TYPES
+
+
+class ChunkedList(MutableSequence):
+    """List stored in chunks, O(log n) get, set, insert and delete."""
+    LOAD: int = 1024
+
+    def __init__(self, items: Iterable[Any] = (), load: int = LOAD) -> None:
+        self.load: int = load
+        self._load_items(list(items))
+
+    def _load_items(self, items: list[Any]) -> None:
+        self._chunks: list[list[Any]] = [
+            items[i:i + self.load] for i in range(0, len(items), self.load)
+        ]
+        self._len: int = len(items)
+        self._tree: list[int] | None = None
+
+    # Fenwick tree of the chunk lengths, tree[i] holding the sum of a range
+    # of chunks ending in chunk i - 1
+
+    def _build_tree(self) -> list[int]:
+        tree: list[int] = [0, *map(len, self._chunks)]
+        for i in range(1, len(tree)):
+            parent: int = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+        return tree
+
+    def _update_tree(self, chunk_i: int, delta: int) -> None:
+        tree: list[int] | None = self._tree
+        if tree is None:
+            return
+        i: int = chunk_i + 1
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def _locate(self, index: int) -> tuple[int, int]:
+        """(chunk, index inside it) of a valid, positive, index."""
+        tree: list[int] = self._tree or self._build_tree()
+        position: int = 0
+        step: int = 1 << (len(tree) - 1).bit_length()
+        while step:
+            following: int = position + step
+            if following < len(tree) and tree[following] <= index:
+                position = following
+                index -= tree[following]
+            step >>= 1
+        return position, index
+
+    def _normalize(self, index: int) -> int:
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("ChunkedList index out of range")
+        return index
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[Any]:
+        return chain.from_iterable(self._chunks)
+
+    def __reversed__(self) -> Iterator[Any]:
+        for chunk in reversed(self._chunks):
+            yield from reversed(chunk)
+
+    def __getitem__(self, index: int | slice) -> Any:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._len)
+            if step != 1 or start >= stop:
+                return list(self)[index]
+            chunk_i, offset = self._locate(start)
+            items: Iterator[Any] = chain(
+                self._chunks[chunk_i][offset:],
+                chain.from_iterable(self._chunks[chunk_i + 1:])
+            )
+            return list(islice(items, stop - start))
+        chunk_i, offset = self._locate(self._normalize(index))
+        return self._chunks[chunk_i][offset]
+
+    def __setitem__(self, index: int | slice, value: Any) -> None:
+        if isinstance(index, slice):
+            items: list[Any] = list(self)
+            items[index] = value
+            self._load_items(items)
+            return
+        chunk_i, offset = self._locate(self._normalize(index))
+        self._chunks[chunk_i][offset] = value
+
+    def __delitem__(self, index: int | slice) -> None:
+        if isinstance(index, slice):
+            items: list[Any] = list(self)
+            del items[index]
+            self._load_items(items)
+            return
+        chunk_i, offset = self._locate(self._normalize(index))
+        chunk: list[Any] = self._chunks[chunk_i]
+        del chunk[offset]
+        self._len -= 1
+
+        if not chunk:
+            del self._chunks[chunk_i]
+            self._tree = None
+            return
+        if len(chunk) >= self.load // 4 or len(self._chunks) == 1:
+            self._update_tree(chunk_i, -1)
+            return
+
+        # too small: merged into a neighbour
+        neighbour_i: int = chunk_i - 1 if chunk_i else chunk_i + 1
+        first, second = sorted((chunk_i, neighbour_i))
+        self._chunks[first].extend(self._chunks.pop(second))
+        if len(self._chunks[first]) > 2 * self.load:
+            self._split(first)
+        self._tree = None
+
+    def insert(self, index: int, value: Any) -> None:
+        """Insert value before index, like list.insert."""
+        if index < 0:
+            index = max(0, index + self._len)
+        if index >= self._len:
+            self.append(value)
+            return
+        chunk_i, offset = self._locate(index)
+        self._chunks[chunk_i].insert(offset, value)
+        self._len += 1
+        if len(self._chunks[chunk_i]) > 2 * self.load:
+            self._split(chunk_i)
+            self._tree = None
+        else:
+            self._update_tree(chunk_i, 1)
+
+    def _split(self, chunk_i: int) -> None:
+        chunk: list[Any] = self._chunks[chunk_i]
+        half: int = len(chunk) // 2
+        self._chunks[chunk_i:chunk_i + 1] = [chunk[:half], chunk[half:]]
+
+    def append(self, value: Any) -> None:
+        if not self._chunks or len(self._chunks[-1]) >= self.load:
+            self._chunks.append([value])
+            self._tree = None
+        else:
+            self._chunks[-1].append(value)
+            self._update_tree(len(self._chunks) - 1, 1)
+        self._len += 1
+
+    def extend(self, values: Iterable[Any]) -> None:
+        for value in values:
+            self.append(value)
+
+    def sort(self, *, key: Any = None, reverse: bool = False) -> None:
+        """Stable sort, like list.sort."""
+        items: list[Any] = list(self)
+        items.sort(key=key, reverse=reverse)
+        self._load_items(items)
+
+    def reverse(self) -> None:
+        self._load_items(list(reversed(self)))
+
+    def __copy__(self) -> "ChunkedList":
+        copied: ChunkedList = ChunkedList.__new__(ChunkedList)
+        copied.load = self.load
+        copied._chunks = [chunk.copy() for chunk in self._chunks]
+        copied._len = self._len
+        copied._tree = None
+        return copied
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, (list, ChunkedList)):
+            return NotImplemented
+        return len(self) == len(other) and all(
+            a == b for a, b in zip(self, other)
+        )
+
+    __hash__ = None
+
+    def __sizeof__(self) -> int:
+        # its chunks and tree are its storage, as the item array of a list,
+        # so sys.getsizeof and data_stats count them
+        return (
+            object.__sizeof__(self) + sys.getsizeof(self.__dict__)
+            + sys.getsizeof(self._chunks)
+            + sum(map(sys.getsizeof, self._chunks))
+            + (0 if self._tree is None else sys.getsizeof(self._tree))
+        )
+
+    def __repr__(self) -> str:
+        shown: list[Any] = list(islice(self, 10))
+        more: str = f", ... {self._len - 10:,} more" if self._len > 10 else ""
+        return f"ChunkedList({repr(shown)[:-1]}{more}])"
+
+LIST_TYPES: tuple[type, ...] = (list, ChunkedList)
+CONTAINER_TYPES: tuple[type, ...] = (*DICT_TYPES, *LIST_TYPES)
+
+
+def _convert(
+    data: Any,
+    convert: Callable[[Any], Any | None]
+) -> tuple[Any, int]:
+    """
+    Return data with the containers convert gives a new version of (not
+    None) replaced, at any depth, and how many were. Containers holding
+    replaced ones are copied, the rest of data is left untouched, so data
+    shared with other editors isn't changed.
+    """
+    converted: int = 0
+
+    def _walk(node: Any) -> Any:
+        nonlocal converted
+        children: Iterable[tuple[Any, Any]] = (
+            node.items() if isinstance(node, DICT_TYPES) else enumerate(node)
+        )
+        changes: dict[Any, Any] = {}
+        for key, value in children:
+            if isinstance(value, CONTAINER_TYPES):
+                new_value: Any = _walk(value)
+                if new_value is not value:
+                    changes[key] = new_value
+
+        new_node: Any | None = convert(node)
+        if changes:
+            new_node = copy.copy(node if new_node is None else new_node)
+            for key, value in changes.items():
+                new_node[key] = value
+        if new_node is not None and new_node is not node:
+            converted += new_node.__class__ is not node.__class__
+            return new_node
+        return node
+
+    if not isinstance(data, CONTAINER_TYPES):
+        return data, 0
+    return _walk(data), converted
+
+def chunk_lists(data: Any, min_size: int) -> tuple[Any, int]:
+    """
+    Return data with its lists of at least min_size items, at any depth,
+    as ChunkedLists, and how many were converted. List subclasses, like
+    YAMLDocuments, are kept as they are: their type tells how to write them.
+    """
+    return _convert(data, lambda node: (
+        ChunkedList(node)
+        if type(node) is list and len(node) >= min_size else None
+    ))
+
+def unchunk_lists(data: Any) -> tuple[Any, int]:
+    """Return data with its ChunkedLists, at any depth, as lists."""
+    return _convert(data, lambda node: (
+        list(node) if isinstance(node, ChunkedList) else None
+    ))
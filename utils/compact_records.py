@@ -0,0 +1,310 @@
+"""
+Module for compact records, dicts sharing their keys with the other
+records of the same shape.
+
+Arrays of records repeat the same keys in every record, and each record
+is a full dict with its own hash table. A CompactRecord only holds the
+values of its record, in the slots of a class made once per shape (the
+tuple of its keys) and holding the key table, so a record takes about
+the memory of a tuple of its values. RecordBuilder builds them, as the
+object_pairs_hook of json while parsing or over already parsed data,
+sharing repeated short strings between records when asked to.
+
+CompactRecord is a MutableMapping, indexed and edited like a dict. Keys
+deleted from its shape are marked missing in their slot and keys added
+are kept in a dict of extra keys, keys being ordered as in a dict.
+DICT_TYPES holds the types that are dicts of data.
+
+### Example usage:
+
+builder = RecordBuilder(intern_values=True)
+records = json.loads(text, object_pairs_hook=builder)
+records[0]["name"] = "new"  # still a CompactRecord
+"""
+
+from collections.abc import (
+    Callable, ItemsView, Iterator, MutableMapping, MutableSequence, ValuesView
+)
+import logging
+from operator import attrgetter
+from typing import Any
+
+
+logger = logging.getLogger(__name__)
+
+
+# mode interning keys only, and mode also interning short string values
+COMPACT_MODES: tuple[str, ...] = ("keys", "values")
+
+# dicts with more keys are kept as dicts, they are not records
+MAX_KEYS: int = 64
+# shapes made at most, data of more shapes is not made of records
+MAX_SHAPES: int = 4096
+# longest strings shared between records when interning values
+MAX_INTERNED_LENGTH: int = 64
+
+
+class _Missing:
+    """Value of the slots of keys deleted from a record."""
+    def __repr__(self) -> str:
+        return "<missing>"
+
+    def __reduce__(self) -> str:
+        # the same object once copied or unpickled
+        return "_MISSING"
+
+_MISSING: Any = _Missing()
+
+
+class CompactRecord(MutableMapping):
+    """Dict keeping its values in slots, its keys in its class."""
+    __slots__ = ("_extra",)
+
+    # set by record_class for each shape: its keys, the slot of each key
+    # and a getter of the tuple of the slot values
+    _keys: tuple[Any, ...] = ()
+    _slots: dict[Any, Any] = {}
+    _get_values: Callable[["CompactRecord"], tuple[Any, ...]]
+
+    def __getitem__(self, key: Any) -> Any:
+        slot: Any = self._slots.get(key)
+        if slot is not None:
+            value: Any = slot.__get__(self)
+            if value is not _MISSING:
+                return value
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        slot: Any = self._slots.get(key)
+        if slot is not None and slot.__get__(self) is not _MISSING:
+            slot.__set__(self, value)
+            return
+        # keys added back after being deleted go last, like in a dict
+        if self._extra is None:
+            self._extra = {}
+        self._extra[key] = value
+
+    def __delitem__(self, key: Any) -> None:
+        slot: Any = self._slots.get(key)
+        if slot is not None and slot.__get__(self) is not _MISSING:
+            slot.__set__(self, _MISSING)
+            return
+        if self._extra is None:
+            raise KeyError(key)
+        del self._extra[key]
+
+    def __contains__(self, key: Any) -> bool:
+        slot: Any = self._slots.get(key)
+        if slot is not None and slot.__get__(self) is not _MISSING:
+            return True
+        return self._extra is not None and key in self._extra
+
+    def _pairs(self) -> Iterator[tuple[Any, Any]]:
+        """(key, value) of every key, in order."""
+        values: tuple[Any, ...] = self._get_values(self)
+        if _MISSING in values:
+            yield from (
+                pair for pair in zip(self._keys, values)
+                if pair[1] is not _MISSING
+            )
+        else:
+            yield from zip(self._keys, values)
+        if self._extra:
+            yield from self._extra.items()
+
+    def __iter__(self) -> Iterator[Any]:
+        return (key for key, _ in self._pairs())
+
+    def __len__(self) -> int:
+        missing: int = self._get_values(self).count(_MISSING)
+        return len(self._keys) - missing + len(self._extra or ())
+
+    def items(self) -> ItemsView:
+        return _RecordItems(self)
+
+    def values(self) -> ValuesView:
+        return _RecordValues(self)
+
+    def to_dict(self) -> dict[Any, Any]:
+        """The record as a dict."""
+        return dict(self._pairs())
+
+    def __copy__(self) -> "CompactRecord":
+        record: CompactRecord = self.__class__(*self._get_values(self))
+        if self._extra is not None:
+            record._extra = self._extra.copy()
+        return record
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        # shape classes are made at runtime, records are rebuilt from
+        # their keys instead of being pickled by class name
+        return (_rebuild, (self._keys, self._get_values(self), self._extra))
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, DICT_TYPES):
+            return NotImplemented
+        return self.to_dict() == (
+            other.to_dict() if isinstance(other, CompactRecord) else other
+        )
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        # shown like the dict it stands for
+        return repr(self.to_dict())
+
+class _RecordItems(ItemsView):
+    def __iter__(self) -> Iterator[tuple[Any, Any]]:
+        return self._mapping._pairs()
+
+class _RecordValues(ValuesView):
+    def __iter__(self) -> Iterator[Any]:
+        return (value for _, value in self._mapping._pairs())
+
+DICT_TYPES: tuple[type, ...] = (dict, CompactRecord)
+
+# shape classes by their keys
+_classes: dict[tuple[Any, ...], type[CompactRecord]] = {}
+# keys that can't be a shape, as they repeat a key, apart from the shapes
+# so they don't use up MAX_SHAPES
+_rejected: set[tuple[Any, ...]] = set()
+# if MAX_SHAPES was reached, which is logged once
+_shapes_full: bool = False
+
+def record_class(keys: tuple[Any, ...]) -> type[CompactRecord] | None:
+    """
+    The CompactRecord class of records with keys, None when they are
+    not worth one (too many, repeated) or there are too many shapes.
+    """
+    global _shapes_full
+    try:
+        return _classes[keys]
+    except KeyError:
+        pass
+    if not 0 < len(keys) <= MAX_KEYS or keys in _rejected:
+        return None
+    if len(set(keys)) != len(keys):
+        if len(_rejected) < MAX_SHAPES:
+            _rejected.add(keys)
+        return None
+    if len(_classes) >= MAX_SHAPES:
+        if not _shapes_full:
+            _shapes_full = True
+            logger.warning(
+                f"{MAX_SHAPES:,} record shapes made, records of new "
+                "shapes are kept as dicts from now on."
+            )
+        return None
+
+    slot_names: tuple[str, ...] = tuple(f"_{i}" for i in range(len(keys)))
+    # __init__ is generated, like namedtuple does, as assigning the slots
+    # in a loop is several times slower than building a dict
+    arguments: str = ", ".join(f"v{i}" for i in range(len(keys)))
+    source: str = (
+        f"def __init__(self, {arguments}):\n"
+        + "".join(f"    self._{i} = v{i}\n" for i in range(len(keys)))
+        + "    self._extra = None\n"
+    )
+    namespace: dict[str, Any] = {}
+    exec(source, namespace)
+
+    getter: attrgetter = attrgetter(*slot_names)
+    cls: type[CompactRecord] = type(
+        f"CompactRecord{len(_classes)}",
+        (CompactRecord,),
+        {
+            "__slots__": slot_names,
+            "__init__": namespace["__init__"],
+            "__module__": __name__,
+            "_keys": keys,
+            "_get_values": staticmethod(
+                getter if len(keys) > 1
+                else lambda record: (getter(record),)
+            )
+        }
+    )
+    cls._slots = {
+        key: cls.__dict__[name] for key, name in zip(keys, slot_names)
+    }
+    _classes[keys] = cls
+    return cls
+
+def _rebuild(
+    keys: tuple[Any, ...],
+    values: tuple[Any, ...],
+    extra: dict[Any, Any] | None
+) -> Any:
+    """Record with keys and values, unpickled or copied."""
+    cls: type[CompactRecord] | None = record_class(keys)
+    if cls is None:
+        record: Any = dict(zip(keys, values))
+        for key in [key for key, value in record.items() if value is _MISSING]:
+            del record[key]
+        record.update(extra or ())
+        return record
+    record = cls(*values)
+    record._extra = extra
+    return record
+
+class RecordBuilder:
+    """
+    Builder of compact records from (key, value) pairs, usable as the
+    object_pairs_hook of json. With intern_values, equal strings of up to
+    MAX_INTERNED_LENGTH characters are shared by the records built.
+    """
+    def __init__(self, intern_values: bool = False) -> None:
+        self.intern_values = intern_values
+        self.strings: dict[str, str] = {}
+
+    def _intern(self, value: Any) -> Any:
+        if type(value) is str and len(value) <= MAX_INTERNED_LENGTH:
+            return self.strings.setdefault(value, value)
+        return value
+
+    def __call__(self, pairs: list[tuple[Any, Any]]) -> Any:
+        keys: tuple[Any, ...] = tuple([key for key, _ in pairs])
+        cls: type[CompactRecord] | None = record_class(keys)
+        if cls is None:
+            return dict(pairs)
+        if self.intern_values:
+            return cls(*map(self._intern, [value for _, value in pairs]))
+        return cls(*[value for _, value in pairs])
+
+def compact_data(data: Any, builder: RecordBuilder) -> Any:
+    """
+    Return data with its dicts, at any depth, as compact records built by
+    builder. Containers are rebuilt, data itself is left untouched.
+    """
+    if isinstance(data, DICT_TYPES):
+        return builder([
+            (key, compact_data(value, builder)) for key, value in data.items()
+        ])
+    if isinstance(data, MutableSequence):
+        return type(data)([compact_data(item, builder) for item in data])
+    return builder._intern(data) if builder.intern_values else data
+
+def expand_data(data: Any) -> Any:
+    """
+    Return data with its compact records, at any depth, as dicts.
+    Containers are rebuilt, data itself is left untouched.
+    """
+    if isinstance(data, DICT_TYPES):
+        return {key: expand_data(value) for key, value in data.items()}
+    if isinstance(data, MutableSequence):
+        return type(data)([expand_data(item) for item in data])
+    return data
+
+def count_records(data: Any) -> int:
+    """Number of compact records in data, at any depth."""
+    count: int = 0
+    stack: list[Any] = [data]
+    while stack:
+        node: Any = stack.pop()
+        if isinstance(node, DICT_TYPES):
+            count += isinstance(node, CompactRecord)
+            stack.extend(node.values())
+        elif isinstance(node, MutableSequence):
+            stack.extend(node)
+    return count
@@ -0,0 +1,312 @@
+"""
+Module for copying files and directory trees fast.
+
+Files are copied by a pool of threads, each file into every destination
+at once: in the kernel with os.copy_file_range (or os.sendfile) where
+the platform and filesystems allow it, reading the source through the
+page cache once, else reading each chunk once and writing it into every
+destination. Symlinks in a tree are copied as links, not followed.
+Progress and throughput are reported while copying.
+"""
+
+from collections.abc import Callable, Iterator
+from concurrent.futures import (
+    FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+)
+import contextlib
+from dataclasses import dataclass, field
+import errno
+import os
+from pathlib import Path
+import shutil
+import sys
+import threading
+import time
+
+from utils.render_utils import format_size
+
+
+CHUNK_SIZE: int = 8 * 1024 * 1024
+
+# errors meaning the kernel copy can't be used for these files
+KERNEL_COPY_ERRORS: tuple[int, ...] = (
+    errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF,
+    errno.ETXTBSY, errno.EPERM, errno.ENOTSUP
+)
+
+
+@dataclass
+class CopyProgress:
+    """Counts of a copy, updated by the copying threads."""
+    destinations: int = 1
+    files_found: int = 0
+    files_done: int = 0
+    bytes_done: int = 0
+    errors: list[tuple[Path, OSError]] = field(default_factory=list)
+    started: float = field(default_factory=time.perf_counter)
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add_bytes(self, size: int) -> None:
+        with self.lock:
+            self.bytes_done += size
+
+    def add_file(self) -> None:
+        with self.lock:
+            self.files_done += 1
+
+    def add_error(self, path: Path, error: OSError) -> None:
+        with self.lock:
+            self.errors.append((path, error))
+
+    def summary(self) -> str:
+        """Files and bytes copied so far, with the throughput."""
+        seconds: float = max(time.perf_counter() - self.started, 1e-9)
+        return (
+            f"{self.files_done:,}/{self.files_found:,} files, "
+            f"{format_size(self.bytes_done)} "
+            f"({format_size(self.bytes_done / seconds)}/s)"
+        )
+
+def _copy_file_range(
+    source: int,
+    destination: int,
+    offset: int,
+    count: int
+) -> int:
+    return os.copy_file_range(source, destination, count, offset, offset)
+
+def _sendfile(source: int, destination: int, offset: int, count: int) -> int:
+    return os.sendfile(destination, source, offset, count)
+
+# kernel copies available, in order of preference
+KERNEL_COPIES: list[Callable[[int, int, int, int], int]] = []
+if hasattr(os, "copy_file_range"):
+    KERNEL_COPIES.append(_copy_file_range)
+if hasattr(os, "sendfile") and sys.platform.startswith("linux"):
+    KERNEL_COPIES.append(_sendfile)
+
+def _kernel_copy(
+    source_fd: int,
+    destination_fd: int,
+    size: int,
+    progress: CopyProgress
+) -> bool:
+    """
+    Copy size bytes of source into destination in the kernel.
+    Return False, before copying anything, if it can't be done.
+    """
+    for kernel_copy in KERNEL_COPIES:
+        offset: int = 0
+        try:
+            while offset < size:
+                copied: int = kernel_copy(
+                    source_fd, destination_fd, offset,
+                    min(CHUNK_SIZE, size - offset)
+                )
+                if copied == 0:  # source got shorter while copying
+                    break
+                offset += copied
+                progress.add_bytes(copied)
+        except OSError as e:
+            if offset == 0 and e.errno in KERNEL_COPY_ERRORS:
+                continue
+            raise
+        return True
+    return False
+
+def copy_file(
+    source: Path,
+    destinations: list[Path],
+    progress: CopyProgress
+) -> None:
+    """
+    Copy source file, with its mode and times, into every destination.
+    Raw file descriptors are used, buffered files cost more than the
+    copy of small files. Destinations that are the source file itself
+    are not opened, which would truncate it, but kept as errors.
+    """
+    with contextlib.ExitStack() as stack:
+        source_fd: int = os.open(source, os.O_RDONLY)
+        stack.callback(os.close, source_fd)
+        stat: os.stat_result = os.fstat(source_fd)
+
+        targets: list[Path] = []
+        for destination in destinations:
+            try:
+                target_stat: os.stat_result = os.stat(destination)
+            except FileNotFoundError:
+                targets.append(destination)
+                continue
+            if (target_stat.st_dev, target_stat.st_ino) == (
+                stat.st_dev, stat.st_ino
+            ):
+                progress.add_error(destination, shutil.SameFileError(
+                    f"{source} and {destination} are the same file"
+                ))
+                continue
+            targets.append(destination)
+
+        destination_fds: list[int] = []
+        pending: list[int] = []
+        for destination in targets:
+            destination_fd: int = os.open(
+                destination, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666
+            )
+            stack.callback(os.close, destination_fd)
+            destination_fds.append(destination_fd)
+            if not stat.st_size or not _kernel_copy(
+                source_fd, destination_fd, stat.st_size, progress
+            ):
+                pending.append(destination_fd)
+
+        # a single read of each chunk for every destination left
+        if pending:
+            os.lseek(source_fd, 0, os.SEEK_SET)
+            while chunk := os.read(source_fd, CHUNK_SIZE):
+                for destination_fd in pending:
+                    view: memoryview = memoryview(chunk)
+                    while view:
+                        view = view[os.write(destination_fd, view):]
+                progress.add_bytes(len(chunk) * len(pending))
+
+        for destination_fd in destination_fds:
+            if os.chmod in os.supports_fd:
+                os.chmod(destination_fd, stat.st_mode & 0o7777)
+            if os.utime in os.supports_fd:
+                os.utime(
+                    destination_fd, ns=(stat.st_atime_ns, stat.st_mtime_ns)
+                )
+
+    if os.utime not in os.supports_fd:
+        for destination in targets:
+            shutil.copystat(source, destination)
+    progress.add_file()
+
+def copy_link(
+    source: Path,
+    destinations: list[Path],
+    progress: CopyProgress
+) -> None:
+    """
+    Copy source symlink, as a link to the same target, into every
+    destination, replacing what is there. A destination that is the
+    source link itself is kept as an error.
+    """
+    target: str = os.readlink(source)
+    stat: os.stat_result = os.lstat(source)
+    for destination in destinations:
+        try:
+            target_stat: os.stat_result = os.lstat(destination)
+        except FileNotFoundError:
+            pass
+        else:
+            if (target_stat.st_dev, target_stat.st_ino) == (
+                stat.st_dev, stat.st_ino
+            ):
+                progress.add_error(destination, shutil.SameFileError(
+                    f"{source} and {destination} are the same file"
+                ))
+                continue
+            os.unlink(destination)
+        os.symlink(target, destination)
+    progress.add_file()
+
+def walk_files(source: Path) -> Iterator[tuple[Path, list[Path], list[Path]]]:
+    """
+    Yield (relative directory, relative files, relative symlinks) of
+    every directory of the source tree, parents first, using the file
+    types cached by scandir. Symlinks aren't followed, a link to a
+    directory out of the tree, or to a parent, would copy it too.
+    """
+    stack: list[Path] = [Path()]
+    while stack:
+        relative: Path = stack.pop()
+        files: list[Path] = []
+        links: list[Path] = []
+        subdirectories: list[Path] = []
+        with os.scandir(source / relative) as entries:
+            for entry in entries:
+                if entry.is_symlink():
+                    links.append(relative / entry.name)
+                elif entry.is_dir(follow_symlinks=False):
+                    subdirectories.append(relative / entry.name)
+                else:
+                    files.append(relative / entry.name)
+        yield relative, files, links
+        stack.extend(reversed(subdirectories))
+
+def copy_tree(
+    source: Path,
+    destinations: list[Path],
+    workers: int | None = None,
+    show_progress: bool = True
+) -> CopyProgress:
+    """
+    Copy source, a file or a directory, into every destination in a single
+    pass over it, the files being copied by a pool of workers threads.
+    Like shutil.copy2, a file copied into a directory keeps its name, and
+    like shutil.copytree, a directory is copied as the destination.
+    Errors of single files are kept in the returned progress.
+    """
+    progress: CopyProgress = CopyProgress(destinations=len(destinations))
+    show_progress = show_progress and sys.stderr.isatty()
+    if workers is None:
+        workers = min(32, (os.cpu_count() or 1) + 4)
+
+    if source.is_file():
+        progress.files_found = 1
+        targets: list[Path] = [
+            destination / source.name if destination.is_dir() else destination
+            for destination in destinations
+        ]
+        try:
+            copy_file(source, targets, progress)
+        except OSError as e:
+            progress.add_error(source, e)
+        return progress
+
+    def _copy(relative: Path, copy: Callable = copy_file) -> None:
+        try:
+            copy(
+                source / relative,
+                [destination / relative for destination in destinations],
+                progress
+            )
+        except OSError as e:
+            progress.add_error(source / relative, e)
+
+    directories: list[Path] = []
+    futures: set[Future] = set()
+    last_shown: float = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for relative, files, links in walk_files(source):
+            for destination in destinations:
+                (destination / relative).mkdir(parents=True, exist_ok=True)
+            directories.append(relative)
+            progress.files_found += len(files) + len(links)
+            futures.update(executor.submit(_copy, file) for file in files)
+            for link in links:
+                _copy(link, copy_link)
+
+            # keep memory bounded while walking huge trees
+            if len(futures) > workers * 64:
+                _, futures = wait(futures, return_when=FIRST_COMPLETED)
+
+            if show_progress and time.perf_counter() - last_shown > 0.2:
+                last_shown = time.perf_counter()
+                sys.stderr.write(f"\r{progress.summary()}\033[K")
+
+        while futures:
+            _, futures = wait(futures, timeout=0.2)
+            if show_progress:
+                sys.stderr.write(f"\r{progress.summary()}\033[K")
+
+    # directories metadata last, copying into them changed their mtime
+    for relative in reversed(directories):
+        for destination in destinations:
+            with contextlib.suppress(OSError):
+                shutil.copystat(source / relative, destination / relative)
+
+    if show_progress:
+        sys.stderr.write("\r\033[K")
+    return progress
@@ -7,17 +7,25 @@ nested data structures.
 """
 
 import ast
+from collections.abc import Iterable, Iterator
+import csv
 from itertools import repeat
+import json
 import logging
+import sys
 from typing import Any, Callable
 from pathlib import Path
 
-from messages.messages import error_msg
+from messages.messages import get_error_message
 from read_and_write import read_file, write_file
+from utils.chunked_list import CONTAINER_TYPES, LIST_TYPES
+from utils.compact_records import DICT_TYPES
 
 
 logger = logging.getLogger(__name__)
 
+GLOB_CHARS: str = "*?["
+
 
 def smart_cast(value: str) -> Any:
     """Do a intelligent type conversion of given value."""
@@ -59,7 +67,7 @@ def get_data_by_path(data: Any, data_path: Path) -> Any:
             if isinstance(current, str):
                 current = f'"{current}"'
 
-            message = error_msg["InvalidIndex"].format(index=index, data=current)
+            message = get_error_message("InvalidIndex", index=index, data=current)
             raise IndexError(message) from e
 
     return current
@@ -84,50 +92,240 @@ def change_data_by_path(
     try:
         masked_data[last_index]: Any = new_data
     except KeyError as e: # this is ugly <-----------
-        if isinstance(masked_data, dict) and isinstance(last_index, int):
+        if isinstance(masked_data, DICT_TYPES) and isinstance(last_index, int):
             masked_data[str(last_index)] = new_data
         else:
             raise
 
     return data
 
+def iter_input_files(patterns: Iterable[str], base: Path) -> Iterator[Path]:
+    """
+    Yield the files of given paths or glob patterns, relative to base.
+    Patterns ("**" matching any directories) are expanded lazily, so the
+    first files are yielded before the whole tree is walked. Files given
+    more than once are yielded once.
+    """
+    seen: set[Path] = set()
+    for pattern in patterns:
+        matches: Iterable[Path]
+        if any(char in pattern for char in GLOB_CHARS):
+            pattern_path: Path = Path(pattern)
+            root: Path = base
+            if pattern_path.is_absolute():
+                root = Path(pattern_path.anchor)
+                pattern = str(pattern_path.relative_to(root))
+            matches = (
+                match for match in root.glob(pattern) if match.is_file()
+            )
+        else:
+            matches = [base / pattern]
+
+        for match in matches:
+            filepath: Path = match.resolve()
+            if filepath not in seen:
+                seen.add(filepath)
+                yield filepath
+
 def change_data_in_file(
-    filepaths: list[Path],
+    filepaths: Iterable[Path],
     data_path: str,
     new_values: list[Any],
+    dry_run: bool = False,
+    atomic: bool = False
 ) -> None:
-    """change value of given data_path in given file"""
-    if len(filepaths) != len(new_values):
-        if len(new_values) != 1:
+    """
+    change value of given data_path in given file.
+    Files are changed as they come, so filepaths can be a lazy iterable.
+    dry_run: If true, print old -> new values without writing anything.
+    atomic: If true, change every file or, on any error, none of them.
+    """
+    values: Iterable[Any]
+    if len(new_values) == 1:
+        values = repeat(new_values[0])
+    else:
+        filepaths = list(filepaths)
+        if len(filepaths) != len(new_values):
             logger.error(
                 "Give a new_value per file or a single value for every file."
             )
             return
-        new_values = repeat(new_values[0])
+        values = new_values
 
-    for i, filepath in enumerate(filepaths):
-        read_change_write(filepath, data_path, new_values[i])
+    if atomic and not dry_run:
+        change_data_in_files_atomically(filepaths, Path(data_path), values)
+        return
 
-def get_template(data: Any):
-    """Makes template out of given data."""
-    if isinstance(data, list):
-        for i, item in enumerate(data):
-            if isinstance(item, (dict, list)):
-                get_template(item)
-            else:
-                data[i] = f"TEMPLATE_{str(type(item)).upper()}"
-
-    elif isinstance(data, dict):
-        for key, value in data.items():
-            if isinstance(value, (dict, list)):
-                get_template(value)
-            else:
-                data[key] = f"TEMPLATE_{str(type(value)).upper()}"
+    changed: int = 0
+    for filepath, new_value in zip(filepaths, values):
+        if dry_run:
+            print(preview_change(filepath, Path(data_path), new_value))
+        else:
+            read_change_write(filepath, Path(data_path), new_value)
+        changed += 1
 
+    if dry_run:
+        logger.info(f"{changed:,} files would be changed, none was written.")
     else:
-        data = f"TEMPLATE_{str(type(data)).upper()}"
+        logger.info(f"Changed {changed:,} files.")
 
-    return data
+def change_data_in_files_atomically(
+    filepaths: Iterable[Path],
+    data_path: Path,
+    values: Iterable[Any]
+) -> None:
+    """
+    Change data_path of every file in a single journaled transaction,
+    see FileTransaction. If any file can't be changed, none is.
+    """
+    from utils.journal_utils import (
+        CommitError, FileTransaction, TransactionError, pending_journals
+    )
+
+    if pending_journals():
+        logger.warning(
+            "Interrupted transactions were found, finish them with --recover."
+        )
+
+    transaction: FileTransaction = FileTransaction()
+    try:
+        with transaction:
+            for filepath, new_value in zip(filepaths, values):
+                data: Any = read_file(filepath)
+                updated_data: Any = change_data_by_path(
+                    data, data_path, new_value
+                )
+                transaction.stage(filepath, updated_data)
+    except CommitError as e:
+        # tells itself if the files were restored
+        logger.error(f"{e}")
+        return
+    except (
+        OSError, IndexError, KeyError, TypeError, ValueError, TransactionError
+    ) as e:
+        logger.error(f"{e}")
+        logger.error("No file was changed.")
+        return
+    logger.info(f"Changed {len(transaction.entries):,} files atomically.")
+
+def preview_change(filepath: Path, data_path: Path, new_value: Any) -> str:
+    """Describe the change of data_path in file, without writing it."""
+    try:
+        data: Any = read_file(filepath)
+    except (FileNotFoundError, PermissionError) as e:
+        return f"{filepath}: {e.strerror}"
+
+    old_value: str
+    try:
+        old_value = repr(get_data_by_path(data, data_path))
+    except IndexError:
+        old_value = "(missing)"
+    return f"{filepath}: {data_path.as_posix()}: {old_value} -> {new_value!r}"
+
+def get_template(data: Any):
+    """Makes template out of given data, without changing it."""
+    if isinstance(data, LIST_TYPES):
+        return [get_template(item) for item in data]
+
+    if isinstance(data, DICT_TYPES):
+        return {key: get_template(value) for key, value in data.items()}
+
+    return f"TEMPLATE_{str(type(data)).upper()}"
+
+def diff_data(
+    old: Any,
+    new: Any,
+    path: Path = Path()
+) -> Iterator[tuple[str, Path, Any, Any]]:
+    """
+    Yield the differences between old and new data, as
+    ("added" | "removed" | "changed", path, old_value, new_value).
+
+    Each pair of values is compared once, containers being walked down
+    only to find what differs in them. Identical subtrees are skipped by
+    identity, as editors sharing a document share their unchanged
+    containers. Values are compared with their types, so 1, 1.0 and True
+    differ. Lists are compared index by index.
+    """
+    if old is new:
+        return
+
+    if isinstance(old, DICT_TYPES) and isinstance(new, DICT_TYPES):
+        for key, old_value in old.items():
+            if key not in new:
+                yield ("removed", path / str(key), old_value, None)
+                continue
+            new_value: Any = new[key]
+            if old_value is not new_value:
+                yield from _diff_values(old_value, new_value, path / str(key))
+        for key, new_value in new.items():
+            if key not in old:
+                yield ("added", path / str(key), None, new_value)
+        return
+
+    if isinstance(old, LIST_TYPES) and isinstance(new, LIST_TYPES):
+        for i, (old_item, new_item) in enumerate(zip(old, new)):
+            if old_item is not new_item:
+                yield from _diff_values(old_item, new_item, path / str(i))
+        for i in range(len(new), len(old)):
+            yield ("removed", path / str(i), old[i], None)
+        for i in range(len(old), len(new)):
+            yield ("added", path / str(i), None, new[i])
+        return
+
+    yield from _diff_values(old, new, path)
+
+def _diff_values(
+    old: Any,
+    new: Any,
+    path: Path
+) -> Iterable[tuple[str, Path, Any, Any]]:
+    """diff_data of two values, walking them only if both are dicts or lists."""
+    if (isinstance(old, DICT_TYPES) and isinstance(new, DICT_TYPES)) or (
+        isinstance(old, LIST_TYPES) and isinstance(new, LIST_TYPES)
+    ):
+        return diff_data(old, new, path)
+    if type(old) is not type(new) or old != new:
+        return (("changed", path, old, new),)
+    return ()
+
+def data_stats(data: Any) -> dict[str, int]:
+    """
+    Count nodes, leaves and max depth of data, along with its approximate
+    deep memory size in bytes. Objects referenced more than once, like
+    interned strings, are counted once.
+    """
+    nodes: int = 0
+    leaves: int = 0
+    max_depth: int = 0
+    memory: int = 0
+    seen: set[int] = set()
+
+    # iterative, so deeply nested data don't hit the recursion limit
+    stack: list[tuple[Any, int]] = [(data, 0)]
+    while stack:
+        node, depth = stack.pop()
+        nodes += 1
+        max_depth = max(max_depth, depth)
+        if id(node) not in seen:
+            seen.add(id(node))
+            memory += sys.getsizeof(node)
+
+        if isinstance(node, DICT_TYPES):
+            for key, value in node.items():
+                if id(key) not in seen:
+                    seen.add(id(key))
+                    memory += sys.getsizeof(key)
+                stack.append((value, depth + 1))
+        elif isinstance(node, LIST_TYPES):
+            stack.extend((item, depth + 1) for item in node)
+        else:
+            leaves += 1
+
+    return {
+        "nodes": nodes, "leaves": leaves, "max_depth": max_depth,
+        "memory": memory
+    }
 
 def read_change_write(
     filepath: Path,
@@ -146,20 +344,93 @@ def iter_data(
     data_answer: Callable,
 ) -> Any:
 
-    if isinstance(data, dict):
+    if isinstance(data, DICT_TYPES):
         return {
             k: iter_data(v, dict_answer, list_answer, data_answer)
-            if isinstance(v, (list, dict))
+            if isinstance(v, CONTAINER_TYPES)
             else dict_answer(k, v)
             for k, v in data.items()
         }
 
-    if isinstance(data, list):
+    if isinstance(data, LIST_TYPES):
         return [
-            iter_data(i, dict_answer, list_answer, data_answer)
-            if isinstance(i, (dict, list))
+            iter_data(item, dict_answer, list_answer, data_answer)
+            if isinstance(item, CONTAINER_TYPES)
             else list_answer(i, item)
             for i, item in enumerate(data)
         ]
 
-    return data_answer(data)
\ No newline at end of file
+    return data_answer(data)
+
+def read_answers(
+    filepath: Path,
+    literal: bool = True
+) -> Iterator[tuple[tuple[str, ...], Any]]:
+    """
+    Yield (data path parts, value) answers of a CSV or JSON Lines file, as they
+    are read.
+
+    Files either pair paths with values, as "path" and "value" CSV columns
+    or {"path": ..., "value": ...} lines, or have a record per row, whose
+    columns (or keys, nested ones joined by "/") answer the record of
+    the same index: column "name" of row 0 answers "0/name".
+    Empty CSV cells are no answer. CSV values are cast if literal,
+    JSON ones are kept as they are.
+    """
+    def _flatten(
+        value: Any,
+        parts: tuple[str, ...]
+    ) -> Iterator[tuple[tuple[str, ...], Any]]:
+        if isinstance(value, dict) and value:
+            for key, item in value.items():
+                yield from _flatten(item, (*parts, str(key)))
+        elif isinstance(value, list) and value:
+            for i, item in enumerate(value):
+                yield from _flatten(item, (*parts, str(i)))
+        else:
+            yield parts, value
+
+    def _parts(text: str) -> tuple[str, ...]:
+        return tuple(part for part in str(text).split("/") if part.strip())
+
+    ext: str = filepath.suffix.lower()
+    with open(filepath, "r", encoding="utf8", newline="") as file:
+        if ext == ".csv":
+            reader = csv.DictReader(file)
+            paired: bool = reader.fieldnames == ["path", "value"]
+            columns: dict[str, tuple[str, ...]] = {
+                column: _parts(column) for column in reader.fieldnames or []
+            }
+            for row_index, row in enumerate(reader):
+                if paired:
+                    if row["value"]:
+                        value: Any = row["value"]
+                        yield _parts(row["path"]), cast_if_true(value, literal)
+                    continue
+                for column, parts in columns.items():
+                    value = row[column]
+                    if value:
+                        yield (
+                            (str(row_index), *parts),
+                            cast_if_true(value, literal)
+                        )
+
+        elif ext == ".jsonl":
+            row_index = 0
+            for line in file:
+                if not line.strip():
+                    continue
+                record: Any = json.loads(line)
+                paired = isinstance(record, dict) and (
+                    set(record) == {"path", "value"}
+                )
+                if paired:
+                    yield _parts(record["path"]), record["value"]
+                    continue
+                yield from _flatten(record, (str(row_index),))
+                row_index += 1
+
+        else:
+            raise ValueError(
+                f"Answers must be a .csv or .jsonl file, not {ext or filepath}."
+            )
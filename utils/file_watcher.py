@@ -0,0 +1,217 @@
+"""
+Module for watching files for changes made by other processes.
+
+inotify is used where available (Linux, through ctypes), watching the
+directories of the files, so files replaced by a rename are noticed too.
+Elsewhere, files are polled with stat. Either way, a file is only
+reported when its signature (inode, size and modification time) differs
+from the last one recorded, so the application records the signature
+of what it writes itself, and its own writes are not reported.
+"""
+
+import asyncio
+from collections.abc import Callable
+import ctypes
+import logging
+import os
+from pathlib import Path
+import struct
+import sys
+
+
+logger = logging.getLogger(__name__)
+
+
+# inotify flags, from <sys/inotify.h>
+IN_MODIFY: int = 0x002
+IN_CLOSE_WRITE: int = 0x008
+IN_MOVED_FROM: int = 0x040
+IN_MOVED_TO: int = 0x080
+IN_CREATE: int = 0x100
+IN_DELETE: int = 0x200
+IN_Q_OVERFLOW: int = 0x4000
+WATCH_MASK: int = (
+    IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+    | IN_CREATE | IN_DELETE
+)
+
+# struct inotify_event header: wd, mask, cookie, len, followed by the name
+EVENT_HEADER: struct.Struct = struct.Struct("iIII")
+
+
+def file_signature(filepath: Path) -> tuple[int, int, int] | None:
+    """Inode, size and modification time of filepath, None if missing."""
+    try:
+        stat: os.stat_result = os.stat(filepath)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+def _load_inotify() -> ctypes.CDLL | None:
+    """C library with the inotify functions, None where unavailable."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+    except OSError:
+        return None
+    if not hasattr(libc, "inotify_init1"):
+        return None
+    return libc
+
+class FileWatcher:
+    """Report changes of watched files to on_change, in the event loop."""
+    def __init__(
+        self,
+        on_change: Callable[[Path], None],
+        poll_interval: float = 1.0,
+        delay: float = 0.1
+    ) -> None:
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+        # events come in bursts (one per written chunk), files are checked
+        # once, this many seconds after the first of them
+        self.delay = delay
+
+        # last recorded signature of each watched file
+        self.signatures: dict[Path, tuple[int, int, int] | None] = {}
+
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self._libc: ctypes.CDLL | None = None
+        self._fd: int | None = None
+        # inotify watch descriptors of the watched directories, both ways
+        self._directories: dict[Path, int] = {}
+        self._descriptors: dict[int, Path] = {}
+        self._pending: set[Path] = set()
+        self._poll_task: asyncio.Task | None = None
+
+    @property
+    def backend(self) -> str:
+        """How files are being watched."""
+        if self.loop is None:
+            return "stopped"
+        return "inotify" if self._fd is not None else "polling"
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Start watching in the given event loop."""
+        self.loop = loop
+        self._libc = _load_inotify()
+        if self._libc is not None:
+            fd: int = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd >= 0:
+                self._fd = fd
+
+        if self._fd is None:
+            self._poll_task = loop.create_task(self._poll())
+            return
+
+        loop.add_reader(self._fd, self._read_events)
+        for filepath in self.signatures:
+            self._add_directory(filepath.parent)
+
+    def stop(self) -> None:
+        """Stop watching, keeping the watched files."""
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            self._poll_task = None
+        if self._fd is not None:
+            self.loop.remove_reader(self._fd)
+            os.close(self._fd)
+            self._fd = None
+            self._directories.clear()
+            self._descriptors.clear()
+        self.loop = None
+
+    def watch(
+        self,
+        filepath: Path,
+        signature: tuple[int, int, int] | None = None
+    ) -> None:
+        """
+        Watch filepath, its current signature being the known one.
+        Called again after the application reads or writes it.
+        signature: Known signature instead of the current one, the one
+        the file had right after the application wrote it, so later
+        changes are still reported on the next check.
+        """
+        filepath = Path(filepath).resolve()
+        self.signatures[filepath] = (
+            file_signature(filepath) if signature is None else signature
+        )
+        if self._fd is not None:
+            self._add_directory(filepath.parent)
+
+    def unwatch(self, filepath: Path) -> None:
+        """Stop watching filepath."""
+        filepath = Path(filepath).resolve()
+        self.signatures.pop(filepath, None)
+
+        directory: Path = filepath.parent
+        if self._fd is None or directory not in self._directories:
+            return
+        if not any(path.parent == directory for path in self.signatures):
+            descriptor: int = self._directories.pop(directory)
+            del self._descriptors[descriptor]
+            self._libc.inotify_rm_watch(self._fd, descriptor)
+
+    def check(self, filepath: Path) -> None:
+        """Report filepath if its signature changed since last recorded."""
+        self._pending.discard(filepath)
+        if filepath not in self.signatures:
+            return
+        signature: tuple[int, int, int] | None = file_signature(filepath)
+        if signature != self.signatures[filepath]:
+            self.signatures[filepath] = signature
+            self.on_change(filepath)
+
+    def _schedule_check(self, filepath: Path) -> None:
+        if filepath in self.signatures and filepath not in self._pending:
+            self._pending.add(filepath)
+            self.loop.call_later(self.delay, self.check, filepath)
+
+    def _add_directory(self, directory: Path) -> None:
+        if directory in self._directories:
+            return
+        descriptor: int = self._libc.inotify_add_watch(
+            self._fd, os.fsencode(directory), WATCH_MASK
+        )
+        if descriptor < 0:
+            logger.debug(
+                f"Could not watch {directory}: {os.strerror(ctypes.get_errno())}"
+            )
+            return
+        self._directories[directory] = descriptor
+        self._descriptors[descriptor] = directory
+
+    def _read_events(self) -> None:
+        """Read the available inotify events, scheduling checks of files."""
+        try:
+            buffer: bytes = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return
+
+        offset: int = 0
+        while offset < len(buffer):
+            descriptor, mask, _, length = EVENT_HEADER.unpack_from(
+                buffer, offset
+            )
+            offset += EVENT_HEADER.size
+            name: bytes = buffer[offset:offset + length].rstrip(b"\0")
+            offset += length
+
+            # events were lost, anything may have changed
+            if mask & IN_Q_OVERFLOW:
+                for filepath in self.signatures:
+                    self._schedule_check(filepath)
+                continue
+
+            directory: Path | None = self._descriptors.get(descriptor)
+            if directory is not None and name:
+                self._schedule_check(directory / os.fsdecode(name))
+
+    async def _poll(self) -> None:
+        """Check every watched file, periodically."""
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            for filepath in list(self.signatures):
+                self.check(filepath)
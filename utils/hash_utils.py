@@ -0,0 +1,178 @@
+"""
+Module for Merkle-style hashes of data subtrees.
+
+The hash of a container is made from the hashes of its children, so an
+unchanged subtree keeps its hash, and changing data only invalidates
+the hashes along the changed path. Dict hashes don't depend on key order.
+"""
+
+from collections.abc import Iterator
+from hashlib import blake2b
+from pathlib import Path
+from typing import Any
+
+from utils.chunked_list import CONTAINER_TYPES, LIST_TYPES
+from utils.compact_records import DICT_TYPES
+
+
+DIGEST_SIZE: int = 16
+
+
+class HashNode:
+    """Cached hash and size of a container, with the ones of its children."""
+    __slots__ = ("digest", "size", "children")
+
+    def __init__(self) -> None:
+        self.digest: bytes | None = None
+        # number of nodes of the subtree, itself included
+        self.size: int = 0
+        # by the key of the child in its container, its type kept so the
+        # children of 1 and "1" don't collide
+        self.children: dict[Any, HashNode] = {}
+
+def path_keys(part: str) -> tuple[Any, ...]:
+    """Keys of data a path part may stand for."""
+    return (part, int(part)) if part.isdigit() else (part,)
+
+def leaf_digest(value: Any) -> bytes:
+    """Hash of a scalar, its type included, so 1 and "1" differ."""
+    return blake2b(
+        f"{type(value).__name__}:{value!r}".encode("utf8"),
+        digest_size=DIGEST_SIZE
+    ).digest()
+
+class SubtreeHashes:
+    """Hashes of every container of data, computed on demand and cached."""
+    def __init__(self) -> None:
+        self.root: HashNode = HashNode()
+
+    def digest(self, data: Any, parts: tuple[str, ...] = ()) -> bytes:
+        """Hash of the subtree of data in given path parts."""
+        node: Any = data
+        entry: HashNode = self.root
+        for part in parts:
+            index: int | str = part
+            if isinstance(node, LIST_TYPES) or (
+                isinstance(node, DICT_TYPES)
+                and part not in node and part.isdigit()
+            ):
+                index = int(part)
+            node = node[index]
+            if not isinstance(node, CONTAINER_TYPES):
+                return leaf_digest(node)
+            entry = entry.children.setdefault(index, HashNode())
+
+        if not isinstance(node, CONTAINER_TYPES):
+            return leaf_digest(node)
+        return self._digest(node, entry)
+
+    def _digest(self, data: dict | list, entry: HashNode) -> bytes:
+        if entry.digest is not None:
+            return entry.digest
+
+        items: list[tuple[Any, Any]]
+        if isinstance(data, DICT_TYPES):
+            items = sorted(data.items(), key=lambda item: repr(item[0]))
+            hasher = blake2b(b"dict", digest_size=DIGEST_SIZE)
+        else:
+            items = list(enumerate(data))
+            hasher = blake2b(b"list", digest_size=DIGEST_SIZE)
+
+        size: int = 1
+        for key, value in items:
+            child_digest: bytes
+            if isinstance(value, CONTAINER_TYPES):
+                child: HashNode = entry.children.setdefault(key, HashNode())
+                child_digest = self._digest(value, child)
+                size += child.size
+            else:
+                child_digest = leaf_digest(value)
+                size += 1
+            hasher.update(leaf_digest(key))
+            hasher.update(child_digest)
+
+        entry.digest = hasher.digest()
+        entry.size = size
+        return entry.digest
+
+    def invalidate(self, parts: tuple[str, ...] = ()) -> None:
+        """
+        Forget hashes changing data in given path parts may have changed:
+        the ones of its ancestors and everything under it.
+        """
+        if not parts:
+            self.root = HashNode()
+            return
+
+        # a part stands for a str key or, when it is a digit, an int one
+        entries: list[HashNode] = [self.root]
+        for part in parts[:-1]:
+            children: list[HashNode] = []
+            for entry in entries:
+                entry.digest = None
+                children.extend(
+                    entry.children[key] for key in path_keys(part)
+                    if key in entry.children
+                )
+            if not children:
+                return
+            entries = children
+        for entry in entries:
+            entry.digest = None
+            for key in path_keys(parts[-1]):
+                entry.children.pop(key, None)
+
+    def containers(
+        self,
+        data: Any,
+        parts: tuple[str, ...] = ()
+    ) -> Iterator[tuple[tuple[str, ...], bytes, int]]:
+        """Yield (path parts, hash, size) of every container of data."""
+        self.digest(data)
+        yield from self._containers(data, self.root, parts)
+
+    def _containers(
+        self,
+        data: Any,
+        entry: HashNode,
+        parts: tuple[str, ...]
+    ) -> Iterator[tuple[tuple[str, ...], bytes, int]]:
+        yield parts, entry.digest, entry.size
+        items: Any = (
+            data.items() if isinstance(data, DICT_TYPES) else enumerate(data)
+        )
+        for key, value in items:
+            if isinstance(value, CONTAINER_TYPES):
+                child: HashNode = entry.children[key]
+                yield from self._containers(value, child, (*parts, str(key)))
+
+def find_duplicates(
+    hashes: SubtreeHashes,
+    data: Any,
+    min_size: int = 2
+) -> list[tuple[int, list[Path]]]:
+    """
+    Return (size, paths) of subtrees found more than once in data,
+    biggest first. Duplicates only found inside bigger duplicated
+    subtrees are left out, as they are already implied by them.
+    """
+    groups: dict[bytes, tuple[int, list[tuple[str, ...]]]] = {}
+    for parts, digest, size in hashes.containers(data):
+        if size >= min_size:
+            groups.setdefault(digest, (size, []))[1].append(parts)
+
+    duplicates: list[tuple[int, list[Path]]] = []
+    reported: set[tuple[str, ...]] = set()
+    for size, occurrences in sorted(
+        groups.values(), key=lambda group: group[0], reverse=True
+    ):
+        if len(occurrences) < 2:
+            continue
+        if all(
+            any(parts[:i] in reported for i in range(len(parts)))
+            for parts in occurrences
+        ):
+            continue
+        reported.update(occurrences)
+        duplicates.append((size, [Path(*parts) for parts in occurrences]))
+    return duplicates
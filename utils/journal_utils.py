@@ -0,0 +1,249 @@
+"""
+Module for writing several files as a single all-or-nothing transaction.
+
+New versions of the files are written to temporary files next to them
+and fsynced together, then a journal listing them is written, the old
+versions are hard linked as backups and the temporary files are renamed
+over the targets. A journal left by a crash lets the transaction be
+rolled forward (finishing the renames) or back (restoring the backups)
+with recover(). A commit failing midway restores the backups itself.
+
+### Example usage:
+
+with FileTransaction() as transaction:
+    transaction.stage(Path("a.json"), {"a": 1})
+    transaction.stage(Path("b.yaml"), {"b": 2})
+# both files were replaced, or none was
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+import os
+from pathlib import Path
+import shutil
+from types import TracebackType
+from typing import Any
+import uuid
+
+from read_and_write import SUPPORTED_FORMATS, write_functions
+
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_DIRPATH: Path = (
+    Path(os.environ.get("XDG_STATE_HOME") or Path.home() / ".local/state")
+    / "terminal-data-editor" / "journal"
+)
+
+
+class TransactionError(Exception):
+    """A transaction could not be staged or committed."""
+    pass
+
+class CommitError(TransactionError):
+    """Commit failed, telling if the files were restored or not."""
+    pass
+
+def fsync_paths(paths: list[Path], directories: bool = False) -> None:
+    """
+    fsync every path in a batch, in worker threads so the disk gets the
+    requests together instead of one after the other.
+    """
+    def _fsync(path: Path) -> None:
+        fd: int = os.open(path, os.O_RDONLY if directories else os.O_WRONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    if len(paths) < 2:
+        for path in paths:
+            _fsync(path)
+        return
+    with ThreadPoolExecutor(max_workers=min(16, len(paths))) as executor:
+        list(executor.map(_fsync, paths))
+
+class FileTransaction:
+    """Files staged to be all replaced at once on commit."""
+    def __init__(self, journal_dirpath: Path = JOURNAL_DIRPATH) -> None:
+        self.journal_dirpath = journal_dirpath
+        self.id: str = uuid.uuid4().hex[:12]
+        # target: its entry, with the temp and backup paths
+        self.entries: dict[Path, dict[str, Any]] = {}
+        self.committed: bool = False
+
+    def __enter__(self) -> "FileTransaction":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None
+    ) -> None:
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+
+    def stage(self, filepath: Path, content: Any) -> None:
+        """Write the new content of filepath into its temporary file."""
+        filepath = Path(filepath).resolve()
+        ext: str = filepath.suffix.lower()
+        if ext not in SUPPORTED_FORMATS:
+            raise TransactionError(f"{ext} format is unsupported: {filepath}")
+
+        temp: Path = filepath.with_name(f".{filepath.name}.{self.id}.tmp")
+        try:
+            write_functions[ext](temp, content)
+            if filepath.exists():
+                shutil.copymode(filepath, temp)
+        except BaseException:
+            # a half written temp isn't left next to the file, nor staged
+            temp.unlink(missing_ok=True)
+            self.entries.pop(filepath, None)
+            raise
+
+        self.entries[filepath] = {
+            "target": str(filepath),
+            "temp": str(temp),
+            "backup": str(filepath.with_name(f".{filepath.name}.{self.id}.bak")),
+            "existed": filepath.exists()
+        }
+
+    def rollback(self) -> None:
+        """Forget staged files, before commit."""
+        for entry in self.entries.values():
+            Path(entry["temp"]).unlink(missing_ok=True)
+        self.entries.clear()
+
+    @property
+    def journal_filepath(self) -> Path:
+        return self.journal_dirpath / f"{self.id}.json"
+
+    def commit(self) -> None:
+        """
+        Replace every staged file by its new version. If it fails, files
+        already replaced are restored and CommitError is raised; when they
+        can't be, the journal is kept for recover().
+        """
+        if not self.entries:
+            return
+        entries: list[dict[str, Any]] = list(self.entries.values())
+        directories: list[Path] = sorted(
+            {Path(entry["target"]).parent for entry in entries}
+        )
+
+        # new versions are durable before the journal points to them
+        try:
+            fsync_paths([Path(entry["temp"]) for entry in entries])
+            self._write_journal(entries)
+        except OSError as e:
+            self.rollback()
+            self.journal_filepath.with_suffix(".tmp").unlink(missing_ok=True)
+            self.journal_filepath.unlink(missing_ok=True)
+            raise CommitError(f"Commit failed, no file was changed: {e}") from e
+
+        try:
+            # old versions are kept until every rename is done
+            for entry in entries:
+                if entry["existed"]:
+                    _link_or_copy(Path(entry["target"]), Path(entry["backup"]))
+            fsync_paths(directories, directories=True)
+
+            for entry in entries:
+                os.replace(entry["temp"], entry["target"])
+            fsync_paths(directories, directories=True)
+        except OSError as e:
+            try:
+                for entry in entries:
+                    _roll_back_entry(entry)
+                fsync_paths(directories, directories=True)
+                self.journal_filepath.unlink()
+            except OSError as restore_error:
+                raise CommitError(
+                    f"Commit failed ({e}) and the files already replaced "
+                    f"could not be restored ({restore_error}): undo the "
+                    "transaction with --recover back."
+                ) from e
+            self.entries.clear()
+            raise CommitError(
+                f"Commit failed, every file was restored: {e}"
+            ) from e
+
+        # done: backups and journal are not needed anymore
+        for entry in entries:
+            Path(entry["backup"]).unlink(missing_ok=True)
+        self.journal_filepath.unlink()
+        self.committed = True
+
+    def _write_journal(self, entries: list[dict[str, Any]]) -> None:
+        self.journal_dirpath.mkdir(parents=True, exist_ok=True)
+        temp: Path = self.journal_filepath.with_suffix(".tmp")
+        with open(temp, "w", encoding="utf8") as file:
+            json.dump({"id": self.id, "entries": entries}, file, indent=2)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp, self.journal_filepath)
+        fsync_paths([self.journal_dirpath], directories=True)
+
+def _link_or_copy(source: Path, destination: Path) -> None:
+    """Hard link source as destination, copying it where links fail."""
+    destination.unlink(missing_ok=True)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+def _roll_back_entry(entry: dict[str, Any]) -> None:
+    """Put back the old version of a journal entry, removing the others."""
+    target, temp = Path(entry["target"]), Path(entry["temp"])
+    backup: Path = Path(entry["backup"])
+    if backup.exists():
+        os.replace(backup, target)
+    elif not entry["existed"] and not temp.exists():
+        # the file was created by the transaction
+        target.unlink(missing_ok=True)
+    temp.unlink(missing_ok=True)
+    backup.unlink(missing_ok=True)
+
+def pending_journals(journal_dirpath: Path = JOURNAL_DIRPATH) -> list[Path]:
+    """Journals of transactions interrupted before the end."""
+    if not journal_dirpath.is_dir():
+        return []
+    return sorted(journal_dirpath.glob("*.json"))
+
+def recover(
+    journal_dirpath: Path = JOURNAL_DIRPATH,
+    forward: bool = True
+) -> int:
+    """
+    Finish interrupted transactions: roll them forward, putting every new
+    version in place, or back, restoring every old version.
+    Return how many transactions were recovered.
+    """
+    journals: list[Path] = pending_journals(journal_dirpath)
+    for journal_filepath in journals:
+        with open(journal_filepath, "r", encoding="utf8") as file:
+            entries: list[dict[str, Any]] = json.load(file)["entries"]
+
+        for entry in entries:
+            if forward:
+                temp: Path = Path(entry["temp"])
+                if temp.exists():
+                    os.replace(temp, entry["target"])
+                Path(entry["backup"]).unlink(missing_ok=True)
+            else:
+                _roll_back_entry(entry)
+
+        fsync_paths(
+            sorted({Path(entry["target"]).parent for entry in entries}),
+            directories=True
+        )
+        journal_filepath.unlink()
+        logger.info(
+            f"Rolled {'forward' if forward else 'back'} transaction "
+            f"{journal_filepath.stem} of {len(entries)} files."
+        )
+    return len(journals)
@@ -0,0 +1,80 @@
+"""
+Module for running functions over many files in a pool of processes.
+
+Parsing data files is CPU bound, so threads don't help with it. Files
+are sent to the worker processes in batches, to save on the round trips,
+and results are yielded as soon as each batch is done.
+"""
+
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+import multiprocessing
+import os
+from pathlib import Path
+from typing import Any
+
+
+# below this many files, starting the processes costs more than it saves
+MIN_FILES_FOR_POOL: int = 8
+
+
+def _run_batch(
+    function: Callable,
+    filepaths: list[Path],
+    args: tuple
+) -> list[tuple[Path, Any, str | None]]:
+    """Run function over each file of a batch, catching its errors."""
+    results: list[tuple[Path, Any, str | None]] = []
+    for filepath in filepaths:
+        try:
+            results.append((filepath, function(filepath, *args), None))
+        except Exception as e:  # parsers raise all sorts of errors
+            results.append((filepath, None, f"{type(e).__name__}: {e}"))
+    return results
+
+def map_files(
+    function: Callable,
+    filepaths: Iterable[Path],
+    *args: Any,
+    jobs: int | None = None,
+    batch_size: int = 16
+) -> Iterator[tuple[Path, Any, str | None]]:
+    """
+    Yield (filepath, result, error) of function(filepath, *args) over
+    every file, in the order they are done. function must be defined at
+    the top level of a module, so worker processes can import it. error
+    is the message of what function raised, with None result.
+    """
+    filepaths = list(filepaths)
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+
+    if jobs <= 1 or len(filepaths) < MIN_FILES_FOR_POOL:
+        for filepath in filepaths:
+            yield from _run_batch(function, [filepath], args)
+        return
+
+    # smaller batches when there are few files, so every worker gets some
+    batch_size = max(1, min(batch_size, len(filepaths) // (jobs * 4)))
+    # workers aren't forked from this process, that may hold threads and
+    # the whole loaded data, they import function's module instead
+    start_method: str = (
+        "forkserver" if "forkserver" in multiprocessing.get_all_start_methods()
+        else "spawn"
+    )
+    with ProcessPoolExecutor(
+        max_workers=jobs, mp_context=multiprocessing.get_context(start_method)
+    ) as executor:
+        futures: list[Future] = [
+            executor.submit(
+                _run_batch, function, filepaths[i:i + batch_size], args
+            )
+            for i in range(0, len(filepaths), batch_size)
+        ]
+        try:
+            for future in as_completed(futures):
+                yield from future.result()
+        finally:
+            # the consumer stopped early, don't run what's left
+            for future in futures:
+                future.cancel()
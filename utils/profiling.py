@@ -0,0 +1,201 @@
+"""
+Module for profiling the commands executed in the REPL and the CLI.
+
+Every command run while profiling is on records its wall time, CPU time
+and peak memory allocated (tracemalloc) into per-command histograms,
+that can be printed or exported as JSON. Optionally, cProfile output of
+the slowest runs of every command is kept too.
+"""
+
+import contextlib
+import cProfile
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+import io
+import json
+import logging
+from pathlib import Path
+import pstats
+import time
+import tracemalloc
+from typing import Any
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Histogram:
+    """Histogram of measures with power of two buckets."""
+    unit: str
+    count: int = 0
+    total: float = 0
+    min: float = float("inf")
+    max: float = 0
+    # upper bound of the bucket: number of measures in it
+    buckets: dict[float, int] = field(default_factory=dict)
+
+    def add(self, value: float) -> None:
+        """Record a new measure."""
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+        bound: float = 1
+        while value >= bound:
+            bound *= 2
+        self.buckets[bound] = self.buckets.get(bound, 0) + 1
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "unit": self.unit,
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else 0,
+            "min": self.min if self.count else 0,
+            "max": self.max,
+            "histogram": {
+                f"<{bound:g}": count
+                for bound, count in sorted(self.buckets.items())
+            }
+        }
+
+@dataclass
+class CommandProfile:
+    """Measures of every run of a command."""
+    wall: Histogram = field(default_factory=lambda: Histogram("ms"))
+    cpu: Histogram = field(default_factory=lambda: Histogram("ms"))
+    peak_memory: Histogram = field(default_factory=lambda: Histogram("KB"))
+    # (wall time, cProfile output) of the slowest runs
+    slowest: list[tuple[float, str]] = field(default_factory=list)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "wall": self.wall.as_dict(),
+            "cpu": self.cpu.as_dict(),
+            "peak_memory": self.peak_memory.as_dict(),
+            "slowest": [
+                {"wall_ms": wall, "cprofile": output}
+                for wall, output in self.slowest
+            ]
+        }
+
+class Profiler:
+    """Records measures of commands, by command name."""
+    def __init__(self) -> None:
+        self.enabled: bool = False
+        self.cprofile: bool = False
+        # how many cProfile outputs are kept per command
+        self.keep_slowest: int = 3
+        self.commands: dict[str, CommandProfile] = {}
+        self._started_tracemalloc: bool = False
+
+    def start(self, cprofile: bool = False) -> None:
+        """Turn profiling on."""
+        self.enabled = True
+        self.cprofile = cprofile
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+    def stop(self) -> None:
+        """Turn profiling off, keeping what was recorded."""
+        self.enabled = False
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def reset(self) -> None:
+        """Forget everything recorded."""
+        self.commands.clear()
+
+    @contextlib.contextmanager
+    def profile(self, name: str) -> Iterator[None]:
+        """Measure the execution of the with block as a run of command name."""
+        if not self.enabled:
+            yield
+            return
+
+        profile: cProfile.Profile | None = None
+        if self.cprofile:
+            profile = cProfile.Profile()
+
+        tracemalloc.reset_peak()
+        # peak allocated by the command, above what was already traced
+        memory_start: int = tracemalloc.get_traced_memory()[0]
+        wall_start: float = time.perf_counter()
+        cpu_start: float = time.process_time()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            wall: float = (time.perf_counter() - wall_start) * 1000
+            cpu: float = (time.process_time() - cpu_start) * 1000
+            peak: float = (
+                tracemalloc.get_traced_memory()[1] - memory_start
+            ) / 1024
+            self._record(name, wall, cpu, peak, profile)
+
+    def _record(
+        self,
+        name: str,
+        wall: float,
+        cpu: float,
+        peak: float,
+        profile: cProfile.Profile | None
+    ) -> None:
+        command: CommandProfile = self.commands.setdefault(
+            name, CommandProfile()
+        )
+        command.wall.add(wall)
+        command.cpu.add(cpu)
+        command.peak_memory.add(peak)
+
+        if profile is None:
+            return
+
+        # only format the output of runs among the slowest
+        slowest: list[tuple[float, str]] = command.slowest
+        if len(slowest) < self.keep_slowest or wall > slowest[-1][0]:
+            stream = io.StringIO()
+            stats = pstats.Stats(profile, stream=stream)
+            stats.sort_stats("cumulative").print_stats(20)
+            slowest.append((wall, stream.getvalue()))
+            slowest.sort(key=lambda run: run[0], reverse=True)
+            del slowest[self.keep_slowest:]
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "commands": {
+                name: command.as_dict()
+                for name, command in self.commands.items()
+            }
+        }
+
+    def dump(self, filepath: Path | None = None) -> None:
+        """Export records as JSON into filepath, or print a summary."""
+        if filepath is not None:
+            with open(filepath, "w", encoding="utf8") as file:
+                json.dump(self.as_dict(), file, indent=2)
+            logger.info(f"Profile saved at {filepath}.")
+            return
+
+        print(f"{'command':<16}{'runs':>6}{'wall ms':>12}{'max ms':>12}"
+              f"{'cpu ms':>12}{'peak KB':>12}")
+        for name, command in sorted(
+            self.commands.items(), key=lambda item: -item[1].wall.total
+        ):
+            wall: dict[str, Any] = command.wall.as_dict()
+            print(
+                f"{name:<16}{wall['count']:>6}{wall['mean']:>12.3f}"
+                f"{wall['max']:>12.3f}{command.cpu.as_dict()['mean']:>12.3f}"
+                f"{command.peak_memory.max:>12.1f}"
+            )
+
+
+# profiler of the running application
+profiler: Profiler = Profiler()
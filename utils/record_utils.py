@@ -0,0 +1,176 @@
+"""
+Module for sorting, grouping and aggregating lists of records.
+
+Values are taken from the records by keys, data paths inside each record
+(address/city). The extraction of a key is compiled once per call into
+an operator.itemgetter per part, mapped over the records so the lookups
+run in C, and only lists where some record misses the key fall back to a
+forgiving loop, giving None for it. Values that can't be compared with
+each other are ordered by their type first, like queries do.
+"""
+
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from functools import partial, reduce
+import json
+from operator import itemgetter
+from typing import Any
+
+from parsing.query_parser import sort_key
+
+
+AGGREGATES: tuple[str, ...] = ("count", "sum", "min", "max", "mean")
+
+
+def key_parts(key: str) -> tuple[str | int, ...]:
+    """Parts of a key, list indexes as ints: "items/0/id" -> ("items", 0, "id")."""
+    return tuple(
+        int(part) if part.isdigit() else part
+        for part in key.split("/") if part
+    )
+
+def compile_getters(key: str) -> list[itemgetter]:
+    """Getters of the parts of a key, applied one after the other."""
+    return [itemgetter(part) for part in key_parts(key)]
+
+def _get(record: Any, getters: list[itemgetter]) -> Any:
+    """Value of a key in a record, None if it's missing."""
+    for getter in getters:
+        try:
+            record = getter(record)
+        except (KeyError, IndexError, TypeError):
+            return None
+    return record
+
+def key_values(records: list, key: str | None) -> list:
+    """Value of key in every record, the records themselves without key."""
+    if not key:
+        return list(records)
+    getters: list[itemgetter] = compile_getters(key)
+    values: Iterable[Any] = records
+    try:
+        # a map per part, so the lookups all run in C
+        for getter in getters:
+            values = map(getter, values)
+        return list(values)
+    except (KeyError, IndexError, TypeError):
+        return [_get(record, getters) for record in records]
+
+def _kind(value: Any) -> str | None:
+    """Kind of values comparable with each other, None if it has none."""
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, (int, float)):
+        return "number"
+    if isinstance(value, str):
+        return "str"
+    return None
+
+def _identity(record: Any) -> Any:
+    return record
+
+def _apply(value: Any, getter: itemgetter) -> Any:
+    return getter(value)
+
+def value_getter(key: str | None) -> Callable[[Any], Any]:
+    """
+    Function of a record giving the value of key in it, the record itself
+    without key. Missing keys raise, like the getters do.
+    """
+    if not key:
+        return _identity
+    getters: list[itemgetter] = compile_getters(key)
+    if len(getters) == 1:
+        return getters[0]
+    return lambda record: reduce(_apply, getters, record)
+
+def sort_records(records: list, keys: list[str], reverse: bool = False) -> None:
+    """
+    Sort records by the values of keys, stably and in place: a pass per
+    key, from the last one, each pass keeping the order of the previous
+    one between equal values.
+    """
+    for key in reversed(keys or [None]):
+        get: Callable[[Any], Any] = value_getter(key)
+        types: set[type]
+        try:
+            types = set(map(type, map(get, records)))
+        except (KeyError, IndexError, TypeError):
+            # some record misses key
+            get = partial(_get, getters=compile_getters(key))
+            types = set(map(type, map(get, records)))
+
+        if types <= {int, float} or types == {str} or types == {bool}:
+            records.sort(key=get, reverse=reverse)
+        else:
+            records.sort(
+                key=lambda record: sort_key(get(record)), reverse=reverse
+            )
+
+def _group_key(value: Any) -> Any:
+    """Value usable as a dict key, JSON of unhashable values."""
+    try:
+        hash(value)
+    except TypeError:
+        return json.dumps(value, sort_keys=True, default=str)
+    return value
+
+def group_records(records: list, key: str) -> dict[Any, list]:
+    """Records grouped by the value of key, in a single pass."""
+    groups: dict[Any, list] = {}
+    for record, value in zip(records, key_values(records, key)):
+        value = _group_key(value)
+        group: list | None = groups.get(value)
+        if group is None:
+            groups[value] = [record]
+        else:
+            group.append(record)
+    return groups
+
+@dataclass
+class Aggregate:
+    """Running aggregates of the values of a group."""
+    count: int = 0
+    numbers: int = 0
+    sum: int | float = 0
+    min: int | float | None = None
+    max: int | float | None = None
+
+    def add(self, value: Any) -> None:
+        self.count += 1
+        if _kind(value) != "number":
+            return
+        self.numbers += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    @property
+    def mean(self) -> float | None:
+        return self.sum / self.numbers if self.numbers else None
+
+def aggregate_records(
+    records: list,
+    field: str | None = None,
+    by: str | None = None
+) -> dict[Any, Aggregate]:
+    """
+    Aggregates of the values of field in records, grouped by the value
+    of by, in a single pass. count is of the records having field, or of
+    every record without field; sum, min, max and mean are of the numbers.
+    """
+    values: list = key_values(records, field)
+    groups: list = key_values(records, by) if by else [None] * len(records)
+
+    aggregates: dict[Any, Aggregate] = {}
+    for group, value in zip(groups, values):
+        if field and value is None:
+            continue
+        key: Any = _group_key(group)
+        aggregate: Aggregate | None = aggregates.get(key)
+        if aggregate is None:
+            aggregate = aggregates[key] = Aggregate()
+        aggregate.add(value)
+    return aggregates
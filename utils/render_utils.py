@@ -0,0 +1,126 @@
+"""
+Module for rendering data in the terminal.
+
+Data is rendered line by line as a generator, so printing starts right
+away and only the shown part of the data is ever visited. Containers out
+of the depth limit are summarized by their length.
+"""
+
+from collections.abc import Iterable, Iterator
+from itertools import islice
+import shutil
+import sys
+from typing import Any
+
+from utils.chunked_list import CONTAINER_TYPES
+from utils.compact_records import DICT_TYPES
+
+
+# containers with up to this many scalars are rendered in a single line
+INLINE_MAX_ITEMS: int = 8
+INLINE_MAX_WIDTH: int = 80
+
+
+def format_size(size: float) -> str:
+    """Human readable size of given bytes."""
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size} B"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+def count_of(count: int, name: str) -> str:
+    """count of name, in plural unless there's one: 1 key, 2 keys."""
+    return f"{count:,} {name}" if count == 1 else f"{count:,} {name}s"
+
+def summarize(data: Any) -> str:
+    """Short description of a collapsed container."""
+    if isinstance(data, DICT_TYPES):
+        return f"{{... {count_of(len(data), 'key')}}}"
+    return f"[... {count_of(len(data), 'item')}]"
+
+def _is_inline(data: Any) -> bool:
+    """If data is a small container of scalars, short enough for one line."""
+    if len(data) > INLINE_MAX_ITEMS:
+        return False
+    values: Iterable = (
+        data.values() if isinstance(data, DICT_TYPES) else data
+    )
+    if any(isinstance(value, CONTAINER_TYPES) for value in values):
+        return False
+    return len(repr(data)) <= INLINE_MAX_WIDTH
+
+def render_lines(
+    data: Any,
+    depth: int | None = None,
+    limit: int | None = None,
+    indent: int = 2
+) -> Iterator[str]:
+    """
+    Yield data rendered as indented lines.
+
+    Args:
+        depth: Nesting levels shown, deeper containers are summarized.
+        limit: Maximum of items shown per container.
+        indent: Spaces per nesting level.
+    """
+    if not isinstance(data, CONTAINER_TYPES):
+        yield repr(data)
+        return
+
+    if depth == 0:
+        yield summarize(data)
+        return
+
+    yield from _render_container(data, 0, depth, limit, indent)
+
+def _render_container(
+    data: dict | list,
+    level: int,
+    depth: int | None,
+    limit: int | None,
+    indent: int
+) -> Iterator[str]:
+    """Yield lines of the items of a container in the given level."""
+    items: Iterable[tuple[str, Any]]
+    if isinstance(data, DICT_TYPES):
+        items = ((f"{key}:", value) for key, value in data.items())
+        hidden_name = "key"
+    else:
+        items = (("-", item) for item in data)
+        hidden_name = "item"
+
+    pad: str = " " * (indent * level)
+    for label, value in islice(items, limit):
+        if not isinstance(value, CONTAINER_TYPES) or not value:
+            yield f"{pad}{label} {value!r}"
+        elif depth is not None and level + 1 >= depth:
+            yield f"{pad}{label} {summarize(value)}"
+        elif _is_inline(value):
+            yield f"{pad}{label} {value!r}"
+        else:
+            yield f"{pad}{label}"
+            yield from _render_container(value, level + 1, depth, limit, indent)
+
+    if limit is not None and len(data) > limit:
+        yield f"{pad}... {count_of(len(data) - limit, f'more {hidden_name}')}"
+
+def default_page_size() -> int:
+    """Terminal height when writing to a terminal, else 0 (no paging)."""
+    if not sys.stdout.isatty():
+        return 0
+    return max(shutil.get_terminal_size().lines - 1, 1)
+
+def print_paged(lines: Iterable[str], page_size: int = 0) -> None:
+    """
+    Print lines as they come, waiting for the user after every page.
+    page_size of 0 prints everything without waiting.
+    """
+    for i, line in enumerate(lines, 1):
+        sys.stdout.write(line + "\n")
+        if page_size and i % page_size == 0:
+            sys.stdout.flush()
+            answer: str = input("-- more -- [enter] next page, [q] quit ")
+            if answer.strip().lower().startswith("q"):
+                break
+    sys.stdout.flush()
@@ -0,0 +1,74 @@
+"""
+Module for inferring the schema of many data files at once.
+
+The shape of each file maps the paths of its nodes, with "*" for list
+items, to how many nodes are there and their types. Shapes of files are
+then merged into a schema telling, for every path seen, in how many
+files it appears, how many times and with which types.
+"""
+
+from pathlib import Path
+from typing import Any
+
+from read_and_write import STREAMED_FORMATS, read_file, read_first_records
+
+
+# shape entries: [number of nodes, {type name: number of nodes}]
+Shape = dict[str, list]
+
+
+def type_name(value: Any) -> str:
+    """Name of the type of value, "null" for None."""
+    return "null" if value is None else type(value).__name__
+
+def sample_items(items: list, max_items: int | None) -> list:
+    """Up to max_items items evenly spread over the list."""
+    if max_items is None or len(items) <= max_items:
+        return items
+    step: float = len(items) / max_items
+    return [items[int(i * step)] for i in range(max_items)]
+
+def data_shape(data: Any, max_items: int | None = None) -> Shape:
+    """
+    Return the shape of data, inspecting at most max_items items of
+    each list.
+    """
+    shape: Shape = {}
+    stack: list[tuple[str, Any]] = [("/", data)]
+    while stack:
+        path, node = stack.pop()
+        entry: list = shape.setdefault(path, [0, {}])
+        entry[0] += 1
+        name: str = type_name(node)
+        entry[1][name] = entry[1].get(name, 0) + 1
+
+        prefix: str = "" if path == "/" else f"{path}/"
+        if isinstance(node, dict):
+            stack.extend((f"{prefix}{key}", value) for key, value in node.items())
+        elif isinstance(node, list):
+            stack.extend(
+                (f"{prefix}*", item) for item in sample_items(node, max_items)
+            )
+    return shape
+
+def file_shape(filepath: Path, max_items: int | None = None) -> Shape:
+    """
+    Shape of the data of a file. Made to run in worker processes. Files
+    of records read one after another, like JSON Lines, are only read up
+    to their first max_items records.
+    """
+    streamed: bool = Path(filepath).suffix.lower() in STREAMED_FORMATS
+    if max_items is not None and streamed:
+        return data_shape(read_first_records(filepath, max_items), max_items)
+    return data_shape(read_file(filepath), max_items)
+
+def merge_shape(schema: dict[str, dict[str, Any]], shape: Shape) -> None:
+    """Merge the shape of a file into schema."""
+    for path, (count, types) in shape.items():
+        entry: dict[str, Any] = schema.setdefault(
+            path, {"files": 0, "count": 0, "types": {}}
+        )
+        entry["files"] += 1
+        entry["count"] += count
+        for name, type_count in types.items():
+            entry["types"][name] = entry["types"].get(name, 0) + type_count
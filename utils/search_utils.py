@@ -0,0 +1,119 @@
+"""
+Module for searching keys and values inside data files.
+
+A DataQuery selects nodes of data by a data path, whose parts can be
+glob patterns (services/*/image), by the name of their key, at any depth,
+and by their value. Matching nodes are yielded with their path.
+"""
+
+from collections.abc import Iterator
+from dataclasses import dataclass
+import fnmatch
+from pathlib import Path
+from typing import Any
+
+from read_and_write import read_file
+from utils.chunked_list import CONTAINER_TYPES, LIST_TYPES
+from utils.compact_records import DICT_TYPES
+from utils.data_utils import GLOB_CHARS
+
+
+@dataclass(frozen=True)
+class DataQuery:
+    """What to search for, None meaning anything."""
+    path: tuple[str, ...] | None = None
+    key: str | None = None
+    has_value: bool = False
+    value: Any = None
+
+def values_equal(value: Any, other: Any) -> bool:
+    """Equality that doesn't take True for 1, nor False for 0."""
+    return value == other and isinstance(value, bool) == isinstance(other, bool)
+
+def _children(node: Any) -> Iterator[tuple[str, Any]]:
+    if isinstance(node, DICT_TYPES):
+        for key, value in node.items():
+            yield str(key), value
+    elif isinstance(node, LIST_TYPES):
+        for i, value in enumerate(node):
+            yield str(i), value
+
+def _child(node: Any, part: str) -> tuple[bool, Any]:
+    """(found, child) of node in a literal path part."""
+    if isinstance(node, DICT_TYPES):
+        if part in node:
+            return True, node[part]
+        if part.isdigit() and int(part) in node:
+            return True, node[int(part)]
+    elif (
+        isinstance(node, LIST_TYPES)
+        and part.isdigit() and int(part) < len(node)
+    ):
+        return True, node[int(part)]
+    return False, None
+
+def _select(
+    node: Any,
+    pattern: tuple[str, ...],
+    parts: tuple[str, ...] = ()
+) -> Iterator[tuple[tuple[str, ...], Any]]:
+    """Yield (path parts, node) of nodes in paths matching pattern."""
+    if not pattern:
+        yield parts, node
+        return
+
+    head: str = pattern[0]
+    if not any(char in head for char in GLOB_CHARS):
+        found, child = _child(node, head)
+        if found:
+            yield from _select(child, pattern[1:], (*parts, head))
+        return
+
+    for key, child in _children(node):
+        if fnmatch.fnmatchcase(key, head):
+            yield from _select(child, pattern[1:], (*parts, key))
+
+def _all_nodes(data: Any) -> Iterator[tuple[tuple[str, ...], Any]]:
+    """Yield (path parts, node) of every node of data, parents first."""
+    stack: list[tuple[tuple[str, ...], Any]] = [((), data)]
+    while stack:
+        parts, node = stack.pop()
+        yield parts, node
+        stack.extend(
+            reversed([((*parts, key), child) for key, child in _children(node)])
+        )
+
+def search_data(
+    data: Any,
+    query: DataQuery
+) -> Iterator[tuple[tuple[str, ...], Any]]:
+    """Yield (path parts, node) of the nodes of data matching query."""
+    nodes: Iterator[tuple[tuple[str, ...], Any]]
+    if query.path is not None:
+        nodes = _select(data, query.path)
+    else:
+        nodes = _all_nodes(data)
+
+    for parts, node in nodes:
+        if query.key is not None and not (
+            parts and fnmatch.fnmatchcase(parts[-1], query.key)
+        ):
+            continue
+        if query.has_value and (
+            isinstance(node, CONTAINER_TYPES) or not values_equal(node, query.value)
+        ):
+            continue
+        yield parts, node
+
+def grep_file(filepath: Path, query: DataQuery) -> list[tuple[str, str]]:
+    """
+    Return (data path, value repr) of every match of query in a data
+    file. Made to run in worker processes.
+    """
+    matches: list[tuple[str, str]] = []
+    for parts, node in search_data(read_file(filepath), query):
+        text: str = repr(node)
+        if len(text) > 80:
+            text = f"{text[:77]}..."
+        matches.append(("/".join(parts) or "/", text))
+    return matches
@@ -1,11 +1,14 @@
 """Module for some high-level Shell Utilities used in this project."""
 
+from collections.abc import Iterator
+import fnmatch
 import logging
 from pathlib import Path
 import os
 import shutil
 
 from messages.messages import get_error_message
+from utils.copy_utils import CopyProgress, copy_tree
 
 
 logger = logging.getLogger(__name__)
@@ -13,23 +16,43 @@ logger = logging.getLogger(__name__)
 
 def copy_anything(source: Path, destination: Path) -> None:
     """Copy anything, file or folder into given directory."""
-    if not destination.parent.is_dir():
-        logger.error(
-            get_error_message("DestinationMustBeDirectory", dirname=str(destination))
-        )
-        create_directories_interface(destination)
-        if not destination.is_dir():
-            print("Could not copy.")
-            return
-
-    if source.is_dir():
-        shutil.copytree(source, destination, dirs_exist_ok=True)
-    elif source.is_file():
-        shutil.copy2(source, destination)
-    else:
+    copy_into_destinations(source, [destination])
+
+def copy_into_destinations(source: Path, destinations: list[Path]) -> None:
+    """
+    Copy anything, file or folder, into every given destination in a
+    single pass over the source, showing the progress.
+    """
+    if not source.exists():
         logger.error(
             get_error_message("DirectoryOrFileNotFound", filename=source.name)
         )
+        return
+
+    valid_destinations: list[Path] = []
+    for destination in destinations:
+        if not destination.parent.is_dir():
+            logger.error(get_error_message(
+                "DestinationMustBeDirectory", dirname=str(destination)
+            ))
+            create_directories_interface(destination)
+            if not destination.is_dir():
+                print("Could not copy.")
+                continue
+        valid_destinations.append(destination)
+
+    if not valid_destinations:
+        return
+
+    progress: CopyProgress = copy_tree(source, valid_destinations)
+    for path, error in progress.errors[:10]:
+        logger.error(f"Could not copy {path}: {error.strerror or error}")
+    if len(progress.errors) > 10:
+        logger.error(f"... {len(progress.errors) - 10:,} more errors")
+    logger.info(
+        f"Copied {progress.summary()} into "
+        f"{len(valid_destinations)} destinations."
+    )
 
 def create_directory(directory: Path) -> None:
     """Create directory in given path."""
@@ -93,3 +116,55 @@ def move_anything(source: Path, destination: Path) -> Path:
     except PermissionError:
         logger.error(get_error_message("PermissionError"))
     return new_path
+
+def scan_directory(
+    directory: Path,
+    recursive: bool = False,
+    pattern: str | None = None,
+    extensions: tuple[str, ...] | None = None
+) -> Iterator[tuple[str, os.DirEntry]]:
+    """
+    Yield (relative path, entry) of the entries of directory, as they are
+    scanned. Entries cache their type and, after the first call, their
+    stat, so they are read from the disk at most once.
+
+    Args:
+        recursive: Also scan subdirectories, without following symlinks.
+        pattern: Only yield files whose name, or relative path if the
+            pattern has a "/", matches this glob pattern.
+        extensions: Only yield files with these extensions.
+    Directories are yielded only when no filter is given.
+    """
+    filtered: bool = pattern is not None or extensions is not None
+    stack: list[tuple[Path, str]] = [(directory, "")]
+    while stack:
+        dirpath, prefix = stack.pop()
+        subdirectories: list[tuple[Path, str]] = []
+        try:
+            entries = os.scandir(dirpath)
+        except PermissionError:
+            logger.error(get_error_message("PermissionDenied"))
+            continue
+
+        with entries:
+            for entry in entries:
+                relative: str = prefix + entry.name
+                is_dir: bool = entry.is_dir(follow_symlinks=False)
+                if is_dir and recursive:
+                    subdirectories.append((Path(entry.path), relative + "/"))
+
+                if is_dir:
+                    if not filtered:
+                        yield relative, entry
+                    continue
+                if extensions is not None and (
+                    os.path.splitext(entry.name)[1].lower() not in extensions
+                ):
+                    continue
+                if pattern is not None and not fnmatch.fnmatch(
+                    relative if "/" in pattern else entry.name, pattern
+                ):
+                    continue
+                yield relative, entry
+
+        stack.extend(reversed(subdirectories))
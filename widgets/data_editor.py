@@ -1,14 +1,19 @@
 """Module for navigator repl widgets."""
 
+import copy
+from collections.abc import Iterable
 from pathlib import Path
 from typing import Any
 
-from actions.data_actions import data_editor_parser
 from actions.action_exceptions import ActionError
+from parsing.completer import KeyCache
 from utils.data_utils import (
-    change_data_by_path, get_data_by_path, smart_cast
+    change_data_by_path, data_stats, get_data_by_path, smart_cast
 )
 from parsing.repl_parser import CommandParser
+from utils.chunked_list import CONTAINER_TYPES, LIST_TYPES
+from utils.compact_records import DICT_TYPES
+from utils.hash_utils import SubtreeHashes
 
 
 class DataEditor:
@@ -24,7 +29,38 @@ class DataEditor:
         self.path = path
         self.filename = filename
         self.literal = literal
-        self.parser: CommandParser = data_editor_parser
+
+        # "loading" or "saving" while a worker thread is using the data
+        self.status: str | None = None
+        # if data was changed since it was last loaded or saved
+        self.dirty: bool = False
+        # keys of data nodes, for tab completion of data paths
+        self.key_cache: KeyCache = KeyCache()
+
+        # when data is shared with other editors, containers are copied
+        # on their first mutation, and their ids kept in owned. Data given
+        # here is shared with its document, kept as it was given.
+        self.shared: bool = data is not None
+        self.owned: set[int] = set()
+
+        # timings and size of the file, None when unknown
+        self.load_seconds: float | None = None
+        self.save_seconds: float | None = None
+        self.file_size: int | None = None
+        # node counts and memory, computed on demand until data changes
+        self._stats: dict[str, int] | None = None
+
+        # Merkle hashes of data and of the document it was loaded from,
+        # None while not enabled
+        self.document: Any = data
+        self.hashes: SubtreeHashes | None = None
+        self.document_hashes: SubtreeHashes | None = None
+
+    @property
+    def parser(self) -> CommandParser:
+        """DataEditor commands parser, only built when first needed."""
+        from actions.data_actions import data_editor_parser
+        return data_editor_parser
 
     def get_data(self, path: Path = Path(".")) -> Any:
         """
@@ -52,8 +88,160 @@ class DataEditor:
             else:
                 new_value = str(new_value)
 
+        if resolved_path.parts:
+            self.own(resolved_path.parent)
         self.data: Any
         self.data = change_data_by_path(self.data, resolved_path, new_value)
+        self.mark_changed(resolved_path)
+
+    def fill(
+        self,
+        answers: Iterable[tuple[tuple[str, ...], Any]]
+    ) -> tuple[int, int]:
+        """
+        Set the leaves in the path parts of answers, relative to the
+        current path, to their values, as the answers come. Answers to no
+        leaf are skipped. Return how many leaves were filled and answers
+        skipped.
+        """
+        def _index(node: Any, part: str) -> int | str | None:
+            if isinstance(node, DICT_TYPES):
+                if part in node:
+                    return part
+                if part.isdigit() and int(part) in node:
+                    return int(part)
+            elif isinstance(node, LIST_TYPES) and part.isdigit():
+                if int(part) < len(node):
+                    return int(part)
+            return None
+
+        filled: int = 0
+        skipped: int = 0
+        current_parts: tuple[str, ...] = self.path.parts
+        for parts, value in answers:
+            parts = current_parts + parts
+            # find the leaf first, nothing is copied for skipped answers
+            node: Any = self.data
+            index: int | str | None = None
+            for part in parts:
+                index = _index(node, part)
+                if index is None:
+                    break
+                parent: Any = node
+                node = node[index]
+            if index is None or isinstance(node, CONTAINER_TYPES):
+                skipped += 1
+                continue
+
+            filled += 1
+            if type(node) is type(value) and node == value:
+                continue
+            if self.shared:
+                parent = self._own_parts(parts[:-1])
+            parent[index] = value
+            self.dirty = True
+            self._invalidate_parts(parts)
+
+        return filled, skipped
+
+    def share(self, data: Any) -> None:
+        """Set data as a document shared with other editors."""
+        self.data = data
+        self.document = data
+        self.document_hashes = None
+        self.shared = True
+        self.owned.clear()
+        self.invalidate_caches()
+
+    def own(self, path: Path = Path()) -> None:
+        """
+        Copy-on-write: make the containers from the root down to given
+        resolved path private to this editor, so they can be mutated
+        in place. Containers out of the path stay shared.
+        """
+        if self.shared:
+            self._own_parts(Path(path).parts)
+
+    def _own_parts(self, parts: tuple[str, ...]) -> Any:
+        """own() by path parts, return the last container owned."""
+        def _own_node(node: Any) -> Any:
+            if id(node) in self.owned:
+                return node
+            node_copy: Any = copy.copy(node)
+            self.owned.add(id(node_copy))
+            return node_copy
+
+        self.data = _own_node(self.data)
+        node: Any = self.data
+        for part in parts:
+            index: int | str = int(part) if part.isdigit() else part
+            if isinstance(node, DICT_TYPES) and index not in node:
+                index = part
+            child: Any = node[index]
+            if not isinstance(child, CONTAINER_TYPES):
+                break
+            child = _own_node(child)
+            node[index] = child
+            node = child
+        return node
+
+    def mark_changed(self, path: Path = Path()) -> None:
+        """
+        Register that data in given resolved path was changed,
+        root path meaning the whole data.
+        """
+        self.dirty = True
+        self.invalidate_caches(path)
+
+    def invalidate_caches(self, path: Path = Path()) -> None:
+        """Forget what was computed from data in given resolved path."""
+        self._invalidate_parts(Path(path).parts)
+
+    def _invalidate_parts(self, parts: tuple[str, ...]) -> None:
+        self.key_cache.invalidate(parts)
+        self._stats = None
+        if self.hashes is not None:
+            self.hashes.invalidate(parts)
+
+    def enable_hashes(self) -> SubtreeHashes:
+        """Start caching subtree hashes of data, return the cache."""
+        if self.hashes is None:
+            self.hashes = SubtreeHashes()
+        return self.hashes
+
+    def disable_hashes(self) -> None:
+        """Drop the subtree hashes caches."""
+        self.hashes = None
+        self.document_hashes = None
+
+    def changed_since_load(self, path: Path = Path()) -> bool:
+        """
+        If data in given resolved path differs from the loaded document.
+        Only hashes along the path and of changed subtrees are computed,
+        the rest comes from cache.
+        """
+        parts: tuple[str, ...] = Path(path).parts
+        if self.document_hashes is None:
+            self.document_hashes = SubtreeHashes()
+        try:
+            loaded: bytes = self.document_hashes.digest(self.document, parts)
+        except (KeyError, IndexError, TypeError):
+            return True  # the path did not exist
+        return self.enable_hashes().digest(self.data, parts) != loaded
+
+    def get_stats(self) -> dict[str, Any]:
+        """
+        Return timings, sizes, node counts and memory of the editor.
+        Counting is done on the first call after data changes.
+        """
+        if self._stats is None:
+            self._stats = data_stats(self.data)
+        return {
+            "load_seconds": self.load_seconds,
+            "save_seconds": self.save_seconds,
+            "file_size": self.file_size,
+            **self._stats
+        }
 
     def resolve_path(self, new_path: Path) -> Path:
         """
@@ -3,7 +3,6 @@
 import dataclasses
 from pathlib import Path
 
-from actions.file_actions import file_navigator_parser
 from parsing.repl_parser import CommandParser
 
 
@@ -11,4 +10,9 @@ from parsing.repl_parser import CommandParser
 class FileNavigator:
     """Terminal file navigator for exploring files."""
     path: Path = Path(Path.cwd())
-    parser: CommandParser = file_navigator_parser
+
+    @property
+    def parser(self) -> CommandParser:
+        """FileNavigator commands parser, only built when first needed."""
+        from actions.file_actions import file_navigator_parser
+        return file_navigator_parser
@@ -6,15 +6,27 @@ the REPL ambient.
 from pprint import pprint
 
 import argparse
+import asyncio
+from collections.abc import Callable
 import logging
+import os
+from pathlib import Path
 import sys
+import threading
+import time
+from typing import Any
 
 from actions.action_exceptions import ActionError
-from actions.common_actions import common_parser
+from messages.messages import get_error_message
 from widgets.data_editor import DataEditor
 from widgets.file_navigator import FileNavigator
+from parsing.completer import install_completer
 from parsing.lexer import pre_parser
-from parsing.repl_parser import AttemptToExitError
+from parsing.repl_parser import AttemptToExitError, CommandParser
+from read_and_write import RECORD_FORMATS, read_file, read_records, write_file
+from utils.data_utils import get_data_by_path
+from utils.file_watcher import FileWatcher, file_signature
+from utils.profiling import profiler
 
 
 logger = logging.getLogger(__name__)
@@ -25,11 +37,29 @@ class WidgetManager:
     def __init__(
         self,
         data_editors: list[DataEditor],
-        file_navigator: FileNavigator
+        file_navigator: FileNavigator,
+        autosave_interval: float = 0,
+        compact: str | None = None
     ) -> None:
         self.data_editors = data_editors
         self.file_navigator = file_navigator
-        self.parser = common_parser
+        self.autosave_interval = autosave_interval
+        # mode of COMPACT_MODES files are read in, None to read them as is
+        self.compact = compact
+
+        # loaded data of each file, shared by the editors opening it
+        self.documents: dict[Path, Any] = {}
+        self._loading: dict[Path, asyncio.Future] = {}
+        # digests of the records of documents read record by record
+        self.record_digests: dict[Path, list[bytes]] = {}
+
+        # opened files changed by other processes since loaded or saved
+        self.watcher: FileWatcher = FileWatcher(self._file_changed)
+        self.changed_on_disk: set[Path] = set()
+
+        # set when the REPL event loop starts running
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self._autosave_task: asyncio.Task | None = None
 
         # by default, it initializes focused in the file_navigator
         self.active_widget: DataEditor | FileNavigator = self.file_navigator
@@ -40,50 +70,578 @@ class WidgetManager:
                 self.active_widget = data_editor
                 break
 
+    @property
+    def parser(self) -> CommandParser:
+        """WidgetManager commands parser, only built when first needed."""
+        from actions.common_actions import common_parser
+        return common_parser
+
     def run(self) -> None:
         """Execute the REPL ambient"""
+        try:
+            asyncio.run(self._run())
+        except KeyboardInterrupt:
+            sys.exit(0)
+
+    async def _run(self) -> None:
+        """
+        REPL event loop. Input is read in its own thread and the slow
+        file reading and writing are sent to worker threads, so the
+        prompt stays responsive while they happen.
+        """
+        self.loop = asyncio.get_running_loop()
+        lines: asyncio.Queue[str | None] = asyncio.Queue()
+        prompt_ready = threading.Event()
+
+        install_completer(self)
+        self.watcher.start(self.loop)
+        threading.Thread(
+            target=self._read_lines, args=(lines, prompt_ready), daemon=True
+        ).start()
+
+        for data_editor in self.data_editors:
+            if data_editor.status == "loading":
+                self.load(data_editor)
+
+        self.set_autosave(self.autosave_interval)
+
         while True:
-            # capture of user input
-            try:
-                line = input(">>>")
-                pre_parsed: list[str] = pre_parser(line)
-            except (KeyboardInterrupt):
+            prompt_ready.set()
+            line: str | None = await lines.get()
+            if line is None:
                 sys.exit(0)
-            except (SyntaxError, IndexError, ValueError, TypeError) as e:
-                if isinstance(e, SyntaxError):
-                    message = "Bad syntax."
-                    logger.error(message)
-                logger.debug(e)
+            self.execute(line)
+
+    def _read_lines(
+        self,
+        lines: asyncio.Queue,
+        prompt_ready: threading.Event
+    ) -> None:
+        """Prompt user for a line whenever the last one was executed."""
+        while True:
+            prompt_ready.wait()
+            prompt_ready.clear()
+            try:
+                line: str | None = input(">>>")
+            except EOFError:
+                line = None
+            self.loop.call_soon_threadsafe(lines.put_nowait, line)
+
+    def execute(self, line: str) -> None:
+        """Parse and execute a line of user input."""
+        # capture of user input
+        try:
+            pre_parsed: list[str] = pre_parser(line)
+        except (SyntaxError, IndexError, ValueError, TypeError) as e:
+            if isinstance(e, SyntaxError):
+                message = "Bad syntax."
+                logger.error(message)
+            logger.debug(e)
+            return
+
+        # try to parse with widget_manager parser first
+        try: 
+            parsed: argparse.Namespace = self.parser.parse_args(
+                pre_parsed, suppress_argument_error=False
+            )
+            widget = self
+        
+        # if fails by invalid choice given,
+        # try to parse with active_widget parser
+        except argparse.ArgumentError as e:
+            if e.message.startswith("invalid choice: "):
+                try:
+                    parsed = self.active_widget.parser.parse_args(pre_parsed)
+                    widget = self.active_widget
+                # if it fails again, the user input was invalid
+                except AttemptToExitError:
+                    return
+            else:
+                logger.error(e)
+                return
+        except AttemptToExitError:
+            return
+
+        # data of editors being loaded or saved can't be touched meanwhile
+        if isinstance(widget, DataEditor) and widget.status is not None:
+            logger.error(f"Editor is {widget.status}, try again later.")
+            return
+
+        # if given input has a widget-action, execute it
+        action: Callable | None = vars(parsed).pop("func", None)
+        if action:
+            try:
+                kwargs: dict = vars(parsed)
+                with profiler.profile(pre_parsed[0]):
+                    action(widget, **kwargs)
+            except ActionError as e:
+                logger.error(e)
+
+    def load(self, data_editor: DataEditor) -> None:
+        """
+        Read data_editor file in a worker thread. Editors of the same file
+        share its document, which is only read once.
+        """
+        filepath: Path = Path(data_editor.filename).resolve()
+
+        def _on_loaded(future: asyncio.Future) -> None:
+            data_editor.status = None
+            try:
+                self._loaded(data_editor, filepath, *future.result())
+            except (Exception, asyncio.CancelledError) as e:
+                self._load_failed(data_editor, e)
+
+        if filepath in self.documents:
+            data_editor.status = None
+            data_editor.share(self.documents[filepath])
+            # stats of the file are the ones of the editor it was read by
+            for de in self.data_editors:
+                if de is not data_editor and de.filename is not None and (
+                    de.file_size is not None
+                    and Path(de.filename).resolve() == filepath
+                ):
+                    data_editor.file_size = de.file_size
+                    data_editor.load_seconds = de.load_seconds
+                    break
+            return
+
+        if self.loop is None:
+            data_editor.status = None
+            try:
+                self._loaded(data_editor, filepath, *timed_read(
+                    filepath, None, self.compact
+                ))
+            except Exception as e:
+                self._load_failed(data_editor, e)
+            return
+
+        data_editor.status = "loading"
+        future: asyncio.Future | None = self._loading.get(filepath)
+        if future is None:
+            future = self.loop.run_in_executor(
+                None, timed_read, filepath, None, self.compact
+            )
+            self._loading[filepath] = future
+            future.add_done_callback(lambda _: self._loading.pop(filepath))
+        future.add_done_callback(_on_loaded)
+
+    def _loaded(
+        self,
+        data_editor: DataEditor,
+        filepath: Path,
+        data: Any,
+        size: int,
+        seconds: float,
+        digests: list[bytes] | None = None
+    ) -> None:
+        """Set loaded data as the file document, shared by its editors."""
+        self.documents[filepath] = data
+        self._set_record_digests(filepath, digests)
+        self.watcher.watch(filepath)
+        data_editor.share(data)
+        data_editor.file_size = size
+        data_editor.load_seconds = seconds
+        logger.info(f"Loaded {data_editor.filename}.")
+
+    def _load_failed(self, data_editor: DataEditor, error: BaseException) -> None:
+        """Log why data_editor file could not be loaded, and close its tab."""
+        # not found and permission errors are logged by read_file
+        if not isinstance(error, (FileNotFoundError, PermissionError)):
+            logger.error(
+                f"Could not load {data_editor.filename}: "
+                f"{type(error).__name__}: {error}"
+            )
+        if data_editor in self.data_editors:
+            self.data_editors.remove(data_editor)
+        if self.active_widget is data_editor:
+            self.active_widget = self.file_navigator
+
+    def reload(self, data_editor: DataEditor, force: bool = False) -> None:
+        """
+        Read data_editor file again, in a worker thread, and set it as the
+        data of data_editor and of the other editors of the file without
+        unsaved changes. For JSON Lines and multi-document YAML files,
+        only the records that changed are parsed.
+        force: If true, discard unsaved changes of data_editor.
+        """
+        if data_editor.filename is None:
+            raise ActionError("Editor has no file to reload.")
+        if data_editor.status is not None:
+            raise ActionError(f"Editor is {data_editor.status}, try again later.")
+        if data_editor.dirty and not force:
+            raise ActionError(
+                "Editor has unsaved changes, reload -f to discard them."
+            )
+
+        filepath: Path = Path(data_editor.filename).resolve()
+
+        # values of the records of the current document, by digest
+        known: dict[bytes, list[Any]] = {}
+        document: Any = self.documents.get(filepath)
+        digests: list[bytes] | None = self.record_digests.get(filepath)
+        if isinstance(document, list) and digests is not None:
+            for digest, value in zip(digests, document):
+                known.setdefault(digest, []).append(value)
+        known_count: int = sum(len(values) for values in known.values())
+
+        def _reloaded(
+            data: Any,
+            size: int,
+            seconds: float,
+            digests: list[bytes] | None
+        ) -> None:
+            self.documents[filepath] = data
+            self._set_record_digests(filepath, digests)
+            self.changed_on_disk.discard(filepath)
+            self.watcher.watch(filepath)
+
+            for de in self.data_editors:
+                if de is not data_editor and (
+                    de.filename is None
+                    or Path(de.filename).resolve() != filepath
+                    or de.dirty or de.status is not None
+                ):
+                    continue
+                de.share(data)
+                de.dirty = False
+                de.file_size = size
+                de.load_seconds = seconds
+                try:
+                    get_data_by_path(data, de.path)
+                except (IndexError, KeyError, TypeError):
+                    de.path = Path()
+
+            parsed: str = ""
+            if digests is not None:
+                reused: int = known_count - sum(
+                    len(values) for values in known.values()
+                )
+                parsed = (
+                    f", {len(digests) - reused:,} of {len(digests):,} "
+                    "records parsed"
+                )
+            logger.info(
+                f"Reloaded {data_editor.filename} ({seconds:.3f}s{parsed})."
+            )
+
+        def _on_reloaded(future: asyncio.Future) -> None:
+            data_editor.status = None
+            try:
+                _reloaded(*future.result())
+            except (FileNotFoundError, PermissionError):
+                # already logged by read_file, the editor keeps its data
+                return
+            except (Exception, asyncio.CancelledError) as e:
+                logger.error(
+                    f"Could not reload {data_editor.filename}: "
+                    f"{type(e).__name__}: {e}"
+                )
+
+        if self.loop is None:
+            _reloaded(*timed_read(filepath, known, self.compact))
+            return
+
+        data_editor.status = "loading"
+        future: asyncio.Future = self.loop.run_in_executor(
+            None, timed_read, filepath, known, self.compact
+        )
+        future.add_done_callback(_on_reloaded)
+
+    def _set_record_digests(
+        self,
+        filepath: Path,
+        digests: list[bytes] | None
+    ) -> None:
+        if digests is None:
+            self.record_digests.pop(filepath, None)
+        else:
+            self.record_digests[filepath] = digests
+
+    def _file_changed(self, filepath: Path) -> None:
+        """Warn that an opened file was changed by another process."""
+        editors: list[DataEditor] = [
+            de for de in self.data_editors
+            if de.filename is not None and Path(de.filename).resolve() == filepath
+        ]
+        # the application's own writes are recorded once done
+        if not editors or any(de.status == "saving" for de in editors):
+            return
+        if filepath in self.changed_on_disk:
+            return
+
+        self.changed_on_disk.add(filepath)
+        unsaved: str = ""
+        if any(de.dirty for de in editors):
+            unsaved = " (reload -f discards unsaved changes)"
+        logger.warning(
+            f"{filepath} changed on disk, reload to load it{unsaved}."
+        )
+
+    def save(
+        self,
+        data_editor: DataEditor,
+        force: bool = False
+    ) -> asyncio.Future | None:
+        """
+        Write data_editor data into its file in a worker thread.
+        Returns the future of the write, resolving to its (bytes, seconds,
+        file signature).
+        force: If true, overwrite the file even if it changed on disk.
+        """
+        def _on_saved(future: asyncio.Future) -> None:
+            data_editor.status = None
+            try:
+                size, seconds, signature = future.result()
+            except PermissionError:
+                # already logged by write_file
+                return
+            except OSError as e:
+                logger.error(get_error_message(
+                    "CouldNotWrite", filename=data_editor.filename, error=e
+                ))
+                return
+            except (TypeError, ValueError) as e:
+                logger.error(f"Could not save {data_editor.filename}: {e}")
+                return
+            self._saved(data_editor, size, seconds, signature)
+
+        if data_editor.status is not None:
+            raise ActionError(f"Editor is {data_editor.status}, try again later.")
+
+        filepath: Path = Path(data_editor.filename).resolve()
+        if filepath in self.changed_on_disk and not force:
+            raise ActionError(
+                f"{data_editor.filename} changed on disk since loaded, "
+                "reload it or save -f to overwrite it."
+            )
+
+        if self.loop is None:
+            try:
+                written: tuple = timed_write(
+                    data_editor.filename, data_editor.data
+                )
+            except PermissionError:
+                # already logged by write_file
+                return None
+            except OSError as e:
+                raise ActionError(get_error_message(
+                    "CouldNotWrite", filename=data_editor.filename, error=e
+                ))
+            self._saved(data_editor, *written)
+            return None
+
+        data_editor.status = "saving"
+        future: asyncio.Future = self.loop.run_in_executor(
+            None, timed_write, data_editor.filename, data_editor.data
+        )
+        future.add_done_callback(_on_saved)
+        return future
+
+    def export(
+        self,
+        data_editor: DataEditor,
+        data: Any,
+        filepath: Path
+    ) -> asyncio.Future | None:
+        """
+        Write data of data_editor into another file in a worker thread,
+        the editor keeping its own file.
+        """
+        def _on_exported(future: asyncio.Future) -> None:
+            data_editor.status = None
+            try:
+                size, seconds, _ = future.result()
+            except PermissionError:
+                # already logged by write_file
+                return
+            except OSError as e:
+                logger.error(get_error_message(
+                    "CouldNotWrite", filename=filepath, error=e
+                ))
+                return
+            except (TypeError, ValueError) as e:
+                logger.error(f"Could not export to {filepath}: {e}")
+                return
+            logger.info(
+                f"Exported to {filepath} ({size:,} bytes in {seconds:.3f}s)."
+            )
+
+        if data_editor.status is not None:
+            raise ActionError(f"Editor is {data_editor.status}, try again later.")
+
+        if self.loop is None:
+            try:
+                size, seconds, _ = timed_write(filepath, data)
+            except PermissionError:
+                # already logged by write_file
+                return None
+            except OSError as e:
+                raise ActionError(get_error_message(
+                    "CouldNotWrite", filename=filepath, error=e
+                ))
+            except (TypeError, ValueError) as e:
+                raise ActionError(f"Could not export to {filepath}: {e}")
+            logger.info(
+                f"Exported to {filepath} ({size:,} bytes in {seconds:.3f}s)."
+            )
+            return None
+
+        data_editor.status = "exporting"
+        future: asyncio.Future = self.loop.run_in_executor(
+            None, timed_write, filepath, data
+        )
+        future.add_done_callback(_on_exported)
+        return future
+
+    def save_all(self) -> None:
+        """Save every modified editor concurrently, in worker threads."""
+        to_save: dict[Path, DataEditor] = {}
+        for data_editor in self.data_editors:
+            if not data_editor.dirty or data_editor.filename is None:
+                continue
+            if data_editor.status is not None:
+                logger.error(
+                    f"{data_editor.filename} is {data_editor.status}, skipped."
+                )
                 continue
 
-            # try to parse with widget_manager parser first
-            try: 
-                parsed: argparse.Namespace = self.parser.parse_args(
-                    pre_parsed, suppress_argument_error=False
+            # two versions of a file can't be written at the same time
+            filepath: Path = Path(data_editor.filename).resolve()
+            if filepath in self.changed_on_disk:
+                logger.error(
+                    f"{data_editor.filename} changed on disk, skipped."
                 )
-                widget = self
-            
-            # if fails by invalid choice given,
-            # try to parse with active_widget parser
-            except argparse.ArgumentError as e:
-                if e.message.startswith("invalid choice: "):
-                    try:
-                        parsed = self.active_widget.parser.parse_args(pre_parsed)
-                        widget = self.active_widget
-                    # if it fails again, the user input was invalid
-                    except AttemptToExitError:
-                        continue
-                else:
-                    logger.error(e)
-                    continue
-            except AttemptToExitError:
                 continue
+            if filepath in to_save:
+                raise ActionError(
+                    f"Several modified editors of {filepath}, "
+                    "save them one at a time with save -t."
+                )
+            to_save[filepath] = data_editor
 
-            # if given input has a widget-action, execute it
-            action: Callable | None = vars(parsed).pop("func", None)
-            if action:
-                try:
-                    kwargs: dict = vars(parsed)
-                    action(widget, **kwargs)
-                except ActionError as e:
-                    logger.error(e)
+        if not to_save:
+            logger.info("No modified editors to save.")
+            return
+
+        started: float = time.perf_counter()
+        futures: list[asyncio.Future | None] = [
+            self.save(data_editor) for data_editor in to_save.values()
+        ]
+
+        def _on_all_saved(future: asyncio.Future) -> None:
+            results: list = [r for r in future.result() if isinstance(r, tuple)]
+            total_size: int = sum(result[0] for result in results)
+            logger.info(
+                f"Saved {len(results)} of {len(to_save)} files, "
+                f"{total_size:,} bytes in {time.perf_counter() - started:.3f}s."
+            )
+
+        if self.loop is not None:
+            gathered: asyncio.Future = asyncio.gather(
+                *futures, return_exceptions=True
+            )
+            gathered.add_done_callback(_on_all_saved)
+
+    def _saved(
+        self,
+        data_editor: DataEditor,
+        size: int,
+        seconds: float,
+        signature: tuple[int, int, int] | None = None
+    ) -> None:
+        """
+        Make the saved data the document later editors of the file share.
+        signature: The one of the file right after it was written.
+        """
+        data_editor.dirty = False
+        data_editor.file_size = size
+        data_editor.save_seconds = seconds
+        data_editor.shared = True
+        data_editor.owned.clear()
+        data_editor.document = data_editor.data
+        data_editor.document_hashes = None
+        filepath: Path = Path(data_editor.filename).resolve()
+        self.documents[filepath] = data_editor.data
+        self.record_digests.pop(filepath, None)
+        self.changed_on_disk.discard(filepath)
+        self.release_documents()
+        logger.info(
+            f"Saved at {data_editor.filename} ({size:,} bytes in {seconds:.3f}s)."
+        )
+        # changes made by other processes while saving were skipped, the
+        # file is checked against the signature of the write to find them
+        self.watcher.watch(filepath, signature)
+        self.watcher.check(filepath)
+
+    def release_documents(self) -> None:
+        """Forget documents of files no editor has opened anymore."""
+        opened: set[Path] = {
+            Path(de.filename).resolve()
+            for de in self.data_editors if de.filename is not None
+        }
+        for filepath in list(self.documents):
+            if filepath not in opened:
+                del self.documents[filepath]
+                self.record_digests.pop(filepath, None)
+        for filepath in list(self.watcher.signatures):
+            if filepath not in opened:
+                self.watcher.unwatch(filepath)
+                self.changed_on_disk.discard(filepath)
+
+    def set_autosave(self, interval: float) -> None:
+        """Save dirty editors every interval seconds, 0 turns it off."""
+        self.autosave_interval = interval
+
+        if self._autosave_task is not None:
+            self._autosave_task.cancel()
+            self._autosave_task = None
+
+        if interval > 0 and self.loop is not None:
+            self._autosave_task = self.loop.create_task(self._autosave())
+
+    async def _autosave(self) -> None:
+        """Save the dirty editors that have a file, periodically."""
+        while True:
+            await asyncio.sleep(self.autosave_interval)
+            for data_editor in self.data_editors:
+                if (
+                    data_editor.dirty
+                    and data_editor.status is None
+                    and data_editor.filename is not None
+                    and Path(data_editor.filename).resolve()
+                    not in self.changed_on_disk
+                ):
+                    self.save(data_editor)
+
+def timed_read(
+    filepath: Path,
+    known: dict[bytes, list[Any]] | None = None,
+    compact: str | None = None
+) -> tuple[Any, int, float, list[bytes] | None]:
+    """
+    Read filepath, return its content, the file size, time taken and
+    the digests of its records, for files read record by record.
+    Records with digests in known reuse their values, see read_records.
+    With compact, dicts are read as compact records, see read_file.
+    """
+    started: float = time.perf_counter()
+    digests: list[bytes] | None = None
+    if Path(filepath).suffix.lower() in RECORD_FORMATS:
+        data, digests = read_records(filepath, known, compact)
+    else:
+        data = read_file(filepath, compact)
+    seconds: float = time.perf_counter() - started
+    return data, os.path.getsize(filepath), seconds, digests
+
+def timed_write(
+    filepath: Path,
+    content: Any
+) -> tuple[int, float, tuple[int, int, int] | None]:
+    """
+    Write content into filepath, return the file size, time taken and
+    the file signature right after the write.
+    """
+    started: float = time.perf_counter()
+    write_file(filepath, content)
+    seconds: float = time.perf_counter() - started
+    return os.path.getsize(filepath), seconds, file_signature(filepath)